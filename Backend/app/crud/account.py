@@ -3,9 +3,10 @@ from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import AccountType, CustomerAccounts, SavingAccountDetail, LoanAccountDetail, SavingAccountTxnHistory
 from app.schemas.customer import SavingAccountCreate
+from app.services.ids import txn_ids, acct_nums
+from app.services.customer_cache import mark_customer_changed
 from decimal import Decimal
 from datetime import date
-import time
 from typing import Optional
 
 async def get_or_create_account_type(db: AsyncSession, account_type: str, sub_type: str | None = None):
@@ -32,7 +33,7 @@ async def get_or_create_customer_account(db: AsyncSession, cust_id: int, account
         return cust_account.AcctNum
 
     # create new account
-    acct_num = int(time.time() * 1000)  # or use DB sequence
+    acct_num = await acct_nums.next_id(db)
     new_cust_account = CustomerAccounts(
         AcctNum=acct_num,
         CustID=cust_id,
@@ -40,6 +41,7 @@ async def get_or_create_customer_account(db: AsyncSession, cust_id: int, account
     )
     db.add(new_cust_account)
     await db.flush()
+    mark_customer_changed(db, cust_id)
     return acct_num
 
 
@@ -94,6 +96,7 @@ async def create_saving_account_with_initial_txn(
     if balance_val > Decimal("0.00"):
         tx_date = txn_date or date.today()
         txn = SavingAccountTxnHistory(
+            TxnID=await txn_ids.next_id(db),
             AcctNum=acct_num,
             TxnType="Deposit",
             TxnDetail="Initial deposit",
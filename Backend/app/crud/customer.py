@@ -1,7 +1,14 @@
-from sqlalchemy import select, func
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import CustomerDetail, PostalCode, City, State, Country, CustomerAccounts, SavingAccountDetail, LoanAccountDetail
-from sqlalchemy.orm import joinedload
+from app.models import CustomerDetail, PostalCode, City, State, CustomerAccounts, SavingAccountDetail, LoanAccountDetail
+from sqlalchemy.orm import joinedload, selectinload
+from app.services.customer_cache import mark_customer_changed
+from app.services.geo_cache import geo_index, mark_geo_changed
+from app.crud.locations import upsert_postal_code
+from app.crud.customer_purge import delete_customers
+
+_POSTAL_CHAIN = joinedload(PostalCode.city).joinedload(City.state).joinedload(State.country)
+
 
 async def get_customer_by_id(db: AsyncSession, cust_id: int) -> CustomerDetail | None:
     res = await db.execute(select(CustomerDetail).where(CustomerDetail.CustID == cust_id))
@@ -13,67 +20,44 @@ async def get_customer_by_email(db: AsyncSession, email: str) -> CustomerDetail
     return res.scalars().first()
 
 
-async def create_customer(db: AsyncSession, *, payload: dict) -> CustomerDetail:
-    """Create a new customer. payload keys must match model fields (FirstName, LastName, EmailID, etc.).
+async def resolve_postal_code(
+    db: AsyncSession, zip_code: str | None, city_name: str | None, state_name: str | None, country_name: str | None
+) -> str:
+    """Return zip_code once it exists in PostalCode, creating it (and its City/State/Country,
+    matched case-insensitively by name) when the location names are given.
 
-    If ZIPCode is provided it must exist in PostalCode table; otherwise it will be stored as-is.
+    A ZIP known to the geo index needs no query; otherwise this is one statement either
+    way (app.crud.locations). Raises ValueError for an unknown ZIP without names.
     """
-    # Optional: ensure ZIPCode exists. If it does not exist, create PostalCode and its City/State/Country
-    zip_code = payload.get('ZIPCode')
+    if zip_code and await geo_index.has_zip(zip_code):
+        return zip_code
+
+    if zip_code and city_name and state_name and country_name:
+        if await upsert_postal_code(db, zip_code, city_name, state_name, country_name):
+            mark_geo_changed(db)
+        return zip_code
 
     postal = None
     if zip_code:
         res = await db.execute(select(PostalCode).where(PostalCode.ZIPCode == zip_code))
         postal = res.scalars().first()
-
     if not postal:
         # Need extra location data to create full hierarchy
-        city_name = payload.get('CityName')
-        state_name = payload.get('StateName')
-        country_name = payload.get('CountryName')
-
-        if not (zip_code and city_name and state_name and country_name):
-            raise ValueError(
-                "ZIP code not found. To create a new postal record, provide ZIPCode, CityName, StateName and CountryName in the payload."
-            )
-
-        # Find or create Country (case-insensitive by name)
-        q = select(Country).where(func.lower(Country.CountryName) == country_name.lower())
-        res = await db.execute(q)
-        country = res.scalars().first()
-        if not country:
-            country = Country(CountryName=country_name)
-            db.add(country)
-            await db.flush()  # populate country.CountryCode
-
-        # Find or create State under the country
-        q = select(State).where(
-            func.lower(State.StateName) == state_name.lower(), State.CountryCode == country.CountryCode
+        raise ValueError(
+            "ZIP code not found. To create a new postal record, provide ZIPCode, CityName, StateName and CountryName in the payload."
         )
-        res = await db.execute(q)
-        state = res.scalars().first()
-        if not state:
-            state = State(StateName=state_name, CountryCode=country.CountryCode)
-            db.add(state)
-            await db.flush()
-
-        # Find or create City under the state
-        q = select(City).where(func.lower(City.CityName) == city_name.lower(), City.StateCode == state.StateCode)
-        res = await db.execute(q)
-        city = res.scalars().first()
-        if not city:
-            city = City(CityName=city_name, StateCode=state.StateCode)
-            db.add(city)
-            await db.flush()
-
-        # Create PostalCode
-        postal = PostalCode(ZIPCode=zip_code, CityCode=city.CityCode)
-        db.add(postal)
-        await db.flush()
-
-    # At this point postal exists (either pre-existing or just created)
-    # Ensure the payload contains the ZIPCode field referencing it
-    payload['ZIPCode'] = postal.ZIPCode
+    return postal.ZIPCode
+
+
+async def create_customer(db: AsyncSession, *, payload: dict) -> CustomerDetail:
+    """Create a new customer. payload keys must match model fields (FirstName, LastName, EmailID, etc.).
+
+    The ZIPCode must exist in PostalCode, or come with CityName, StateName and CountryName to create it.
+    """
+    # Ensure the payload's ZIPCode references an existing (or just created) postal record
+    payload['ZIPCode'] = await resolve_postal_code(
+        db, payload.get('ZIPCode'), payload.get('CityName'), payload.get('StateName'), payload.get('CountryName')
+    )
 
     # Remove any helper location keys we used so model construction won't fail
     for k in ('CityName', 'StateName', 'CountryName'):
@@ -82,6 +66,8 @@ async def create_customer(db: AsyncSession, *, payload: dict) -> CustomerDetail:
 
     cust = CustomerDetail(**payload)
     db.add(cust)
+    await db.flush()
+    mark_customer_changed(db, cust.CustID)
     await db.commit()
     await db.refresh(cust)
     return cust
@@ -99,54 +85,12 @@ async def update_customer(db: AsyncSession, cust: CustomerDetail, payload: dict)
     # Track whether we need to change ZIP/postal
     new_zip = payload.get('ZIPCode')
     if new_zip and new_zip != cust.ZIPCode:
-        # find existing postal
-        res = await db.execute(select(PostalCode).where(PostalCode.ZIPCode == new_zip))
-        postal = res.scalars().first()
-        if not postal:
-            # create hierarchy
-            city_name = payload.get('CityName')
-            state_name = payload.get('StateName')
-            country_name = payload.get('CountryName')
-            if not (new_zip and city_name and state_name and country_name):
-                raise ValueError(
-                    "ZIP code not found. To create a new postal record, provide ZIPCode, CityName, StateName and CountryName in the payload."
-                )
-
-            # Country
-            q = select(Country).where(func.lower(Country.CountryName) == country_name.lower())
-            res = await db.execute(q)
-            country = res.scalars().first()
-            if not country:
-                country = Country(CountryName=country_name)
-                db.add(country)
-                await db.flush()
-
-            # State
-            q = select(State).where(
-                func.lower(State.StateName) == state_name.lower(), State.CountryCode == country.CountryCode
-            )
-            res = await db.execute(q)
-            state = res.scalars().first()
-            if not state:
-                state = State(StateName=state_name, CountryCode=country.CountryCode)
-                db.add(state)
-                await db.flush()
-
-            # City
-            q = select(City).where(func.lower(City.CityName) == city_name.lower(), City.StateCode == state.StateCode)
-            res = await db.execute(q)
-            city = res.scalars().first()
-            if not city:
-                city = City(CityName=city_name, StateCode=state.StateCode)
-                db.add(city)
-                await db.flush()
-
-            postal = PostalCode(ZIPCode=new_zip, CityCode=city.CityCode)
-            db.add(postal)
-            await db.flush()
+        postal_zip = await resolve_postal_code(
+            db, new_zip, payload.get('CityName'), payload.get('StateName'), payload.get('CountryName')
+        )
 
         # assign new postal ZIP
-        cust.ZIPCode = postal.ZIPCode
+        cust.ZIPCode = postal_zip
         updated_columns.append('ZIPCode')
 
     # Update other fields if provided and different
@@ -162,50 +106,70 @@ async def update_customer(db: AsyncSession, cust: CustomerDetail, payload: dict)
                 setattr(cust, key, new_val)
                 updated_columns.append(key)
 
+    mark_customer_changed(db, cust.CustID)
     await db.commit()
     await db.refresh(cust)
     return cust, updated_columns
 
 
 async def get_customer_full_by_id(db: AsyncSession, cust_id: int):
+    """Customer with its accounts (type, savings or loan detail, loan EMIs). The ZIP -> city
+    -> state -> country chain is not loaded: render it with get_postal_hierarchy.
+
+    Collections are loaded with one batched SELECT ... IN per level instead of joined into
+    the customer query, so the result never grows as accounts x EMIs x transactions.
+    Savings transactions are not loaded: embed a bounded page with recent_savings_txns.
+    """
     result = await db.execute(
         select(CustomerDetail)
         .options(
-            joinedload(CustomerDetail.zipcode)
-                .joinedload(PostalCode.city)
-                .joinedload(City.state)
-                .joinedload(State.country),
-            joinedload(CustomerDetail.accounts)
-                .joinedload(CustomerAccounts.account_type),
-            joinedload(CustomerDetail.accounts)
-                .joinedload(CustomerAccounts.saving_detail)
-                .joinedload(SavingAccountDetail.transactions),
-            joinedload(CustomerDetail.accounts)
-                .joinedload(CustomerAccounts.loan_detail)
-                .joinedload(LoanAccountDetail.emis),
+            selectinload(CustomerDetail.accounts).options(
+                joinedload(CustomerAccounts.account_type),
+                joinedload(CustomerAccounts.saving_detail).noload(SavingAccountDetail.transactions),
+                joinedload(CustomerAccounts.loan_detail).selectinload(LoanAccountDetail.emis),
+            ),
         )
         .where(CustomerDetail.CustID == cust_id)
     )
-    return result.unique().scalar_one_or_none()
+    return result.scalar_one_or_none()
+
+async def get_postal_hierarchy(db: AsyncSession, zip_code: str | None):
+    """The ZIP's city -> state -> country chain for PostalCodeOut: from the geo index when
+    it knows the ZIP (as data), otherwise loaded from the database (None if it does not exist)."""
+    if not zip_code:
+        return None
+    postal = await geo_index.postal(zip_code)
+    if postal is not None:
+        return postal
+    res = await db.execute(select(PostalCode).options(_POSTAL_CHAIN).where(PostalCode.ZIPCode == zip_code))
+    return res.scalars().first()
+
+
+async def search_postal_codes(db: AsyncSession, prefix: str, limit: int) -> list:
+    """Up to `limit` postal codes starting with prefix, in ZIPCode order, for autocomplete."""
+    indexed = await geo_index.autocomplete(prefix, limit)
+    if indexed is not None:
+        return indexed
+    res = await db.execute(
+        select(PostalCode).options(_POSTAL_CHAIN)
+        .where(PostalCode.ZIPCode.startswith(prefix, autoescape=True))
+        .order_by(PostalCode.ZIPCode)
+        .limit(limit)
+    )
+    return list(res.scalars().all())
+
 
 async def delete_customer(db: AsyncSession, cust_id: int = None, email: str = None):
     """
     Delete a customer by CustID or EmailID.
     Returns True if deleted, False if not found.
     """
-    query = None
-    if cust_id is not None:
-        query = select(CustomerDetail).where(CustomerDetail.CustID == cust_id)
-    elif email is not None:
-        query = select(CustomerDetail).where(CustomerDetail.EmailID == email)
-    else:
-        return False
-
-    result = await db.execute(query)
-    customer = result.scalar_one_or_none()
-    if not customer:
+    if cust_id is None and email is not None:
+        cust_id = (await db.execute(select(CustomerDetail.CustID).where(CustomerDetail.EmailID == email))).scalar_one_or_none()
+    if cust_id is None:
         return False
 
-    await db.delete(customer)
+    # accounts, savings and loan details, history and EMIs go by ON DELETE CASCADE
+    deleted, _ = await delete_customers(db, [cust_id])
     await db.commit()
-    return True
\ No newline at end of file
+    return bool(deleted)
\ No newline at end of file
@@ -0,0 +1,228 @@
+# app/crud/customer360.py
+"""Customer-360 documents (Customer360): what GET /customers/{cust_id}/360 returns, kept
+as one JSONB row per customer so that the read is a primary-key lookup instead of joining
+CustomerDetail, PostalCode -> City -> State -> Country, CustomerAccounts, AccountType,
+SavingAccountDetail and LoanAccountDetail.
+
+A document is always recomputed whole from those tables, never patched, with one
+statement for any number of customers. Every write path already marks the customers it
+changes (mark_customer_changed); their documents are refreshed in the same transaction,
+just before it commits (the before_commit hook in app.services.customer_cache). The
+refresh first locks the customer rows (FOR NO KEY UPDATE, in CustID order) and only then
+reads them, in a new statement: a concurrent transaction changing the same customer
+holds that lock until it commits, so the read sees its changes and two refreshes cannot
+each miss the other's. Balance-only writes (postings, EMI payments) mark just the
+accounts (mark_balances_changed) and patch those entries and the totals instead, under a
+FOR SHARE lock: postings to one customer do not queue behind each other, and a full
+refresh still waits for them. Deleted customers lose their document by ON DELETE CASCADE.
+app.jobs.customer360_rebuild rebuilds every document and checks them against the tables.
+"""
+from sqlalchemy import (
+    select, update, insert, cast, case, and_, column, func, literal_column, true, bindparam, any_,
+    Integer, BigInteger, Numeric, Text,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, ARRAY, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import (
+    Customer360, CustomerDetail, CustomerAccounts, AccountType, SavingAccountDetail, LoanAccountDetail,
+    PostalCode, City, State, Country,
+)
+
+ZERO = literal_column("0.00")
+
+
+def _object(**fields):
+    # jsonb_build_object('Key', value, ...) with the keys as SQL literals, not parameters
+    args = []
+    for key, value in fields.items():
+        args += [literal_column(f"'{key}'"), value]
+    return func.jsonb_build_object(*args)
+
+
+def _documents(*where):
+    """SELECT CustID, Document for the customers matching `where`."""
+    C, A, T, S, L = CustomerDetail, CustomerAccounts, AccountType, SavingAccountDetail, LoanAccountDetail
+    account = func.jsonb_strip_nulls(_object(
+        AcctNum=A.AcctNum,
+        AccountType=T.AccountType,
+        AccSubType=T.AccSubType,
+        BranchCode=func.coalesce(S.BranchCode, L.BranchCode),
+        Balance=S.Balance,
+        TransferLimit=S.TransferLimit,
+        OutstandingAmount=L.BalanceAmount,
+        TotalLoanAmount=L.TotalLoanAmount,
+        RateOfInterest=L.RateOfInterest,
+        LoanDuration=L.LoanDuration,
+    ))
+    accounts = (
+        select(
+            func.jsonb_agg(aggregate_order_by(account, A.AcctNum)).label("entries"),
+            func.sum(S.Balance).label("savings"),
+            func.sum(L.BalanceAmount).label("loans"),
+        )
+        .select_from(A)
+        .outerjoin(T, T.AccountTypeID == A.AccountTypeID)
+        .outerjoin(S, S.AcctNum == A.AcctNum)
+        .outerjoin(L, L.AcctNum == A.AcctNum)
+        .where(A.CustID == C.CustID)
+        .lateral("accounts")
+    )
+    document = _object(
+        CustID=C.CustID,
+        FirstName=C.FirstName,
+        LastName=C.LastName,
+        EmailID=C.EmailID,
+        Phone=C.Phone,
+        Mobile=C.Mobile,
+        DOB=C.DOB,
+        MaritalStatus=C.MaritalStatus,
+        Address=_object(
+            Address1=C.Address1,
+            Address2=C.Address2,
+            ZIPCode=C.ZIPCode,
+            CityName=City.CityName,
+            StateName=State.StateName,
+            CountryName=Country.CountryName,
+        ),
+        Accounts=func.coalesce(accounts.c.entries, literal_column("'[]'::jsonb")),
+        SavingsBalance=func.coalesce(accounts.c.savings, ZERO),
+        LoanOutstanding=func.coalesce(accounts.c.loans, ZERO),
+    )
+    return (
+        select(C.CustID, document.label("Document"))
+        .select_from(C)
+        .join(accounts, true())
+        .outerjoin(PostalCode, PostalCode.ZIPCode == C.ZIPCode)
+        .outerjoin(City, City.CityCode == PostalCode.CityCode)
+        .outerjoin(State, State.StateCode == City.StateCode)
+        .outerjoin(Country, Country.CountryCode == State.CountryCode)
+        .where(*where)
+    )
+
+
+def lock_customers(*where, share: bool = False):
+    """SELECT ... FOR NO KEY UPDATE (or FOR SHARE) of the matching customers, in CustID
+    order. Neither blocks inserting accounts for them (foreign key checks take KEY SHARE)."""
+    locked = select(CustomerDetail.CustID).where(*where).order_by(CustomerDetail.CustID)
+    return locked.with_for_update(read=True) if share else locked.with_for_update(key_share=True)
+
+
+def store_documents(*where):
+    """Recompute and store the documents of the matching customers: UPDATE the existing
+    rows, INSERT the missing ones. Run after lock_customers with the same filter, which is
+    what keeps the insert from racing another refresh of the same customer."""
+    # against the Table: an ORM insert executed with parameters would be a bulk insert
+    X = Customer360.__table__
+    docs = _documents(*where).cte("docs")
+    updated = (
+        update(X)
+        .where(X.c.CustID == docs.c.CustID)
+        .values(Document=docs.c.Document, UpdatedAt=func.now())
+        .returning(X.c.CustID)
+        .cte("updated")
+    )
+    return insert(X).from_select(
+        ["CustID", "Document"],
+        select(docs.c.CustID, docs.c.Document).where(docs.c.CustID.not_in(select(updated.c.CustID))),
+    )
+
+
+def patch_balances(*where):
+    """Patch the documents of the matching customers after balance-only writes: the
+    entries of the accounts listed in :acct_nums get their current Balance or
+    OutstandingAmount, and SavingsBalance and LoanOutstanding are summed again over the
+    entries. Nothing else is recomputed. The new document is computed from the row being
+    updated, so a concurrent patch of another account of the customer is kept; run after
+    lock_customers(share=True), which makes a full refresh wait for this transaction."""
+    X, S, L = Customer360.__table__, SavingAccountDetail, LoanAccountDetail
+    listed = any_(bindparam("acct_nums", type_=ARRAY(BigInteger)))
+    entries = func.jsonb_array_elements(X.c.Document["Accounts"]).table_valued(
+        column("value", JSONB), with_ordinality="ord"
+    ).render_derived("entries")
+    entry = entries.c.value
+    acct_num = cast(entry["AcctNum"].astext, BigInteger)
+    patched = case(
+        (S.AcctNum.is_not(None), entry.op("||")(_object(Balance=S.Balance))),
+        (L.AcctNum.is_not(None), entry.op("||")(_object(OutstandingAmount=L.BalanceAmount))),
+        else_=entry,
+    )
+    balance = case((S.AcctNum.is_not(None), S.Balance), else_=cast(entry["Balance"].astext, Numeric))
+    outstanding = case((L.AcctNum.is_not(None), L.BalanceAmount), else_=cast(entry["OutstandingAmount"].astext, Numeric))
+    document = (
+        select(X.c.Document.op("||")(_object(
+            Accounts=func.coalesce(
+                func.jsonb_agg(aggregate_order_by(func.jsonb_strip_nulls(patched), entries.c.ord)),
+                literal_column("'[]'::jsonb"),
+            ),
+            SavingsBalance=func.coalesce(func.sum(balance), ZERO),
+            LoanOutstanding=func.coalesce(func.sum(outstanding), ZERO),
+        )))
+        .select_from(entries)
+        .outerjoin(S, and_(S.AcctNum == acct_num, S.AcctNum == listed))
+        .outerjoin(L, and_(L.AcctNum == acct_num, L.AcctNum == listed))
+        .scalar_subquery()
+    )
+    return update(X).where(*where).values(Document=document, UpdatedAt=func.now())
+
+
+# Built once: the expression trees are large enough that constructing them per write
+# cost more than running them. Executed with {"cust_ids": [...]} (and "acct_nums").
+_CUST_IDS = bindparam("cust_ids", type_=ARRAY(Integer))
+_LISTED = CustomerDetail.CustID == any_(_CUST_IDS)
+_LOCK = lock_customers(_LISTED)
+_SHARE = lock_customers(_LISTED, share=True)
+_STORE = store_documents(_LISTED)
+_PATCH = patch_balances(Customer360.__table__.c.CustID == any_(_CUST_IDS))
+
+
+def refresh_statements(cust_ids, accounts: dict[int, int] | None = None) -> list[tuple]:
+    """(statement, parameters) pairs that, run in order in the writing transaction, bring
+    documents up to date: recomputed whole for cust_ids, patched (patch_balances) for the
+    other owners of `accounts` (AcctNum -> CustID) whose balances changed. Customers are
+    locked once, in one statement, in CustID order."""
+    full = set(cust_ids)
+    accounts = {acct_num: cust_id for acct_num, cust_id in (accounts or {}).items() if cust_id not in full}
+    patched = set(accounts.values())
+    statements = []
+    if full:
+        statements += [(_LOCK, {"cust_ids": sorted(full | patched)}), (_STORE, {"cust_ids": sorted(full)})]
+    elif patched:
+        statements.append((_SHARE, {"cust_ids": sorted(patched)}))
+    if patched:
+        statements.append((_PATCH, {"cust_ids": sorted(patched), "acct_nums": sorted(accounts)}))
+    return statements
+
+
+async def refresh_documents(db: AsyncSession, cust_ids):
+    """Bring these customers' documents up to date in db's transaction (not committed);
+    writes marked with mark_customer_changed get this from the before_commit hook."""
+    for statement, params in refresh_statements(cust_ids):
+        await db.execute(statement, params)
+
+
+async def read_document(db: AsyncSession, cust_id: int) -> str | None:
+    """The customer's document as JSON text: the stored one, or computed from the tables
+    when it has none yet (customers from before the first rebuild). None if there is no
+    such customer."""
+    stored = (await db.execute(
+        select(cast(Customer360.Document, Text)).where(Customer360.CustID == cust_id)
+    )).scalar_one_or_none()
+    if stored is not None:
+        return stored
+    computed = _documents(CustomerDetail.CustID == cust_id).subquery()
+    return (await db.execute(select(cast(computed.c.Document, Text)))).scalar_one_or_none()
+
+
+async def find_mismatches(db: AsyncSession, first: int, last: int) -> list[tuple[int, str]]:
+    """(CustID, "missing" or "stale") for the customers in [first, last] whose stored
+    document is absent or differs from the one computed from the tables. One snapshot
+    holds both sides, so documents being refreshed by in-flight writes are not reported."""
+    docs = _documents(CustomerDetail.CustID.between(first, last)).subquery()
+    X = Customer360
+    rows = await db.execute(
+        select(docs.c.CustID, X.CustID.is_(None))
+        .outerjoin_from(docs, X, X.CustID == docs.c.CustID)
+        .where(X.Document.is_distinct_from(docs.c.Document))
+        .order_by(docs.c.CustID)
+    )
+    return [(cust_id, "missing" if missing else "stale") for cust_id, missing in rows]
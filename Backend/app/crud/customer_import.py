@@ -0,0 +1,303 @@
+# app/crud/customer_import.py
+"""Bulk customer onboarding (POST /customers/import, app.jobs.customer_import).
+
+Rows have the CustomerCreate fields (CSV header or JSON keys) and follow the same rules as
+POST /customers/: the ZIP must exist, or come with CityName, StateName and CountryName to
+create it; names match existing locations case-insensitively. Per chunk of rows, instead
+of a lookup, flush, insert and commit per customer:
+
+  - emails are checked against each other and the database in one query (lower(EmailID));
+  - the distinct locations are resolved or created level by level, one statement each for
+    Country, State, City and PostalCode;
+  - the customers go in with one INSERT ... SELECT FROM unnest(...), and their
+    customer-360 documents with one more statement at commit;
+
+and the chunk commits, so a failed import keeps the chunks before it and re-running the
+file only adds the customers still missing (the rest are reported as existing emails).
+"""
+import csv
+import io
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import select, func, and_, exists, literal_column, union_all, Integer, String, Date, Text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import unnest_rows
+from app.crud.locations import LEVELS, upsert_level
+from app.models import CustomerDetail, PostalCode, City, State, Country
+from app.schemas.customer import CustomerCreate
+from app.services.customer_cache import mark_customer_changed
+from app.services.geo_cache import mark_geo_changed
+
+load_dotenv()
+
+logger = logging.getLogger("customer_import")
+
+IMPORT_CHUNK_ROWS = int(os.environ.get("IMPORT_CHUNK_ROWS", "5000"))
+
+CUSTOMER_COLUMNS = ["FirstName", "LastName", "Address1", "Address2", "EmailID", "Phone", "Mobile", "DOB", "MaritalStatus", "ZIPCode"]
+COLUMN_TYPES = {"DOB": Date}
+MAX_LENGTHS = {
+    column: CustomerDetail.__table__.c[column].type.length
+    for column in CUSTOMER_COLUMNS
+    if getattr(CustomerDetail.__table__.c[column].type, "length", None)
+}
+
+
+@dataclass
+class RowError:
+    index: int          # 0-based position of the row in the input
+    status_code: int    # 409 duplicate email, 400 unknown ZIP without location, 422 invalid row
+    detail: str
+    EmailID: str | None = None
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    imported: int = 0
+    errors: list[RowError] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "rejected": len(self.errors),
+            "seconds": round(self.seconds, 2),
+            "rows_per_second": self.rows_per_second,
+        }
+
+
+def iter_rows(source: Iterable[str], fmt: str) -> Iterator[dict | str]:
+    """Raw rows from CSV (with a header line; empty cells become None) or NDJSON. NDJSON
+    lines are passed on as text and parsed with the row, so a broken line only rejects
+    that row."""
+    if fmt == "csv":
+        for row in csv.DictReader(source):
+            yield {k.strip(): (v if v != "" else None) for k, v in row.items() if k}
+    else:
+        for line in source:
+            if line.strip():
+                yield line
+
+
+def parse_body(raw: bytes, content_type: str) -> Iterator[dict | str]:
+    """Rows of an HTTP body: text/csv, NDJSON (application/x-ndjson) or a JSON array."""
+    text = raw.decode("utf-8-sig")
+    if "csv" in content_type:
+        return iter_rows(io.StringIO(text, newline=""), "csv")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return iter_rows(text.splitlines(), "ndjson")
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of customers")
+    return iter(items)
+
+
+async def _resolve_level(db: AsyncSession, model, wanted: dict[tuple, str]) -> dict[tuple, int]:
+    """Find or create the rows of one location level in one statement.
+
+    wanted maps (lower(name), parent key or None) to the spelling to create it with;
+    returns the same keys mapped to primary keys.
+    """
+    if not wanted:
+        return {}
+    name_col, parent_col = LEVELS[model]
+    pk = model.__mapper__.primary_key[0]
+    keys = list(wanted)
+    if parent_col is None:
+        rows = unnest_rows(name=(String, [wanted[k] for k in keys]))
+        values = [rows.c.name]
+        match = func.lower(name_col) == func.lower(rows.c.name)
+        key_cols = [func.lower(name_col).label("name"), literal_column("NULL::integer").label("parent")]
+    else:
+        rows = unnest_rows(name=(String, [wanted[k] for k in keys]), parent=(Integer, [k[1] for k in keys]))
+        values = [rows.c.name, rows.c.parent]
+        match = and_(func.lower(name_col) == func.lower(rows.c.name), parent_col == rows.c.parent)
+        key_cols = [func.lower(name_col).label("name"), parent_col.label("parent")]
+
+    # only the missing names are inserted; one a concurrent import has just created comes
+    # back through the conflict update
+    created = (
+        upsert_level(model, select(*values).where(~exists().where(match)))
+        .returning(pk.label("pk"), *key_cols)
+        .cte("created")
+    )
+    found = select(pk.label("pk"), *key_cols).join_from(model, rows, match)
+    # rows inserted by the CTE are invisible to the rest of the statement, so take both
+    result = await db.execute(union_all(select(created), found))
+    return {(row.name, row.parent): row.pk for row in result}
+
+
+def _first_spelling(pairs) -> dict:
+    wanted: dict = {}
+    for key, spelling in pairs:
+        wanted.setdefault(key, spelling)
+    return wanted
+
+
+async def resolve_locations(db: AsyncSession, payloads: list[dict]) -> set[str]:
+    """The payloads' ZIP codes that exist or were just created. A ZIP that does not exist
+    yet is created from the first payload naming it with CityName, StateName and
+    CountryName, as it would be one request at a time; ZIPs without them are left out."""
+    zips = {p["ZIPCode"] for p in payloads if p.get("ZIPCode")}
+    if not zips:
+        return set()
+    existing = set((await db.execute(
+        select(PostalCode.ZIPCode).where(PostalCode.ZIPCode.in_(zips))
+    )).scalars())
+
+    new: dict[str, tuple[str, str, str]] = {}
+    for p in payloads:
+        zip_code = p.get("ZIPCode")
+        if zip_code in zips and zip_code not in existing and p.get("CityName") and p.get("StateName") and p.get("CountryName"):
+            new.setdefault(zip_code, (p["CountryName"], p["StateName"], p["CityName"]))
+    if not new:
+        return existing
+
+    countries = await _resolve_level(db, Country, _first_spelling(
+        ((country.lower(), None), country) for country, _, _ in new.values()
+    ))
+
+    def country_of(country):
+        return countries[(country.lower(), None)]
+
+    states = await _resolve_level(db, State, _first_spelling(
+        ((state.lower(), country_of(country)), state) for country, state, _ in new.values()
+    ))
+
+    def state_of(country, state):
+        return states[(state.lower(), country_of(country))]
+
+    cities = await _resolve_level(db, City, _first_spelling(
+        ((city.lower(), state_of(country, state)), city) for country, state, city in new.values()
+    ))
+    postal = unnest_rows(
+        ZIPCode=(String, list(new)),
+        CityCode=(Integer, [cities[(city.lower(), state_of(country, state))] for country, state, city in new.values()]),
+    )
+    await db.execute(
+        pg_insert(PostalCode).from_select(["ZIPCode", "CityCode"], select(postal)).on_conflict_do_nothing()
+    )
+    mark_geo_changed(db)
+    return existing | set(new)
+
+
+async def _import_chunk(db: AsyncSession, chunk: list[tuple[int, dict | str]], seen: dict[str, int], stats: ImportStats):
+    valid: list[tuple[int, dict]] = []
+    for index, raw in chunk:
+        try:
+            if isinstance(raw, str):
+                payload = CustomerCreate.model_validate_json(raw).model_dump(exclude_none=True)
+            else:
+                payload = CustomerCreate.model_validate(raw).model_dump(exclude_none=True)
+            for column, length in MAX_LENGTHS.items():
+                if len(payload.get(column) or "") > length:
+                    raise ValueError(f"{column} is longer than {length} characters")
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+            stats.errors.append(RowError(index, 422, detail, raw.get("EmailID") if isinstance(raw, dict) else None))
+            continue
+        except ValueError as e:
+            stats.errors.append(RowError(index, 422, str(e), payload["EmailID"]))
+            continue
+        email = payload["EmailID"].lower()
+        if email in seen:
+            stats.errors.append(RowError(index, 409, f"Duplicate email in this import (row {seen[email]})", payload["EmailID"]))
+            continue
+        seen[email] = index
+        valid.append((index, payload))
+    if not valid:
+        return
+
+    emails = [p["EmailID"].lower() for _, p in valid]
+    wanted = unnest_rows(email=(String, emails))
+    taken = set((await db.execute(
+        select(func.lower(CustomerDetail.EmailID))
+        .join_from(CustomerDetail, wanted, func.lower(CustomerDetail.EmailID) == wanted.c.email)
+    )).scalars())
+    fresh = []
+    for index, payload in valid:
+        if payload["EmailID"].lower() in taken:
+            stats.errors.append(RowError(index, 409, "Customer with this email already exists", payload["EmailID"]))
+        else:
+            fresh.append((index, payload))
+
+    zips = await resolve_locations(db, [p for _, p in fresh])
+    ready = []
+    for index, payload in fresh:
+        if payload.get("ZIPCode") not in zips:
+            stats.errors.append(RowError(
+                index, 400,
+                "ZIP code not found. To create a new postal record, provide ZIPCode, CityName, StateName and CountryName in the payload.",
+                payload["EmailID"],
+            ))
+        else:
+            ready.append((index, payload))
+    if not ready:
+        return
+
+    rows = unnest_rows(**{
+        column: (COLUMN_TYPES.get(column, Text), [p.get(column) for _, p in ready]) for column in CUSTOMER_COLUMNS
+    })
+    # a concurrent request may have taken an email since the check: skip it, report below
+    created = dict((await db.execute(
+        pg_insert(CustomerDetail)
+        .from_select(CUSTOMER_COLUMNS, select(rows))
+        .on_conflict_do_nothing(index_elements=["EmailID"])
+        .returning(CustomerDetail.EmailID, CustomerDetail.CustID)
+    )).all())
+    mark_customer_changed(db, *created.values())
+    for index, payload in ready:
+        if payload["EmailID"] in created:
+            stats.imported += 1
+        else:
+            stats.errors.append(RowError(index, 409, "Customer with this email already exists", payload["EmailID"]))
+
+
+async def import_customers(
+    db: AsyncSession,
+    rows: Iterable[dict | str],
+    chunk: int = IMPORT_CHUNK_ROWS,
+    progress: Callable[[ImportStats], None] | None = None,
+) -> ImportStats:
+    """Import customers from raw rows, committing every `chunk` rows. Rejected rows are
+    collected in the returned stats and never fail the import; `progress` is called after
+    each chunk."""
+    stats = ImportStats()
+    seen: dict[str, int] = {}
+    started = time.perf_counter()
+    batch: list[tuple[int, dict | str]] = []
+
+    async def flush():
+        await _import_chunk(db, batch, seen, stats)
+        await db.commit()
+        stats.rows += len(batch)
+        stats.seconds = time.perf_counter() - started
+        batch.clear()
+        logger.info("CUSTOMER.IMPORT rows=%s imported=%s rejected=%s rows_per_second=%s",
+                    stats.rows, stats.imported, len(stats.errors), stats.rows_per_second)
+        if progress is not None:
+            progress(stats)
+
+    for index, raw in enumerate(rows):
+        batch.append((index, raw))
+        if len(batch) >= chunk:
+            await flush()
+    if batch:
+        await flush()
+    stats.errors.sort(key=lambda error: error.index)
+    stats.seconds = time.perf_counter() - started
+    return stats
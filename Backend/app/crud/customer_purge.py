@@ -0,0 +1,155 @@
+# app/crud/customer_purge.py
+"""Customer deletion (DELETE /customers/{identifier}, POST /customers/purge,
+app.jobs.customer_purge).
+
+Everything a customer owns hangs off CustomerDetail through ON DELETE CASCADE foreign keys:
+CustomerAccounts -> SavingAccountDetail -> SavingAccountTxnHistory and the monthly
+snapshots, CustomerAccounts -> LoanAccountDetail -> LoanEMIDetail. So deleting customers
+is one DELETE on CustomerDetail and Postgres removes the rest through the foreign key
+indexes, instead of the ORM loading the dependent rows to delete (or orphan) them one by
+one. Per chunk of customers, in CustID order:
+
+  - their loan rows, then their savings rows, are locked in AcctNum order, the order
+    EMI payments and postings take them in (a posting locks its customer only at commit,
+    for the customer-360 refresh, so the DELETE must not lock the customer first);
+  - their loans leave the loan portfolio as negative deltas (app.crud.portfolio);
+  - the customers are deleted with one DELETE ... RETURNING;
+  - their cached profiles are invalidated on commit;
+
+and the chunk commits, so an interrupted purge keeps what it has deleted and running it
+again reports those customers as not found.
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterable
+
+from dotenv import load_dotenv
+from sqlalchemy import select, delete, func, Integer, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import unnest_rows
+from app.crud.portfolio import record_loans_removed
+from app.models import CustomerDetail, CustomerAccounts, SavingAccountDetail, LoanAccountDetail
+from app.services.customer_cache import mark_customer_changed
+
+load_dotenv()
+
+logger = logging.getLogger("customer_purge")
+
+PURGE_CHUNK_CUSTOMERS = int(os.environ.get("PURGE_CHUNK_CUSTOMERS", "1000"))
+
+
+@dataclass
+class PurgeStats:
+    requested: int = 0
+    total: int = 0       # distinct customers to delete
+    processed: int = 0   # of those, how many have been through a committed chunk
+    deleted: int = 0
+    accounts: int = 0
+    not_found: list = field(default_factory=list)  # the CustIDs and emails that matched no customer
+    seconds: float = 0.0
+    done: bool = False
+
+    @property
+    def customers_per_second(self) -> float:
+        return round(self.deleted / self.seconds, 1) if self.seconds else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "requested": self.requested,
+            "total": self.total,
+            "processed": self.processed,
+            "deleted": self.deleted,
+            "accounts": self.accounts,
+            "seconds": round(self.seconds, 2),
+            "customers_per_second": self.customers_per_second,
+            "done": self.done,
+        }
+
+
+async def delete_customers(db: AsyncSession, cust_ids: list[int]) -> tuple[list[int], int]:
+    """Delete these customers with everything they own, in db's transaction (not
+    committed). Returns the CustIDs deleted and how many accounts went with them."""
+    if not cust_ids:
+        return [], 0
+    customers = unnest_rows(CustID=(Integer, cust_ids))
+    accounts = (await db.execute(
+        select(func.count()).select_from(CustomerAccounts).join(customers, customers.c.CustID == CustomerAccounts.CustID)
+    )).scalar_one()
+    if accounts:
+        for detail in (LoanAccountDetail, SavingAccountDetail):
+            await db.execute(
+                select(detail.AcctNum)
+                .join(CustomerAccounts, CustomerAccounts.AcctNum == detail.AcctNum)
+                .join(customers, customers.c.CustID == CustomerAccounts.CustID)
+                .order_by(detail.AcctNum)
+                .with_for_update(of=detail)
+            )
+        await record_loans_removed(db, cust_ids)
+    deleted = list((await db.execute(
+        delete(CustomerDetail)
+        .where(CustomerDetail.CustID.in_(select(customers.c.CustID)))
+        .returning(CustomerDetail.CustID)
+    )).scalars())
+    mark_customer_changed(db, *deleted)
+    return deleted, accounts
+
+
+async def customer_ids_by_email(db: AsyncSession, emails: list[str]) -> dict[str, int]:
+    """The CustIDs of these emails (matched case-insensitively), keyed by lowercased email."""
+    if not emails:
+        return {}
+    wanted = unnest_rows(email=(String, [e.lower() for e in emails]))
+    rows = await db.execute(
+        select(wanted.c.email, CustomerDetail.CustID)
+        .join_from(CustomerDetail, wanted, func.lower(CustomerDetail.EmailID) == wanted.c.email)
+    )
+    return dict(rows.all())
+
+
+async def iter_purge(
+    db: AsyncSession,
+    cust_ids: Iterable[int] = (),
+    emails: Iterable[str] = (),
+    chunk: int = PURGE_CHUNK_CUSTOMERS,
+) -> AsyncIterator[PurgeStats]:
+    """Delete customers given by CustID and/or email, committing every `chunk` customers.
+    Yields the running stats after each chunk and once more when done; identifiers that
+    match no customer are collected in them and never fail the purge."""
+    started = time.perf_counter()
+    wanted_ids = set(cust_ids)
+    emails = list(dict.fromkeys(emails))
+    stats = PurgeStats(requested=len(wanted_ids) + len(emails))
+    by_email = await customer_ids_by_email(db, emails)
+    stats.not_found += [email for email in emails if email.lower() not in by_email]
+    email_of = {cust_id: email for email, cust_id in by_email.items()}
+    ids = sorted(wanted_ids | set(email_of))
+    stats.total = len(ids)
+
+    for start in range(0, len(ids), chunk):
+        batch = ids[start:start + chunk]
+        deleted, accounts = await delete_customers(db, batch)
+        await db.commit()
+        gone = set(deleted)
+        stats.processed += len(batch)
+        stats.deleted += len(deleted)
+        stats.accounts += accounts
+        # deleted meanwhile by someone else: reported as asked for
+        stats.not_found += [cust_id if cust_id in wanted_ids else email_of[cust_id] for cust_id in batch if cust_id not in gone]
+        stats.seconds = time.perf_counter() - started
+        logger.info("CUSTOMER.PURGE processed=%s/%s deleted=%s accounts=%s customers_per_second=%s",
+                    stats.processed, stats.total, stats.deleted, stats.accounts, stats.customers_per_second)
+        yield stats
+    stats.seconds = time.perf_counter() - started
+    stats.done = True
+    yield stats
+
+
+async def purge_customers(
+    db: AsyncSession, cust_ids: Iterable[int] = (), emails: Iterable[str] = (), chunk: int = PURGE_CHUNK_CUSTOMERS
+) -> PurgeStats:
+    """iter_purge run to the end: the final stats."""
+    async for stats in iter_purge(db, cust_ids, emails, chunk):
+        pass
+    return stats
@@ -0,0 +1,318 @@
+# app/crud/loans.py
+"""EMI amortization schedules for loan accounts.
+
+A schedule is generated entirely in Postgres NUMERIC by one INSERT ... SELECT, so
+scheduling one loan or thousands of loans costs a single statement and no
+per-installment Python: the growth factors of every distinct (rate, duration) are
+expanded over generate_series(1, LoanDuration) once and joined to the loans. With
+principal P, monthly rate r = RateOfInterest / 1200 and n installments:
+
+    EMI   = round(P * r * (1+r)^n / ((1+r)^n - 1), 2)       (P / n when r = 0)
+    B(k)  = P * (1+r)^k - EMI * ((1+r)^k - 1) / r           balance after k payments
+
+RemainingBalance is B(k) rounded to the cent; the last installment is EMI + B(n), so it
+absorbs the rounding of EMI and the loan closes at exactly 0. Installment k is due
+k - 1 months after the first due date (month ends clamp, e.g. Jan 31 -> Feb 28).
+
+EMI payments (pay_emis) lock the loan row before touching any of its installments, so
+the loan row serializes every payment of that loan.
+"""
+import calendar
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import (
+    select, insert, update, exists, and_, case, cast, func, literal,
+    BigInteger, Boolean, Date, Integer, Numeric, String,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import unnest_rows
+from app.models import LoanAccountDetail, LoanEMIDetail, CustomerAccounts
+from app.crud.savings import PostingError, PostingResult, BatchPosting, ZERO, lock_accounts, write_postings
+from app.crud.portfolio import record_emi_payments
+from app.services.customer_cache import mark_balances_changed
+
+CENT = Decimal("0.01")
+
+
+def first_due_date(start: date) -> date:
+    """One month after `start`, clamped to the end of a shorter month."""
+    year, month = (start.year + 1, 1) if start.month == 12 else (start.year, start.month + 1)
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def _loans(emi_ids: list[int]):
+    """The listed loans that have valid terms and no schedule yet, with their rounded EMI."""
+    L, E = LoanAccountDetail, LoanEMIDetail
+    ids = unnest_rows(emi_id=(Integer, emi_ids))
+    rate = cast(L.RateOfInterest, Numeric) / 1200
+    growth = func.power(1 + rate, L.LoanDuration)
+    emi = case(
+        (L.RateOfInterest == 0, func.round(L.TotalLoanAmount / L.LoanDuration, 2)),
+        else_=func.round(L.TotalLoanAmount * rate * growth / (growth - 1), 2),
+    )
+    return (
+        select(
+            L.EMIID, L.AcctNum, L.RateOfInterest, L.LoanDuration,
+            L.TotalLoanAmount.label("principal"), emi.label("emi"),
+        )
+        .join(ids, ids.c.emi_id == L.EMIID)
+        .where(and_(
+            L.LoanDuration > 0,
+            L.TotalLoanAmount > 0,
+            L.RateOfInterest >= 0,
+            ~exists().where(E.EMIID == L.EMIID),
+        ))
+        .cte("loans")
+    )
+
+
+def _factors(loans):
+    """(1+r)^k and ((1+r)^k - 1) / r for every distinct (rate, duration) among `loans`.
+
+    Loans share a handful of rate/term pairs, so the powers are computed once per pair and
+    installment number rather than once per installment row. MATERIALIZED keeps Postgres
+    from inlining the CTE and re-evaluating the powers for every joined row.
+    """
+    terms = select(loans.c.RateOfInterest, loans.c.LoanDuration).distinct().subquery("terms")
+    rate = cast(terms.c.RateOfInterest, Numeric) / 1200
+    k = func.generate_series(1, terms.c.LoanDuration).column_valued("k")
+    growth = func.power(1 + rate, k)
+    return (
+        select(
+            terms.c.RateOfInterest, terms.c.LoanDuration, k.label("k"), growth.label("growth"),
+            case((terms.c.RateOfInterest == 0, k), else_=(growth - 1) / rate).label("annuity"),
+        )
+        .cte("factors")
+        .prefix_with("MATERIALIZED")
+    )
+
+
+def _schedule_insert(emi_ids: list[int], first_due: date):
+    loans = _loans(emi_ids)
+    f = _factors(loans)
+    # B(k) = P * (1+r)^k - EMI * ((1+r)^k - 1) / r, which is P - EMI * k when r = 0
+    owed = func.round(loans.c.principal * f.c.growth - loans.c.emi * f.c.annuity, 2)
+    last = f.c.k == loans.c.LoanDuration
+    rows = (
+        select(
+            loans.c.EMIID,
+            loans.c.AcctNum,
+            cast(literal(first_due, Date) + func.make_interval(0, f.c.k - 1), Date),
+            case((last, loans.c.emi + owed), else_=loans.c.emi),
+            literal("Pending", String),
+            literal(False, Boolean),
+            case((last, 0), else_=owed),
+        )
+        .select_from(loans)
+        .join(f, and_(f.c.RateOfInterest == loans.c.RateOfInterest, f.c.LoanDuration == loans.c.LoanDuration))
+    )
+    return insert(LoanEMIDetail).from_select(
+        ["EMIID", "AcctNum", "EMIDate", "EMIAmount", "EMIStatus", "EMIReminder", "RemainingBalance"], rows
+    )
+
+
+async def create_emi_schedules(db: AsyncSession, emi_ids: list[int], first_due: date) -> int:
+    """Insert the full EMI schedule of every listed loan that has none yet; returns rows inserted.
+
+    Loans already scheduled, or with a missing/non-positive amount or duration, are skipped,
+    so re-running over the same ids is harmless. Does not commit.
+    """
+    if not emi_ids:
+        return 0
+    result = await db.execute(_schedule_insert(emi_ids, first_due))
+    return result.rowcount
+
+
+@dataclass
+class EMIPayment:
+    index: int
+    cust_id: int
+    acct_num: int                   # loan account
+    emi_num: int | None             # None: the earliest pending installment
+    paid_date: date
+    from_acct: int | None = None    # savings account of the same customer to debit
+
+
+@dataclass
+class EMIPaid:
+    EMINum: int
+    EMIID: int
+    AcctNum: int
+    EMIAmount: Decimal
+    EMIDate: date
+    PaidDate: date
+    Interest: Decimal
+    Principal: Decimal
+    BalanceAmount: Decimal          # loan balance after this payment (= the EMI's RemainingBalance)
+    Savings: PostingResult | None = None
+
+
+async def _lock_loans(db: AsyncSession, acct_nums) -> dict:
+    # Always in AcctNum order, like lock_accounts, so concurrent batches cannot deadlock
+    L = LoanAccountDetail
+    res = await db.execute(
+        select(
+            L.AcctNum, L.EMIID, L.BalanceAmount, L.RateOfInterest, L.BranchCode, L.LoanAccountTypeId,
+            CustomerAccounts.CustID,
+        )
+        .join(CustomerAccounts, CustomerAccounts.AcctNum == L.AcctNum)
+        .where(L.AcctNum.in_(sorted(acct_nums)))
+        .order_by(L.AcctNum)
+        .with_for_update(of=L)
+    )
+    return {row.AcctNum: row for row in res.all()}
+
+
+async def _pending_emis(db: AsyncSession, wanted: dict[int, int]) -> dict[int, list]:
+    """The first `wanted[EMIID]` pending installments of each loan in due order, each with
+    the loan's total number of pending installments."""
+    E = LoanEMIDetail
+    ranked = (
+        select(
+            E.EMINum, E.EMIID, E.EMIAmount, E.EMIDate,
+            func.row_number().over(partition_by=E.EMIID, order_by=(E.EMIDate, E.EMINum)).label("n"),
+            func.count().over(partition_by=E.EMIID).label("pending"),
+        )
+        .where(and_(E.EMIID.in_(list(wanted)), E.EMIStatus == "Pending"))
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(ranked).where(ranked.c.n <= max(wanted.values())).order_by(ranked.c.EMIID, ranked.c.n)
+    )).all()
+    out: dict[int, list] = defaultdict(list)
+    for row in rows:
+        if row.n <= wanted[row.EMIID]:
+            out[row.EMIID].append(row)
+    return out
+
+
+async def _explain_emi(db: AsyncSession, emi_id: int, emi_num: int) -> PostingError:
+    # Only for a requested EMINum that is not the loan's next pending installment
+    status_ = (await db.execute(
+        select(LoanEMIDetail.EMIStatus).where(and_(LoanEMIDetail.EMINum == emi_num, LoanEMIDetail.EMIID == emi_id))
+    )).scalar_one_or_none()
+    if status_ is None:
+        return PostingError(404, "EMI not found for loan")
+    if status_ == "Paid":
+        return PostingError(409, "EMI already paid")
+    return PostingError(409, "An earlier EMI is still pending")
+
+
+async def pay_emis(db: AsyncSession, payments: list[EMIPayment]) -> dict[int, EMIPaid | PostingError]:
+    """Pay loan installments, optionally debiting a savings account, in one transaction.
+
+    Loans are locked in AcctNum order, then the savings accounts to debit (loan rows
+    before savings rows, everywhere), so a retried or parallel payment of the same
+    installment waits for the first one and then finds it paid. Installments are paid in
+    due order: an item without EMINum pays the loan's earliest pending installment, an
+    item naming another installment is rejected. Interest is the loan balance times the
+    monthly rate, the rest of the EMI reduces BalanceAmount (the last installment clears
+    it), and the new balance is stored as the installment's RemainingBalance. All writes
+    are set-based: one UPDATE per table over unnest(...) arrays, write_postings for the
+    savings debits and one insert of portfolio deltas. Rejected items do not affect the
+    others. Returns the outcome per EMIPayment.index; the caller commits.
+    """
+    outcomes: dict[int, EMIPaid | PostingError] = {}
+    if not payments:
+        return outcomes
+
+    loans = await _lock_loans(db, {p.acct_num for p in payments})
+    debit_accts = {p.from_acct for p in payments if p.from_acct is not None}
+    savings = await lock_accounts(db, debit_accts) if debit_accts else {}
+
+    wanted: dict[int, int] = defaultdict(int)
+    for p in payments:
+        loan = loans.get(p.acct_num)
+        if loan is not None and loan.CustID == p.cust_id:
+            wanted[loan.EMIID] += 1
+    pending = await _pending_emis(db, wanted) if wanted else {}
+
+    paid: list[EMIPaid] = []
+    loan_balances: dict[int, Decimal] = {}
+    savings_balances: dict[int, Decimal] = {}
+    debits: list[tuple[BatchPosting, PostingResult]] = []
+    taken: dict[int, int] = defaultdict(int)
+    for p in payments:
+        loan = loans.get(p.acct_num)
+        if loan is None or loan.CustID != p.cust_id:
+            outcomes[p.index] = PostingError(404, "Loan account not found for customer")
+            continue
+        queue = pending.get(loan.EMIID, [])
+        if taken[loan.EMIID] >= len(queue):
+            outcomes[p.index] = (
+                await _explain_emi(db, loan.EMIID, p.emi_num) if p.emi_num is not None
+                else PostingError(409, "No pending EMI for loan")
+            )
+            continue
+        emi = queue[taken[loan.EMIID]]
+        if p.emi_num is not None and p.emi_num != emi.EMINum:
+            outcomes[p.index] = await _explain_emi(db, loan.EMIID, p.emi_num)
+            continue
+
+        debit = None
+        if p.from_acct is not None:
+            acct = savings.get(p.from_acct)
+            if acct is None or acct.CustID != p.cust_id:
+                outcomes[p.index] = PostingError(404, "Savings account not found for customer")
+                continue
+            running = savings_balances.get(p.from_acct, acct.Balance or ZERO) - emi.EMIAmount
+            if running < 0:
+                outcomes[p.index] = PostingError(409, "Insufficient funds")
+                continue
+            savings_balances[p.from_acct] = running
+            debit = (
+                BatchPosting(p.index, p.cust_id, p.from_acct, -emi.EMIAmount, p.paid_date,
+                             f"EMI {emi.EMINum} for loan {p.acct_num}"),
+                PostingResult(TxnID=0, AcctNum=p.from_acct, TxnDate=p.paid_date, NewBalance=running),
+            )
+            debits.append(debit)
+
+        balance = loan_balances.get(p.acct_num, loan.BalanceAmount or ZERO)
+        interest = (balance * (loan.RateOfInterest or ZERO) / 1200).quantize(CENT, ROUND_HALF_UP)
+        last = taken[loan.EMIID] + 1 == emi.pending
+        principal = balance if last else min(max(emi.EMIAmount - interest, ZERO), balance)
+        loan_balances[p.acct_num] = balance - principal
+        taken[loan.EMIID] += 1
+
+        result = EMIPaid(
+            EMINum=emi.EMINum, EMIID=loan.EMIID, AcctNum=p.acct_num, EMIAmount=emi.EMIAmount,
+            EMIDate=emi.EMIDate, PaidDate=p.paid_date, Interest=interest, Principal=principal,
+            BalanceAmount=loan_balances[p.acct_num], Savings=debit[1] if debit else None,
+        )
+        outcomes[p.index] = result
+        paid.append(result)
+
+    if not paid:
+        return outcomes
+
+    E, L = LoanEMIDetail, LoanAccountDetail
+    amount = Numeric(18, 2)
+    emis = unnest_rows(
+        EMINum=(Integer, [r.EMINum for r in paid]),
+        PaidDate=(Date, [r.PaidDate for r in paid]),
+        RemainingBalance=(amount, [r.BalanceAmount for r in paid]),
+    )
+    await db.execute(
+        update(E)
+        .where(E.EMINum == emis.c.EMINum)
+        .values(EMIStatus="Paid", PaidDate=emis.c.PaidDate, RemainingBalance=emis.c.RemainingBalance)
+        .execution_options(synchronize_session=False)
+    )
+    balances = unnest_rows(AcctNum=(BigInteger, list(loan_balances)), BalanceAmount=(amount, list(loan_balances.values())))
+    await db.execute(
+        update(L)
+        .where(L.AcctNum == balances.c.AcctNum)
+        .values(BalanceAmount=balances.c.BalanceAmount)
+        .execution_options(synchronize_session=False)
+    )
+    await write_postings(db, debits, savings_balances)
+    await record_emi_payments(db, [
+        (loans[r.AcctNum].BranchCode, loans[r.AcctNum].LoanAccountTypeId, r.Principal,
+         loans[r.AcctNum].RateOfInterest or ZERO, r.EMIDate, r.EMIAmount)
+        for r in paid
+    ])
+    mark_balances_changed(db, {r.AcctNum: loans[r.AcctNum].CustID for r in paid})
+    return outcomes
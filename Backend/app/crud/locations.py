@@ -0,0 +1,94 @@
+# app/crud/locations.py
+"""Find-or-create for the location hierarchy (Country -> State -> City -> PostalCode).
+
+Names are unique case-insensitively under their parent (the uq_*_name_lower indexes), and
+every insert here targets those keys with ON CONFLICT DO UPDATE ... RETURNING: a no-op
+update that locks and returns the existing row, including one a concurrent transaction
+has just committed, where DO NOTHING would return nothing and a follow-up SELECT in the
+same statement would not see it. So concurrent onboardings naming the same new city all
+get the one City row instead of racing to create copies.
+"""
+from sqlalchemy import select, exists, bindparam, union_all, func, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import PostalCode, City, State, Country
+
+# name and parent column of each level; the conflict target is (lower(name)[, parent])
+LEVELS = {
+    Country: (Country.CountryName, None),
+    State: (State.StateName, State.CountryCode),
+    City: (City.CityName, City.StateCode),
+}
+
+
+def upsert_level(model, source):
+    """INSERT INTO model (name[, parent]) `source` (a select of those columns), returning
+    the row of every name: created, or existing with its existing spelling."""
+    name_col, parent_col = LEVELS[model]
+    columns = [name_col] if parent_col is None else [name_col, parent_col]
+    return (
+        pg_insert(model)
+        .from_select([column.key for column in columns], source)
+        .on_conflict_do_update(index_elements=[func.lower(name_col), *columns[1:]], set_={name_col.key: name_col})
+    )
+
+
+def _find_or_create(model, name, parent=None, only_if=None):
+    """A CTE with the code of the named row: found when it is visible to the statement,
+    otherwise upserted (so only a row being created concurrently is locked, not every
+    existing country a new ZIP is added under)."""
+    name_col, parent_col = LEVELS[model]
+    pk = model.__mapper__.primary_key[0]
+    match = [func.lower(name_col) == func.lower(name)]
+    source = select(name)
+    if parent is not None:
+        match.append(parent_col == parent.c.code)
+        source = select(name, parent.c.code)
+    where = [only_if] if only_if is not None else []
+    created = (
+        upsert_level(model, source.where(*where, ~exists().where(*match)))
+        .returning(pk.label("code"))
+        .cte(f"created_{model.__tablename__.lower()}")
+    )
+    found = select(pk.label("code")).where(*where, *match)
+    if parent is not None:
+        found = found.select_from(parent)
+    return union_all(select(created.c.code), found).cte(model.__tablename__.lower())
+
+
+def _postal_chain():
+    zip_code = bindparam("zip_code", type_=String)
+    country = _find_or_create(
+        Country, bindparam("country_name", type_=String), only_if=~exists().where(PostalCode.ZIPCode == zip_code)
+    )
+    state = _find_or_create(State, bindparam("state_name", type_=String), country)
+    city = _find_or_create(City, bindparam("city_name", type_=String), state)
+    postal = (
+        pg_insert(PostalCode)
+        .from_select(["ZIPCode", "CityCode"], select(zip_code, city.c.code))
+        .on_conflict_do_update(index_elements=[PostalCode.ZIPCode], set_={"CityCode": PostalCode.CityCode})
+        .returning(PostalCode.ZIPCode)
+        .cte("postal")
+    )
+    return select(exists().select_from(postal))
+
+
+# PostgreSQL INSERT constructs have no compiled-statement cache key, so this one would be
+# recompiled on every call (~10 ms of event-loop time); compile it once per dialect instead
+_POSTAL_CHAIN = _postal_chain()
+_compiled: dict = {}
+
+
+async def upsert_postal_code(db: AsyncSession, zip_code: str, city_name: str, state_name: str, country_name: str) -> bool:
+    """Make sure zip_code exists, creating it with its City, State and Country (found or
+    created by name) when it does not, in one statement. Returns whether it was created.
+
+    An existing ZIP is kept as it is: the names are then not looked up or created.
+    """
+    conn = await db.connection()
+    compiled = _compiled.get(conn.dialect.name)
+    if compiled is None:
+        compiled = _compiled[conn.dialect.name] = _POSTAL_CHAIN.compile(dialect=conn.dialect)
+    values = {"zip_code": zip_code, "city_name": city_name, "state_name": state_name, "country_name": country_name}
+    params = tuple(values[name] for name in compiled.positiontup)
+    return (await conn.exec_driver_sql(str(compiled), params)).scalar_one()
@@ -0,0 +1,143 @@
+# app/crud/portfolio.py
+"""Loan portfolio analytics: outstanding principal, weighted average rate and overdue
+EMIs per (BranchCode, LoanAccountTypeId).
+
+LoanPortfolioAggregate holds the totals as of the last full rebuild
+(app.jobs.portfolio_reconcile); every loan opening and EMI payment since then appends a
+LoanPortfolioDelta row in its own transaction (and deleting a customer, negative ones for
+their loans). Reads add the two, which only touches one
+row per group plus the deltas written since the last rebuild. Overdue counts are as of
+the rebuild date (AsOf): an installment paid later takes itself out of the overdue
+figures if it was due before AsOf, installments falling overdue after AsOf are counted
+by the next rebuild.
+"""
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, insert, union_all, case, func, literal, Date, Integer, Numeric, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import unnest_rows
+from app.models import LoanPortfolioAggregate, LoanPortfolioDelta, LoanAccountDetail, LoanEMIDetail, CustomerAccounts
+
+
+def portfolio_key(branch_code: str | None, loan_type_id: int | None) -> tuple[str, int]:
+    return branch_code or "", loan_type_id or 0
+
+
+async def record_loan_opened(
+    db: AsyncSession, branch_code: str | None, loan_type_id: int | None, principal: Decimal, rate: Decimal
+):
+    branch, type_id = portfolio_key(branch_code, loan_type_id)
+    await db.execute(insert(LoanPortfolioDelta).values(
+        BranchCode=branch, LoanAccountTypeId=type_id, LoanCount=1,
+        OutstandingPrincipal=principal, RateWeightedPrincipal=principal * rate,
+    ))
+
+
+async def record_emi_payments(db: AsyncSession, payments: list[tuple[str | None, int | None, Decimal, Decimal, date, Decimal]]):
+    """(BranchCode, LoanAccountTypeId, principal repaid, rate, EMIDate, EMIAmount) per paid installment."""
+    if not payments:
+        return
+    keys = [portfolio_key(branch, type_id) for branch, type_id, *_ in payments]
+    rows = unnest_rows(
+        BranchCode=(String, [k[0] for k in keys]),
+        LoanAccountTypeId=(Integer, [k[1] for k in keys]),
+        OutstandingPrincipal=(Numeric(18, 2), [-principal for _, _, principal, _, _, _ in payments]),
+        RateWeightedPrincipal=(Numeric(24, 4), [-principal * rate for _, _, principal, rate, _, _ in payments]),
+        PaidEMIDueDate=(Date, [due for *_, due, _ in payments]),
+        PaidEMIAmount=(Numeric(18, 2), [amount for *_, amount in payments]),
+    )
+    await db.execute(insert(LoanPortfolioDelta).from_select(
+        ["BranchCode", "LoanAccountTypeId", "OutstandingPrincipal", "RateWeightedPrincipal", "PaidEMIDueDate",
+         "PaidEMIAmount", "LoanCount"],
+        select(rows, literal(0, Integer)),
+    ))
+
+
+async def record_loans_removed(db: AsyncSession, cust_ids: list[int]):
+    """Take the loans of these customers, about to be deleted, out of the portfolio: one
+    delta per group for their count and balances, and one per pending installment the
+    aggregate counts as overdue (due before its AsOf), like a payment of it. Lock the
+    loans first (as EMI payments do) so that the balances stay what was subtracted."""
+    L, E, C = LoanAccountDetail, LoanEMIDetail, CustomerAccounts
+    customers = unnest_rows(CustID=(Integer, cust_ids))
+    loans = select(L.EMIID).join_from(L, C, C.AcctNum == L.AcctNum).join(customers, customers.c.CustID == C.CustID)
+    if not (await db.execute(loans.with_for_update(of=L))).first():
+        return
+    branch = func.coalesce(L.BranchCode, "")
+    type_id = func.coalesce(L.LoanAccountTypeId, 0)
+    balance = func.coalesce(L.BalanceAmount, 0)
+    closed = (
+        loans.with_only_columns(
+            branch, type_id, -func.count(), -func.sum(balance), -func.sum(balance * func.coalesce(L.RateOfInterest, 0)),
+            literal(None, Date), literal(None, Numeric(18, 2)),
+        )
+        .group_by(branch, type_id)
+    )
+    overdue = (
+        loans.with_only_columns(branch, type_id, literal(0), literal(0), literal(0), E.EMIDate, E.EMIAmount)
+        .join(E, E.EMIID == L.EMIID)
+        .where(E.EMIStatus == "Pending", E.EMIDate < select(func.max(LoanPortfolioAggregate.AsOf)).scalar_subquery())
+    )
+    await db.execute(insert(LoanPortfolioDelta).from_select(
+        ["BranchCode", "LoanAccountTypeId", "LoanCount", "OutstandingPrincipal", "RateWeightedPrincipal",
+         "PaidEMIDueDate", "PaidEMIAmount"],
+        union_all(closed, overdue),
+    ))
+
+
+async def read_portfolio(db: AsyncSession, branch_code: str | None = None, loan_type_id: int | None = None) -> dict:
+    A, D = LoanPortfolioAggregate, LoanPortfolioDelta
+    as_of = select(func.max(A.AsOf)).scalar_subquery()
+    refreshed_at = select(func.max(A.RefreshedAt)).scalar_subquery()
+    overdue_paid = D.PaidEMIDueDate < as_of
+    parts = [
+        select(A.BranchCode, A.LoanAccountTypeId, A.LoanCount, A.OutstandingPrincipal, A.RateWeightedPrincipal,
+               A.OverdueEMICount, A.OverdueAmount),
+        select(D.BranchCode, D.LoanAccountTypeId, D.LoanCount, D.OutstandingPrincipal, D.RateWeightedPrincipal,
+               case((overdue_paid, -1), else_=0), case((overdue_paid, -D.PaidEMIAmount), else_=0)),
+    ]
+    if branch_code is not None:
+        parts = [p.where(p.selected_columns.BranchCode == branch_code) for p in parts]
+    if loan_type_id is not None:
+        parts = [p.where(p.selected_columns.LoanAccountTypeId == loan_type_id) for p in parts]
+    combined = union_all(*parts).subquery()
+    c = combined.c
+    rows = (await db.execute(
+        select(
+            c.BranchCode, c.LoanAccountTypeId,
+            func.sum(c.LoanCount).label("LoanCount"),
+            func.sum(c.OutstandingPrincipal).label("OutstandingPrincipal"),
+            func.sum(c.RateWeightedPrincipal).label("RateWeightedPrincipal"),
+            func.sum(c.OverdueEMICount).label("OverdueEMICount"),
+            func.sum(c.OverdueAmount).label("OverdueAmount"),
+        )
+        .group_by(c.BranchCode, c.LoanAccountTypeId)
+        .order_by(c.BranchCode, c.LoanAccountTypeId)
+    )).all()
+    stamps = (await db.execute(select(as_of, refreshed_at))).one()
+
+    def weighted(rate_weighted: Decimal, outstanding: Decimal) -> Decimal | None:
+        return (rate_weighted / outstanding).quantize(Decimal("0.0001")) if outstanding else None
+
+    groups = [
+        {
+            "BranchCode": row.BranchCode,
+            "LoanAccountTypeId": row.LoanAccountTypeId,
+            "LoanCount": row.LoanCount,
+            "OutstandingPrincipal": row.OutstandingPrincipal,
+            "WeightedAvgRate": weighted(row.RateWeightedPrincipal, row.OutstandingPrincipal),
+            "OverdueEMICount": row.OverdueEMICount,
+            "OverdueAmount": row.OverdueAmount,
+        }
+        for row in rows
+    ]
+    outstanding = sum((r.OutstandingPrincipal for r in rows), Decimal("0.00"))
+    totals = {
+        "LoanCount": sum(r.LoanCount for r in rows),
+        "OutstandingPrincipal": outstanding,
+        "WeightedAvgRate": weighted(sum((r.RateWeightedPrincipal for r in rows), Decimal("0")), outstanding),
+        "OverdueEMICount": sum(r.OverdueEMICount for r in rows),
+        "OverdueAmount": sum((r.OverdueAmount for r in rows), Decimal("0.00")),
+    }
+    return {"AsOf": stamps[0], "RefreshedAt": stamps[1], "groups": groups, "totals": totals}
@@ -0,0 +1,328 @@
+# app/crud/savings.py
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, update, insert, and_, func, literal, true, tuple_, Date, Text, Numeric, Integer, BigInteger
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.db import unnest_rows
+from app.models import SavingAccountDetail, SavingAccountTxnHistory, CustomerAccounts
+from app.crud.snapshots import apply_to_snapshots
+from app.services.ids import txn_ids
+from app.services.customer_cache import mark_balances_changed
+
+ZERO = Decimal("0.00")
+
+
+class PostingError(Exception):
+    """Raised when a posting cannot be applied; carries the HTTP status the route should return."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class PostingResult:
+    TxnID: int
+    AcctNum: int
+    TxnDate: date
+    NewBalance: Decimal
+
+
+def _posting_statement(cust_id: int, acct_num: int, delta: Decimal, txn_id: int, txn_date: date, txn_detail: str | None):
+    """Build the single statement that posts `delta` to a savings account.
+
+    WITH posted AS (UPDATE balance ... WHERE owned AND balance + delta >= 0 RETURNING ...)
+    INSERT INTO history SELECT ... FROM posted RETURNING TxnID, Balance
+
+    The UPDATE takes the row lock, so concurrent postings to the same account
+    serialize on it and each one sees the balance committed by the previous one.
+    """
+    owned = (
+        select(CustomerAccounts.AcctNum)
+        .where(and_(CustomerAccounts.CustID == cust_id, CustomerAccounts.AcctNum == acct_num))
+        .exists()
+    )
+    new_balance = func.coalesce(SavingAccountDetail.Balance, 0) + delta
+    posted = (
+        update(SavingAccountDetail)
+        .where(and_(SavingAccountDetail.AcctNum == acct_num, owned, new_balance >= 0))
+        .values(Balance=new_balance)
+        .returning(SavingAccountDetail.AcctNum, SavingAccountDetail.Balance)
+        .cte("posted")
+    )
+    return (
+        insert(SavingAccountTxnHistory)
+        .from_select(
+            ["TxnID", "TxnDate", "AcctNum", "TxnDetail", "WithdrawAmount", "DepositAmount", "Balance"],
+            select(
+                literal(txn_id, Integer),
+                literal(txn_date, Date),
+                posted.c.AcctNum,
+                literal(txn_detail, Text),
+                literal(-delta if delta < 0 else ZERO, Numeric(18, 2)),
+                literal(delta if delta > 0 else ZERO, Numeric(18, 2)),
+                posted.c.Balance,
+            ),
+        )
+        .returning(SavingAccountTxnHistory.TxnID, SavingAccountTxnHistory.Balance)
+    )
+
+
+async def _explain_rejected_posting(db: AsyncSession, cust_id: int, acct_num: int) -> PostingError:
+    # Only runs when the posting statement matched no row, to tell the caller why.
+    res = await db.execute(
+        select(CustomerAccounts.AcctNum, SavingAccountDetail.AcctNum)
+        .outerjoin(SavingAccountDetail, SavingAccountDetail.AcctNum == CustomerAccounts.AcctNum)
+        .where(and_(CustomerAccounts.CustID == cust_id, CustomerAccounts.AcctNum == acct_num))
+    )
+    row = res.first()
+    if row is None:
+        return PostingError(404, "Account not found for customer")
+    if row[1] is None:
+        return PostingError(404, "Saving account detail not found")
+    return PostingError(409, "Insufficient funds")
+
+
+async def post_savings_txn(
+    db: AsyncSession,
+    cust_id: int,
+    acct_num: int,
+    delta: Decimal,
+    txn_date: date,
+    txn_detail: str | None = None,
+) -> PostingResult:
+    """Apply a signed amount to a savings account and record it in the history.
+
+    Ownership check, insufficient-funds guard, balance update and history insert run as
+    one statement, followed by the monthly snapshot upkeep. The caller owns the
+    transaction and must commit.
+    Raises PostingError when the account is not owned/found or funds are insufficient.
+    """
+    txn_id = await txn_ids.next_id(db)
+    row = (await db.execute(_posting_statement(cust_id, acct_num, delta, txn_id, txn_date, txn_detail))).first()
+    if row is None:
+        raise await _explain_rejected_posting(db, cust_id, acct_num)
+    # after the posting statement, so it runs under the row lock with a fresh snapshot
+    await apply_to_snapshots(db, [(acct_num, txn_date, delta)])
+    mark_balances_changed(db, {acct_num: cust_id})
+    return PostingResult(TxnID=row.TxnID, AcctNum=acct_num, TxnDate=txn_date, NewBalance=row.Balance)
+
+
+@dataclass
+class BatchPosting:
+    index: int
+    cust_id: int
+    acct_num: int
+    delta: Decimal
+    txn_date: date
+    txn_detail: str | None = None
+
+
+async def post_savings_batch(db: AsyncSession, postings: list[BatchPosting]) -> dict[int, PostingResult | PostingError]:
+    """Apply many postings across many accounts in one transaction.
+
+    Accounts are locked once (SELECT ... FOR UPDATE in AcctNum order, so concurrent batches
+    cannot deadlock), each account's postings are applied in submission order with a running
+    balance, then all history rows go in with one bulk INSERT and each touched account gets
+    one balance UPDATE. A rejected posting (not owned, missing, insufficient funds) is skipped
+    without affecting the others. Returns the outcome per BatchPosting.index; the caller commits.
+    """
+    outcomes: dict[int, PostingResult | PostingError] = {}
+    if not postings:
+        return outcomes
+
+    locked = await lock_accounts(db, {p.acct_num for p in postings})
+
+    accepted: list[tuple[BatchPosting, PostingResult]] = []
+    new_balances: dict[int, Decimal] = {}
+    for p in postings:
+        acct = locked.get(p.acct_num)
+        if acct is None or acct.CustID != p.cust_id:
+            outcomes[p.index] = PostingError(404, "Account not found for customer")
+            continue
+        running = new_balances.get(p.acct_num, acct.Balance or ZERO) + p.delta
+        if running < 0:
+            outcomes[p.index] = PostingError(409, "Insufficient funds")
+            continue
+        new_balances[p.acct_num] = running
+        outcomes[p.index] = PostingResult(TxnID=0, AcctNum=p.acct_num, TxnDate=p.txn_date, NewBalance=running)
+        accepted.append((p, outcomes[p.index]))
+
+    await write_postings(db, accepted, new_balances)
+    return outcomes
+
+
+async def lock_accounts(db: AsyncSession, acct_nums) -> dict:
+    """Lock savings rows with SELECT ... FOR UPDATE, always in AcctNum order so that two
+    transactions locking overlapping accounts cannot deadlock. Returns rows by AcctNum."""
+    res = await db.execute(
+        select(
+            SavingAccountDetail.AcctNum, SavingAccountDetail.Balance,
+            SavingAccountDetail.TransferLimit, CustomerAccounts.CustID,
+        )
+        .join(CustomerAccounts, CustomerAccounts.AcctNum == SavingAccountDetail.AcctNum)
+        .where(SavingAccountDetail.AcctNum.in_(sorted(acct_nums)))
+        .order_by(SavingAccountDetail.AcctNum)
+        .with_for_update(of=SavingAccountDetail)
+    )
+    return {row.AcctNum: row for row in res.all()}
+
+
+async def write_postings(
+    db: AsyncSession, accepted: list[tuple[BatchPosting, PostingResult]], new_balances: dict[int, Decimal]
+):
+    """Write already-validated postings: one history INSERT ... SELECT FROM unnest(...), one
+    balance UPDATE ... FROM unnest(...) and the snapshot upserts, whatever the number of
+    postings. Fills in each PostingResult.TxnID. The caller must hold the row locks of the
+    accounts (lock_accounts or SELECT ... FOR UPDATE) and owns the transaction."""
+    if not accepted:
+        return
+    txn_ids_taken = await txn_ids.take(db, len(accepted))
+    for (_, result), txn_id in zip(accepted, txn_ids_taken):
+        result.TxnID = txn_id
+
+    amount = Numeric(18, 2)
+    history = unnest_rows(
+        TxnID=(Integer, txn_ids_taken),
+        TxnDate=(Date, [p.txn_date for p, _ in accepted]),
+        AcctNum=(BigInteger, [p.acct_num for p, _ in accepted]),
+        TxnDetail=(Text, [p.txn_detail for p, _ in accepted]),
+        WithdrawAmount=(amount, [-p.delta if p.delta < 0 else ZERO for p, _ in accepted]),
+        DepositAmount=(amount, [p.delta if p.delta > 0 else ZERO for p, _ in accepted]),
+        Balance=(amount, [result.NewBalance for _, result in accepted]),
+    )
+    await db.execute(insert(SavingAccountTxnHistory).from_select(list(history.c.keys()), select(history)))
+
+    balances = unnest_rows(AcctNum=(BigInteger, list(new_balances)), Balance=(amount, list(new_balances.values())))
+    await db.execute(
+        update(SavingAccountDetail)
+        .where(SavingAccountDetail.AcctNum == balances.c.AcctNum)
+        .values(Balance=balances.c.Balance)
+        .execution_options(synchronize_session=False)
+    )
+    await apply_to_snapshots(db, [(p.acct_num, p.txn_date, p.delta) for p, _ in accepted])
+    mark_balances_changed(db, {p.acct_num: p.cust_id for p, _ in accepted})
+
+
+@dataclass
+class TransferResult:
+    debit: PostingResult
+    credit: PostingResult
+
+
+async def transfer_between_savings(
+    db: AsyncSession,
+    cust_id: int,
+    from_acct: int,
+    to_acct: int,
+    amount: Decimal,
+    txn_date: date,
+    txn_detail: str | None = None,
+) -> TransferResult:
+    """Move `amount` from a savings account of `cust_id` to any savings account, atomically.
+
+    Both rows are locked in AcctNum order (so A->B and B->A transfers running at the same
+    time queue behind each other instead of deadlocking), the debit is checked against the
+    source's TransferLimit and balance, and both history rows plus both balance updates are
+    written in the same transaction. The caller commits.
+    """
+    if from_acct == to_acct:
+        raise PostingError(400, "Cannot transfer to the same account")
+
+    locked = await lock_accounts(db, {from_acct, to_acct})
+    source, target = locked.get(from_acct), locked.get(to_acct)
+    if source is None or source.CustID != cust_id:
+        raise PostingError(404, "Account not found for customer")
+    if target is None:
+        raise PostingError(404, "Destination saving account not found")
+    # TransferLimit NULL/0 means no limit
+    if source.TransferLimit and amount > source.TransferLimit:
+        raise PostingError(409, "Transfer limit exceeded")
+    if (source.Balance or ZERO) < amount:
+        raise PostingError(409, "Insufficient funds")
+
+    debit = BatchPosting(0, cust_id, from_acct, -amount, txn_date, txn_detail or f"Transfer to {to_acct}")
+    credit = BatchPosting(1, target.CustID, to_acct, amount, txn_date, txn_detail or f"Transfer from {from_acct}")
+    result = TransferResult(
+        debit=PostingResult(TxnID=0, AcctNum=from_acct, TxnDate=txn_date, NewBalance=(source.Balance or ZERO) - amount),
+        credit=PostingResult(TxnID=0, AcctNum=to_acct, TxnDate=txn_date, NewBalance=(target.Balance or ZERO) + amount),
+    )
+    await write_postings(
+        db,
+        [(debit, result.debit), (credit, result.credit)],
+        {from_acct: result.debit.NewBalance, to_acct: result.credit.NewBalance},
+    )
+    return result
+
+
+async def list_savings_txns(
+    db: AsyncSession,
+    acct_num: int,
+    limit: int,
+    after: tuple[date, int] | None = None,
+    from_date: date | None = None,
+    to_date: date | None = None,
+    min_amount: Decimal | None = None,
+    max_amount: Decimal | None = None,
+) -> list[SavingAccountTxnHistory]:
+    """One page of an account's history, newest first, keyset-paginated on (TxnDate, TxnID).
+
+    `after` is the (TxnDate, TxnID) of the last row of the previous page. The row comparison
+    continues the ix_savingtxn_acct_date_id range scan where the previous page stopped, so a
+    page costs the same however deep it is and however many rows the account has.
+    Amount filters match the moved amount (deposit or withdrawal).
+    """
+    filters = [SavingAccountTxnHistory.AcctNum == acct_num]
+    if after is not None:
+        filters.append(tuple_(SavingAccountTxnHistory.TxnDate, SavingAccountTxnHistory.TxnID) < tuple_(*after))
+    if from_date is not None:
+        filters.append(SavingAccountTxnHistory.TxnDate >= from_date)
+    if to_date is not None:
+        filters.append(SavingAccountTxnHistory.TxnDate <= to_date)
+    amount = func.coalesce(SavingAccountTxnHistory.DepositAmount, 0) + func.coalesce(SavingAccountTxnHistory.WithdrawAmount, 0)
+    if min_amount is not None:
+        filters.append(amount >= min_amount)
+    if max_amount is not None:
+        filters.append(amount <= max_amount)
+
+    res = await db.execute(
+        select(SavingAccountTxnHistory)
+        .where(and_(*filters))
+        .order_by(SavingAccountTxnHistory.TxnDate.desc(), SavingAccountTxnHistory.TxnID.desc())
+        .limit(limit)
+    )
+    return list(res.scalars().all())
+
+
+async def recent_savings_txns(db: AsyncSession, acct_nums: list[int], limit: int) -> dict[int, list[SavingAccountTxnHistory]]:
+    """The newest `limit` transactions of each account, newest first, in one query.
+
+    A LATERAL subquery per account walks ix_savingtxn_acct_date_id backwards and stops
+    after `limit` rows, so the cost does not depend on how long the histories are.
+    """
+    recent_by_acct: dict[int, list[SavingAccountTxnHistory]] = {acct: [] for acct in acct_nums}
+    if not acct_nums or limit <= 0:
+        return recent_by_acct
+    T = SavingAccountTxnHistory
+    recent = (
+        select(T)
+        .where(T.AcctNum == SavingAccountDetail.AcctNum)
+        .order_by(T.TxnDate.desc(), T.TxnID.desc())
+        .limit(limit)
+        .lateral("recent")
+    )
+    txn = aliased(T, recent)
+    res = await db.execute(
+        select(txn)
+        .select_from(SavingAccountDetail)
+        .join(recent, true())
+        .where(SavingAccountDetail.AcctNum.in_(acct_nums))
+        .order_by(txn.AcctNum, txn.TxnDate.desc(), txn.TxnID.desc())
+    )
+    for row in res.scalars():
+        recent_by_acct[row.AcctNum].append(row)
+    return recent_by_acct
@@ -0,0 +1,250 @@
+# app/crud/search.py
+"""Customer search (POST /customers/advSearch), backed by the expression indexes on
+CustomerDetail.
+
+- Names match case-insensitive substrings. A term of 3+ characters first narrows the
+  candidates to names containing all of its trigrams (FirstNameGrams/LastNameGrams, GIN),
+  then the LIKE rechecks them; shorter terms match name prefixes.
+- Email matches exactly, case-insensitively (lower(EmailID)).
+- Mobile matches Mobile or Phone on the last 10 digits, ignoring spaces, dashes,
+  brackets and country prefixes (customer_phone_key).
+
+Sorts: "relevance" puts customers whose name starts with the term first, in lowercased
+name order (so exact matches lead), then the remaining matches by CustID; when both
+names are given the last name is the ranked one. "custId" (and relevance without a name
+term) is CustID order. Both are total orders on (tier, key, custId), so pages continue
+by keyset from the last row. Each tier is read in index order ((lower(name) COLLATE "C",
+CustID) and the primary key) and stops at the page size, so a common term costs about as
+much as a rare one, and a late page as much as the first.
+"""
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+from sqlalchemy import select, and_, or_, not_, func, literal, tuple_, union_all, Integer, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import engine
+from app.models import CustomerDetail
+from app.crud.statements import EXPORT_CHUNK_ROWS
+
+load_dotenv()
+
+SEARCH_LIMIT = 200
+SEARCH_SORTS = ("relevance", "custId")
+MIN_GRAM_TERM = 3
+# includeCount counts matches exactly up to this many, then falls back to an estimate
+SEARCH_COUNT_CAP = int(os.environ.get("SEARCH_COUNT_CAP", "10000"))
+# work_mem for search transactions. Common terms in both names make the planner AND two
+# large trigram bitmaps; below a few MB per million customers those go lossy and every
+# row on their pages is rechecked ("" keeps the server setting)
+SEARCH_WORK_MEM = os.environ.get("SEARCH_WORK_MEM", "64MB")
+
+
+def phone_key(value: str | None) -> str | None:
+    """Python mirror of the customer_phone_key SQL function."""
+    digits = re.sub(r"[^0-9]", "", value or "")[-10:]
+    return digits or None
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def name_key(column):
+    """lower(name) in byte order, as the ix_customer_*name_lower indexes are sorted."""
+    return func.lower(column).collate("C")
+
+
+def _starts_with(column, term: str):
+    # a range rather than LIKE 'x%', which loses the index in generic prepared plans
+    prefix = term.lower()
+    return and_(name_key(column) >= prefix, name_key(column) < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+
+def _contains(column, term: str):
+    grams = getattr(CustomerDetail, f"{column.key}Grams")
+    return and_(
+        grams.op("@>")(func.customer_name_grams(term)),
+        func.lower(column).like(f"%{_escape_like(term.lower())}%", escape="\\"),
+    )
+
+
+def _name_match(column, term: str):
+    return _contains(column, term) if len(term) >= MIN_GRAM_TERM else _starts_with(column, term)
+
+
+@dataclass
+class CustomerSearch:
+    filters: list = field(default_factory=list)  # every match satisfies all of these
+    ranked_column: object = None                 # the name whose prefix matches rank first
+    ranked_term: str = ""
+    terms: tuple = ()                            # the normalized terms, for fingerprint
+
+    def __bool__(self) -> bool:
+        return bool(self.filters) or self.ranked_column is not None
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the terms, so a page cursor is only accepted for the search it came from."""
+        return hashlib.sha256(json.dumps(self.terms).encode("utf-8")).hexdigest()[:16]
+
+    def match_filters(self) -> list:
+        if self.ranked_column is None:
+            return self.filters
+        return [_name_match(self.ranked_column, self.ranked_term), *self.filters]
+
+
+def search_filters(
+    first_name: str | None = None,
+    last_name: str | None = None,
+    email: str | None = None,
+    mobile: str | None = None,
+) -> CustomerSearch:
+    """The search for the given terms (empty terms are ignored; no terms gives an empty,
+    falsy search). Raises ValueError when a mobile number has no digits."""
+    C = CustomerDetail
+    search = CustomerSearch()
+    first_name, last_name = (first_name or "").strip(), (last_name or "").strip()
+    if last_name:
+        search.ranked_column, search.ranked_term = C.LastName, last_name
+        if first_name:
+            search.filters.append(_name_match(C.FirstName, first_name))
+    elif first_name:
+        search.ranked_column, search.ranked_term = C.FirstName, first_name
+    email = (email or "").strip().lower()
+    if email:
+        search.filters.append(func.lower(C.EmailID) == email)
+    key = None
+    if mobile:
+        key = phone_key(mobile)
+        if key is None:
+            raise ValueError("mobile must contain digits")
+        search.filters.append(or_(func.customer_phone_key(C.Mobile) == key, func.customer_phone_key(C.Phone) == key))
+    search.terms = (first_name.lower(), last_name.lower(), email, key)
+    return search
+
+
+def _columns(tier: int, key):
+    C = CustomerDetail
+    return [
+        C.CustID.label("custId"),
+        C.FirstName.label("firstName"),
+        C.LastName.label("lastName"),
+        C.Phone.label("phone"),
+        C.Mobile.label("mobile"),
+        C.EmailID.label("email"),
+        literal(tier, Integer).label("tier"),
+        key.label("key"),
+    ]
+
+
+def _branches(search: CustomerSearch, sort: str, after: tuple | None) -> list:
+    """Ordered selects whose concatenation is every match after `after` (a (tier, key,
+    custId) position) in (tier, key, custId) order; each is read in index order."""
+    C = CustomerDetail
+    if sort == "custId" or search.ranked_column is None:
+        where = search.match_filters()
+        if after is not None:
+            where = [*where, C.CustID > after[2]]
+        return [select(*_columns(1, literal("", String))).where(*where).order_by(C.CustID)]
+
+    column, term = search.ranked_column, search.ranked_term
+    starts = _starts_with(column, term)
+    branches = []
+    if after is None or after[0] == 0:
+        where = [starts, *search.filters]
+        if after is not None:
+            where.append(tuple_(name_key(column), C.CustID) > tuple_(literal(after[1], String), after[2]))
+        branches.append(
+            select(*_columns(0, name_key(column))).where(*where).order_by(name_key(column), C.CustID)
+        )
+    if len(term) >= MIN_GRAM_TERM:
+        where = [_contains(column, term), not_(starts), *search.filters]
+        if after is not None and after[0] == 1:
+            where.append(C.CustID > after[2])
+        branches.append(select(*_columns(1, literal("", String))).where(*where).order_by(C.CustID))
+    return branches
+
+
+def _page_query(branches: list, limit: int):
+    # cut every branch at the page size before merging them, so no tier is read further
+    # than the page needs
+    if len(branches) == 1:
+        return branches[0].limit(limit)
+    tiers = union_all(*(branch.limit(limit) for branch in branches)).subquery("tiers")
+    return select(tiers).order_by(tiers.c.tier, tiers.c.key, tiers.c.custId).limit(limit)
+
+
+def _item(row) -> dict:
+    return {k: v for k, v in row._mapping.items() if k not in ("tier", "key")}
+
+
+async def _set_work_mem(conn):
+    if SEARCH_WORK_MEM:
+        await conn.execute(select(func.set_config("work_mem", SEARCH_WORK_MEM, True)))
+
+
+async def search_customers(
+    db: AsyncSession,
+    search: CustomerSearch,
+    limit: int = SEARCH_LIMIT,
+    sort: str = "relevance",
+    after: tuple | None = None,
+) -> tuple[list[dict], tuple | None]:
+    """One page of customers matching `search` (from search_filters), in `sort` order
+    after the position `after`. Returns the page and, when there are more matches, the
+    position of its last row (the next page's `after`)."""
+    branches = _branches(search, sort, after)
+    if not branches:
+        return [], None
+    await _set_work_mem(db)
+    # one extra row tells whether there is a next page
+    rows = (await db.execute(_page_query(branches, limit + 1))).all()
+    if len(rows) <= limit:
+        return [_item(row) for row in rows], None
+    last = rows[limit - 1]
+    return [_item(row) for row in rows[:limit]], (last.tier, last.key, last.custId)
+
+
+async def stream_customers(
+    search: CustomerSearch,
+    sort: str = "relevance",
+    after: tuple | None = None,
+    limit: int | None = None,
+) -> AsyncIterator[bytes]:
+    """Yield the matches after `after` (all of them, or the first `limit`) as NDJSON, one
+    chunk per EXPORT_CHUNK_ROWS rows.
+
+    Like export_statement, rows come from a server-side cursor on a dedicated connection,
+    so memory use is bounded by one chunk however broad the search.
+    """
+    branches = _branches(search, sort, after)
+    if branches and limit is not None:
+        branches = [_page_query(branches, limit)]
+    async with engine.connect() as conn:
+        await _set_work_mem(conn)
+        for branch in branches:
+            result = await conn.stream(branch.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+            async for rows in result.partitions():
+                yield "".join(json.dumps(_item(row), default=str) + "\n" for row in rows).encode("utf-8")
+
+
+async def count_customers(db: AsyncSession, search: CustomerSearch, cap: int = SEARCH_COUNT_CAP) -> tuple[int, bool]:
+    """(count, exact). Counts at most `cap` + 1 matches; past `cap` it returns the
+    planner's row estimate instead (but never less than cap + 1), so a broad search is
+    never counted match by match."""
+    matches = select(CustomerDetail.CustID).where(*search.match_filters())
+    counted = (await db.execute(select(func.count()).select_from(matches.limit(cap + 1).subquery()))).scalar_one()
+    if counted <= cap:
+        return counted, True
+    conn = await db.connection()
+    compiled = matches.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    plan = (await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), params)).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return max(int(plan[0]["Plan"]["Plan Rows"]), cap + 1), False
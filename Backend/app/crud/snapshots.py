@@ -0,0 +1,178 @@
+# app/crud/snapshots.py
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, update, insert, and_, case, func, BigInteger, Date, Integer, Numeric
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import unnest_rows
+from app.models import SavingAccountMonthlySnapshot, SavingAccountTxnHistory
+
+ZERO = Decimal("0.00")
+
+# Core table, not the ORM entity: UPDATE ... FROM unnest(...) stays a plain Core statement
+_snapshots = SavingAccountMonthlySnapshot.__table__
+_c = _snapshots.c
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _roll_forward(months):
+    """UPDATE the posting month and every later month of each account in `months`.
+
+    The posting month gets the totals and a new closing balance; later months have
+    their opening and closing balances moved by the net amount (backdated postings).
+    Returns the (AcctNum, Month) rows touched, so missing posting months can be inserted.
+    """
+    in_month = _c.Month == months.c.month
+    return (
+        update(_snapshots)
+        .where(and_(_c.AcctNum == months.c.acct, _c.Month >= months.c.month))
+        .values(
+            OpeningBalance=_c.OpeningBalance + case((in_month, 0), else_=months.c.net),
+            ClosingBalance=_c.ClosingBalance + months.c.net,
+            DepositTotal=_c.DepositTotal + case((in_month, months.c.deposits), else_=0),
+            WithdrawTotal=_c.WithdrawTotal + case((in_month, months.c.withdrawals), else_=0),
+            TxnCount=_c.TxnCount + case((in_month, months.c.count), else_=0),
+        )
+        .returning(_c.AcctNum, _c.Month)
+    )
+
+
+def _insert_months(months):
+    # New month rows open at the closing balance of the latest earlier month
+    previous = _snapshots.alias("previous")
+    opening = func.coalesce(
+        select(previous.c.ClosingBalance)
+        .where(and_(previous.c.AcctNum == months.c.acct, previous.c.Month < months.c.month))
+        .order_by(previous.c.Month.desc())
+        .limit(1)
+        .scalar_subquery(),
+        0,
+    )
+    return insert(_snapshots).from_select(
+        ["AcctNum", "Month", "OpeningBalance", "ClosingBalance", "DepositTotal", "WithdrawTotal", "TxnCount"],
+        select(months.c.acct, months.c.month, opening, opening + months.c.net,
+               months.c.deposits, months.c.withdrawals, months.c.count),
+    )
+
+
+def _months_table(groups: list[dict]):
+    amount = Numeric(18, 2)
+    return unnest_rows(
+        acct=(BigInteger, [g["acct"] for g in groups]),
+        month=(Date, [g["month"] for g in groups]),
+        net=(amount, [g["net"] for g in groups]),
+        deposits=(amount, [g["deposits"] for g in groups]),
+        withdrawals=(amount, [g["withdrawals"] for g in groups]),
+        count=(Integer, [g["count"] for g in groups]),
+    )
+
+
+async def _apply_groups(db: AsyncSession, groups: list[dict]):
+    # Each account appears at most once in `groups`
+    touched = set((await db.execute(_roll_forward(_months_table(groups)))).tuples().all())
+    missing = [g for g in groups if (g["acct"], g["month"]) not in touched]
+    if missing:
+        await db.execute(_insert_months(_months_table(missing)))
+
+
+async def apply_to_snapshots(db: AsyncSession, postings: list[tuple[int, date, Decimal]]):
+    """Fold (AcctNum, TxnDate, signed amount) postings into the monthly snapshots.
+
+    Must run in the posting's transaction, after the account rows were locked by the
+    posting, so two writers never update one account's snapshots at the same time (and an
+    existing-or-insert decision cannot race). Postings are grouped per (account, month);
+    the usual case, every account in a single month, is one UPDATE over unnest(...) arrays
+    plus one INSERT for accounts starting a new month. An account with several months in
+    one call is applied month by month, so each new month row picks up the closing balance
+    of the month before it.
+    """
+    if not postings:
+        return
+    totals: dict[tuple[int, date], dict] = defaultdict(
+        lambda: {"net": ZERO, "deposits": ZERO, "withdrawals": ZERO, "count": 0}
+    )
+    for acct_num, txn_date, delta in postings:
+        g = totals[(acct_num, month_start(txn_date))]
+        g["net"] += delta
+        g["deposits" if delta > 0 else "withdrawals"] += abs(delta)
+        g["count"] += 1
+    groups = [{"acct": acct_num, "month": month, **g} for (acct_num, month), g in sorted(totals.items())]
+
+    # Split into rounds with at most one month per account, earliest months first
+    rounds: list[list[dict]] = []
+    seen: dict[int, int] = defaultdict(int)
+    for g in groups:
+        n = seen[g["acct"]]
+        seen[g["acct"]] += 1
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append(g)
+    for round_groups in rounds:
+        await _apply_groups(db, round_groups)
+
+
+async def list_snapshots(
+    db: AsyncSession, acct_num: int, from_month: date | None = None, to_month: date | None = None
+) -> list[dict]:
+    """Monthly rows for an account between two months (inclusive), with quiet months filled in.
+
+    Reads at most one row before the range plus the stored rows inside it, whatever the
+    length of the account's history.
+    """
+    S = SavingAccountMonthlySnapshot
+    filters = [S.AcctNum == acct_num]
+    if from_month is not None:
+        filters.append(S.Month >= month_start(from_month))
+    if to_month is not None:
+        filters.append(S.Month <= month_start(to_month))
+    rows = (await db.execute(select(S).where(and_(*filters)).order_by(S.Month))).scalars().all()
+
+    balance = ZERO
+    if from_month is not None:
+        balance = (await db.execute(
+            select(S.ClosingBalance)
+            .where(and_(S.AcctNum == acct_num, S.Month < month_start(from_month)))
+            .order_by(S.Month.desc())
+            .limit(1)
+        )).scalar_one_or_none() or ZERO
+    if from_month is None and not rows:
+        return []
+
+    stored = {row.Month: row for row in rows}
+    month = month_start(from_month) if from_month is not None else rows[0].Month
+    last = month_start(to_month) if to_month is not None else (rows[-1].Month if rows else month)
+    out = []
+    while month <= last:
+        row = stored.get(month)
+        if row is not None:
+            out.append({
+                "Month": month, "OpeningBalance": row.OpeningBalance, "ClosingBalance": row.ClosingBalance,
+                "DepositTotal": row.DepositTotal, "WithdrawTotal": row.WithdrawTotal, "TxnCount": row.TxnCount,
+            })
+            balance = row.ClosingBalance
+        else:
+            out.append({
+                "Month": month, "OpeningBalance": balance, "ClosingBalance": balance,
+                "DepositTotal": ZERO, "WithdrawTotal": ZERO, "TxnCount": 0,
+            })
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return out
+
+
+async def opening_balance(db: AsyncSession, acct_num: int, on_date: date) -> Decimal:
+    """Balance at the start of `on_date`: the previous month's closing balance plus the
+    postings of the current month dated before `on_date` (one snapshot row, one short range scan)."""
+    S, H = SavingAccountMonthlySnapshot, SavingAccountTxnHistory
+    month = month_start(on_date)
+    previous = (await db.execute(
+        select(S.ClosingBalance).where(and_(S.AcctNum == acct_num, S.Month < month)).order_by(S.Month.desc()).limit(1)
+    )).scalar_one_or_none() or ZERO
+    in_month = (await db.execute(
+        select(func.coalesce(func.sum(func.coalesce(H.DepositAmount, 0) - func.coalesce(H.WithdrawAmount, 0)), 0))
+        .where(and_(H.AcctNum == acct_num, H.TxnDate >= month, H.TxnDate < on_date))
+    )).scalar_one()
+    return previous + in_month
@@ -1,4 +1,6 @@
 # app/db.py
+from sqlalchemy import func, cast, inspect, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 
@@ -24,3 +26,80 @@ AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def create_missing_indexes(sync_conn):
+    # create_all() skips tables that already exist, so indexes added to the models later
+    # would never reach an existing database; create those individually (run via run_sync)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def add_missing_columns(sync_conn):
+    # Likewise for nullable and stored generated columns added to existing models (run
+    # via run_sync). Adding a generated column rewrites the table once.
+    insp = inspect(sync_conn)
+    existing_tables = set(insp.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {col["name"] for col in insp.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            col_type = column.type.compile(dialect=sync_conn.dialect)
+            if column.computed is not None:
+                col_type += f" GENERATED ALWAYS AS ({column.computed.sqltext}) STORED"
+            elif not column.nullable or column.server_default is not None:
+                continue
+            sync_conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN IF NOT EXISTS "{column.name}" {col_type}'))
+
+
+def fix_foreign_key_actions(sync_conn) -> list[tuple[str, str]]:
+    # Likewise for the ON DELETE action of existing foreign keys (run via run_sync): a
+    # constraint created without the model's CASCADE is replaced NOT VALID, and returned
+    # as (table, constraint) for validate_constraint once this transaction has committed.
+    # Checking the existing rows in the same transaction would hold the ACCESS EXCLUSIVE
+    # lock of the ALTER for the whole scan; VALIDATE alone takes SHARE UPDATE EXCLUSIVE.
+    replaced = []
+    insp = inspect(sync_conn)
+    existing_tables = set(insp.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = insp.get_foreign_keys(table.name)
+        for fk in table.foreign_key_constraints:
+            if not fk.ondelete:
+                continue
+            columns = [c.name for c in fk.columns]
+            target = fk.elements[0].column.table.name
+            for found in present:
+                if (found["constrained_columns"] != columns or found["referred_table"] != target
+                        or (found["options"].get("ondelete") or "").upper() == fk.ondelete.upper()):
+                    continue
+                name = found["name"]
+                local = ", ".join(f'"{c}"' for c in columns)
+                remote = ", ".join(f'"{e.column.name}"' for e in fk.elements)
+                sync_conn.execute(text(
+                    f'ALTER TABLE "{table.name}" DROP CONSTRAINT "{name}", ADD CONSTRAINT "{name}" '
+                    f'FOREIGN KEY ({local}) REFERENCES "{target}" ({remote}) ON DELETE {fk.ondelete} NOT VALID'
+                ))
+                replaced.append((table.name, name))
+    return replaced
+
+
+def validate_constraint(sync_conn, table_name: str, constraint: str):
+    # Run in its own transaction (via run_sync), after the one that added the constraint NOT VALID
+    sync_conn.execute(text(f'ALTER TABLE "{table_name}" VALIDATE CONSTRAINT "{constraint}"'))
+
+
+def unnest_rows(**columns):
+    """A FROM-able `unnest(CAST(:a AS type[]), ...) AS anon(name, ...)` over parallel lists.
+
+    columns: name=(sqltype, values). Sends any number of rows as one array parameter per
+    column, so bulk INSERT ... SELECT / UPDATE ... FROM run as a single statement instead
+    of an executemany, and stay clear of the bind-parameter limit of multi-row VALUES.
+    """
+    arrays = [cast(values, ARRAY(sqltype)) for sqltype, values in columns.values()]
+    return func.unnest(*arrays).table_valued(*columns).render_derived()
@@ -0,0 +1,98 @@
+# app/jobs/customer360_rebuild.py
+"""Rebuild or check the customer-360 documents (Customer360, app.crud.customer360).
+
+Rebuilding recomputes every customer's document: needed once for customers created before
+the table existed, and safe to run at any time. Customers are processed in CustID chunks,
+each in its own transaction with the customer rows locked like a refresh does, so writes
+to those customers wait for the chunk instead of racing it.
+
+--check only compares the stored documents with the ones computed from the tables, a
+chunk per statement without locks, and reports the missing and stale ones (exit status 1
+if there are any); --check --fix then refreshes just those.
+
+    cd Backend && python -m app.jobs.customer360_rebuild --chunk 5000
+    cd Backend && python -m app.jobs.customer360_rebuild --check --fix
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from sqlalchemy import select
+from app.db import engine, AsyncSessionLocal
+from app.crud.customer360 import lock_customers, find_mismatches, refresh_documents
+from app.models import CustomerDetail
+
+logger = logging.getLogger("customer360_rebuild")
+
+REPORT_LIMIT = 20  # mismatching CustIDs listed in the summary
+
+
+async def rebuild(chunk: int = 5000) -> dict:
+    C = CustomerDetail
+    started = time.perf_counter()
+    customers, last = 0, 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            ids = (await db.execute(lock_customers(C.CustID > last).limit(chunk))).scalars().all()
+            if not ids:
+                await db.rollback()
+                break
+            await refresh_documents(db, ids)  # already locked by this transaction
+            await db.commit()
+            customers += len(ids)
+            last = ids[-1]
+            logger.info("CUSTOMER360.REBUILD customers=%s last_cust_id=%s", customers, last)
+    return {"customers": customers, "seconds": round(time.perf_counter() - started, 2)}
+
+
+async def check(chunk: int = 5000, fix: bool = False) -> dict:
+    C = CustomerDetail
+    started = time.perf_counter()
+    customers, last = 0, 0
+    found: list[tuple[int, str]] = []
+    async with AsyncSessionLocal() as db:
+        while True:
+            ids = (await db.execute(select(C.CustID).where(C.CustID > last).order_by(C.CustID).limit(chunk))).scalars().all()
+            if not ids:
+                break
+            mismatches = await find_mismatches(db, ids[0], ids[-1])
+            await db.rollback()
+            if mismatches and fix:
+                await refresh_documents(db, [cust_id for cust_id, _ in mismatches])
+                await db.commit()
+            found += mismatches
+            customers += len(ids)
+            last = ids[-1]
+            logger.info("CUSTOMER360.CHECK customers=%s mismatches=%s", customers, len(found))
+    kinds = [kind for _, kind in found]
+    return {
+        "customers": customers,
+        "missing": kinds.count("missing"),
+        "stale": kinds.count("stale"),
+        "fixed": len(found) if fix else 0,
+        "examples": [cust_id for cust_id, _ in found[:REPORT_LIMIT]],
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk", type=int, default=5000, help="customers per statement")
+    parser.add_argument("--check", action="store_true", help="only compare and report")
+    parser.add_argument("--fix", action="store_true", help="with --check, refresh the mismatching documents")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    if args.check:
+        stats = await check(args.chunk, args.fix)
+    else:
+        stats = await rebuild(args.chunk)
+    print(stats)
+    await engine.dispose()
+    if args.check and not args.fix and (stats["missing"] or stats["stale"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
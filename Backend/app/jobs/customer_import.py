@@ -0,0 +1,46 @@
+# app/jobs/customer_import.py
+"""Import customers from a CSV (header row with the CustomerCreate fields) or NDJSON file.
+
+Same rules and per-chunk commits as POST /customers/import (app.crud.customer_import),
+but the file is streamed, so its size is not limited by memory. Progress is logged after
+every chunk; rejected rows are counted and, with --errors, written out as NDJSON
+({"index", "status_code", "EmailID", "detail"}) to fix and re-import.
+
+    cd Backend && python -m app.jobs.customer_import customers.csv --chunk 5000 --errors rejected.ndjson
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+
+from app.db import engine, AsyncSessionLocal
+from app.crud.customer_import import import_customers, iter_rows, IMPORT_CHUNK_ROWS
+
+
+async def run(path: str, fmt: str, chunk: int = IMPORT_CHUNK_ROWS, errors_path: str | None = None) -> dict:
+    with open(path, newline="", encoding="utf-8-sig") as source:
+        async with AsyncSessionLocal() as db:
+            stats = await import_customers(db, iter_rows(source, fmt), chunk)
+    if errors_path:
+        with open(errors_path, "w", encoding="utf-8") as out:
+            for error in stats.errors:
+                out.write(json.dumps(dataclasses.asdict(error)) + "\n")
+    return stats.summary()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--chunk", type=int, default=IMPORT_CHUNK_ROWS, help="rows per transaction")
+    parser.add_argument("--errors", help="write rejected rows to this NDJSON file")
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    print(await run(args.path, fmt, args.chunk, args.errors))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+# app/jobs/customer_purge.py
+"""Delete the customers listed in a file, one CustID or email per line, with everything
+they own (accounts, savings and loan details, transaction history, EMIs).
+
+Same chunked, per-chunk committed deletes as POST /customers/purge
+(app.crud.customer_purge). Progress is logged after every chunk; with --not-found the
+identifiers that matched no customer are written out, one per line.
+
+    cd Backend && python -m app.jobs.customer_purge leavers.txt --chunk 1000 --not-found missing.txt
+"""
+import argparse
+import asyncio
+import logging
+
+from app.db import engine, AsyncSessionLocal
+from app.crud.customer_purge import purge_customers, PURGE_CHUNK_CUSTOMERS
+
+
+def read_identifiers(path: str) -> tuple[list[int], list[str]]:
+    cust_ids, emails = [], []
+    with open(path, encoding="utf-8-sig") as source:
+        for line in source:
+            value = line.strip()
+            if not value:
+                continue
+            if value.isdigit():
+                cust_ids.append(int(value))
+            else:
+                emails.append(value)
+    return cust_ids, emails
+
+
+async def run(path: str, chunk: int = PURGE_CHUNK_CUSTOMERS, not_found_path: str | None = None) -> dict:
+    cust_ids, emails = read_identifiers(path)
+    async with AsyncSessionLocal() as db:
+        stats = await purge_customers(db, cust_ids, emails, chunk)
+    if not_found_path:
+        with open(not_found_path, "w", encoding="utf-8") as out:
+            out.writelines(f"{identifier}\n" for identifier in stats.not_found)
+    return {**stats.summary(), "not_found": len(stats.not_found)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--chunk", type=int, default=PURGE_CHUNK_CUSTOMERS, help="customers per transaction")
+    parser.add_argument("--not-found", help="write the identifiers that matched no customer to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    print(await run(args.path, args.chunk, args.not_found))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+# app/jobs/emi_reminders.py
+"""Daily EMI reminder scan: pending installments due within --lead-days (or overdue)
+that have not been reminded yet are marked EMIReminder = true and handed to a sink
+(app.services.reminders).
+
+Candidates come from the partial index ix_loanemi_pending_due (pending, not reminded,
+by EMIDate), and each chunk is claimed and marked by one UPDATE ... FROM (SELECT ...
+LIMIT chunk FOR UPDATE SKIP LOCKED) ... RETURNING. Marked rows drop out of the index, so
+every chunk starts again from the front of a shrinking index: the cost of a run follows
+the number of due rows, not the size of LoanEMIDetail, and concurrent runs split the
+work instead of reminding twice. Each chunk commits after the sink accepted it.
+
+Run it daily from cron, or set EMI_REMINDER_FILE to have the API process run it:
+
+    cd Backend && python -m app.jobs.emi_reminders --lead-days 3 --out reminders.ndjson
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import select, update, and_, literal_column
+from app.db import engine, AsyncSessionLocal
+from app.models import LoanEMIDetail, CustomerAccounts, CustomerDetail
+from app.services.reminders import ReminderSink, NdjsonFileSink
+
+load_dotenv()
+
+EMI_REMINDER_LEAD_DAYS = int(os.environ.get("EMI_REMINDER_LEAD_DAYS", "3"))
+EMI_REMINDER_FILE = os.environ.get("EMI_REMINDER_FILE")
+
+logger = logging.getLogger("emi_reminders")
+
+
+def _claim_due(horizon: date, chunk: int):
+    E = LoanEMIDetail
+    # literal 'Pending' (not a bind parameter) so the predicate provably matches the
+    # partial index under generic prepared-statement plans as well
+    due = (
+        select(E.EMINum, CustomerAccounts.CustID, CustomerDetail.FirstName, CustomerDetail.EmailID, CustomerDetail.Mobile)
+        .outerjoin(CustomerAccounts, CustomerAccounts.AcctNum == E.AcctNum)
+        .outerjoin(CustomerDetail, CustomerDetail.CustID == CustomerAccounts.CustID)
+        .where(and_(
+            E.EMIStatus == literal_column("'Pending'"),
+            E.EMIReminder.is_not(True),
+            E.EMIDate <= horizon,
+        ))
+        .order_by(E.EMIDate, E.EMINum)
+        .limit(chunk)
+        .with_for_update(of=E, skip_locked=True)
+        .subquery("due")
+    )
+    return (
+        update(E)
+        .where(E.EMINum == due.c.EMINum)
+        .values(EMIReminder=True)
+        .returning(
+            E.EMINum, E.EMIID, E.AcctNum, E.EMIDate, E.EMIAmount, E.RemainingBalance,
+            due.c.CustID, due.c.FirstName, due.c.EmailID, due.c.Mobile,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def send_reminders(
+    sink: ReminderSink, as_of: date | None = None, lead_days: int = EMI_REMINDER_LEAD_DAYS, chunk: int = 1000
+) -> dict:
+    as_of = as_of or date.today()
+    horizon = as_of + timedelta(days=lead_days)
+    started = time.perf_counter()
+    sent = overdue = chunks = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(_claim_due(horizon, chunk))).all()
+            if not rows:
+                break
+            reminders = [
+                {
+                    "kind": "overdue" if row.EMIDate < as_of else "due",
+                    "EMINum": row.EMINum,
+                    "EMIID": row.EMIID,
+                    "AcctNum": row.AcctNum,
+                    "CustID": row.CustID,
+                    "FirstName": row.FirstName,
+                    "EmailID": row.EmailID,
+                    "Mobile": row.Mobile,
+                    "DueDate": row.EMIDate.isoformat(),
+                    "EMIAmount": str(row.EMIAmount),
+                    "RemainingBalance": str(row.RemainingBalance),
+                }
+                for row in sorted(rows, key=lambda r: (r.EMIDate, r.EMINum))
+            ]
+            await sink.send(reminders)
+            await db.commit()
+        chunks += 1
+        sent += len(reminders)
+        overdue += sum(1 for r in reminders if r["kind"] == "overdue")
+        logger.info("EMI.REMINDERS sent=%s overdue=%s horizon=%s", sent, overdue, horizon)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "as_of": as_of.isoformat(),
+        "horizon": horizon.isoformat(),
+        "reminders": sent,
+        "overdue": overdue,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(sent / elapsed) if elapsed else 0,
+    }
+    logger.info("EMI.REMINDERS done %s", stats)
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--as-of", type=date.fromisoformat, help="scan date (YYYY-MM-DD); defaults to today")
+    parser.add_argument("--lead-days", type=int, default=EMI_REMINDER_LEAD_DAYS, help="remind this many days ahead")
+    parser.add_argument("--chunk", type=int, default=1000, help="installments per transaction")
+    parser.add_argument("--out", default=EMI_REMINDER_FILE or "-", help="NDJSON file to append to; - for stdout")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    sink = NdjsonFileSink(args.out)
+    try:
+        stats = await send_reminders(sink, args.as_of, args.lead_days, args.chunk)
+    finally:
+        await sink.close()
+    logger.info("%s", stats)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+# app/jobs/emi_schedule_backfill.py
+"""Generate EMI schedules for loans that have none (app.crud.loans).
+
+Loans opened before schedules were generated at creation time have no LoanEMIDetail
+rows. They are processed in EMIID chunks, each chunk one transaction holding the loan
+rows locked and inserting every installment of the chunk with a single INSERT ... SELECT.
+Loans that already have a schedule are skipped, so the job is safe to re-run or to
+restart after an interruption. LoanAccountDetail has no disbursement date, so the first
+installment of every backfilled loan falls due on --first-due (default: one month from today).
+
+    cd Backend && python -m app.jobs.emi_schedule_backfill --chunk 2000 --first-due 2026-11-01
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import date
+
+from sqlalchemy import select, exists
+from app.db import engine, AsyncSessionLocal
+from app.models import LoanAccountDetail, LoanEMIDetail
+from app.crud.loans import create_emi_schedules, first_due_date
+
+logger = logging.getLogger("emi_schedule_backfill")
+
+
+async def backfill(first_due: date | None = None, chunk: int = 2000) -> dict:
+    L, E = LoanAccountDetail, LoanEMIDetail
+    first_due = first_due or first_due_date(date.today())
+    started = time.perf_counter()
+    loans = installments = 0
+    after = -1
+    while True:
+        async with AsyncSessionLocal() as db:
+            emi_ids = list((await db.execute(
+                select(L.EMIID)
+                .where(L.EMIID > after, ~exists().where(E.EMIID == L.EMIID))
+                .order_by(L.EMIID)
+                .limit(chunk)
+                .with_for_update(of=L)
+            )).scalars().all())
+            if not emi_ids:
+                break
+            installments += await create_emi_schedules(db, emi_ids, first_due)
+            await db.commit()
+        loans += len(emi_ids)
+        after = emi_ids[-1]
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "EMI.BACKFILL loans=%s installments=%s last_emi_id=%s rows_per_sec=%.0f",
+            loans, installments, after, installments / elapsed,
+        )
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "loans": loans,
+        "installments": installments,
+        "first_due": first_due.isoformat(),
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(installments / elapsed) if elapsed else 0,
+    }
+    logger.info("EMI.BACKFILL done %s", stats)
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-due", type=date.fromisoformat, help="due date of the first installment (YYYY-MM-DD)")
+    parser.add_argument("--chunk", type=int, default=2000, help="loans per transaction")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    print(await backfill(args.first_due, args.chunk))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,199 @@
+# app/jobs/interest_accrual.py
+"""Month-end interest accrual for savings accounts.
+
+Interest for a period is paid on the average daily balance (ADB), computed set-based in
+Postgres NUMERIC for a whole chunk of accounts at once: with B = the current balance
+and, for every posting dated after the period start, net = deposit - withdrawal,
+
+    sum of end-of-day balances over the period = B * days - sum(net * least(TxnDate - start, days))
+    interest = round(that sum * rate / 36500, 2)          (ACT/365, rate in % per year)
+
+so each account costs one index range scan of ix_savingtxn_acct_date_id and there is
+no rounding before the final cent. Accounts are processed in AcctNum chunks; each chunk
+locks its rows (one SELECT ... FOR UPDATE in AcctNum order), computes the ADB in a second
+statement, whose fresh snapshot includes every posting committed before the lock was
+granted, writes all interest credits with one bulk history insert and bulk balance
+updates (crud.savings.write_postings), and advances the InterestAccrualRun checkpoint in
+the same transaction, so an interrupted run restarts where it stopped.
+
+    cd Backend && python -m app.jobs.interest_accrual --month 2026-09 --rate 3.50 --chunk 5000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from dotenv import load_dotenv
+from sqlalchemy import select, update, and_, func, literal, Date, BigInteger
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import engine, AsyncSessionLocal, unnest_rows
+from app.models import SavingAccountDetail, SavingAccountTxnHistory, CustomerAccounts, InterestAccrualRun
+from app.crud.savings import write_postings, BatchPosting, PostingResult
+
+load_dotenv()
+
+SAVINGS_INTEREST_RATE = Decimal(os.environ.get("SAVINGS_INTEREST_RATE", "3.50"))
+
+logger = logging.getLogger("interest_accrual")
+
+
+def month_period(month: str | None) -> tuple[date, date]:
+    """(first day, last day) of "YYYY-MM", or of the previous month when None."""
+    if month:
+        start = datetime.strptime(month, "%Y-%m").date()
+    else:
+        start = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def _lock_chunk(run: InterestAccrualRun, chunk: int):
+    # Locking and computing in one statement is not enough: a posting committing while the
+    # lock waits is re-checked into the locked row's Balance, but not into the history sums
+    SAD = SavingAccountDetail
+    return (
+        select(SAD.AcctNum)
+        .where(SAD.AcctNum > run.LastAcctNum)
+        .order_by(SAD.AcctNum)
+        .limit(chunk)
+        .with_for_update()
+    )
+
+
+def _interest_query(run: InterestAccrualRun, acct_nums: list[int]):
+    H, SAD = SavingAccountTxnHistory, SavingAccountDetail
+    locked = unnest_rows(AcctNum=(BigInteger, acct_nums))
+    days = (run.PeriodEnd - run.PeriodStart).days + 1
+    net = func.coalesce(H.DepositAmount, 0) - func.coalesce(H.WithdrawAmount, 0)
+    # postings dated after the start are not in the earlier end-of-day balances
+    not_yet_posted = (
+        select(func.coalesce(func.sum(net * func.least(H.TxnDate - literal(run.PeriodStart, Date), days)), 0))
+        .where(and_(H.AcctNum == SAD.AcctNum, H.TxnDate > run.PeriodStart))
+        .scalar_subquery()
+    )
+    balance_days = func.coalesce(SAD.Balance, 0) * days - not_yet_posted
+    return (
+        select(
+            SAD.AcctNum,
+            CustomerAccounts.CustID,
+            func.coalesce(SAD.Balance, 0).label("Balance"),
+            func.round(balance_days * run.Rate / 36500, 2).label("Interest"),
+        )
+        .join(CustomerAccounts, CustomerAccounts.AcctNum == SAD.AcctNum)
+        .join(locked, locked.c.AcctNum == SAD.AcctNum)
+        .order_by(SAD.AcctNum)
+    )
+
+
+async def _accrue_chunk(db: AsyncSession, run: InterestAccrualRun, chunk: int) -> int:
+    acct_nums = (await db.execute(_lock_chunk(run, chunk))).scalars().all()
+    if not acct_nums:
+        return 0
+    rows = (await db.execute(_interest_query(run, acct_nums))).all()
+
+    detail = f"Interest {run.PeriodStart:%Y-%m}"
+    credits, new_balances = [], {}
+    for n, row in enumerate(rows):
+        if row.Interest > 0:
+            new_balances[row.AcctNum] = row.Balance + row.Interest
+            credits.append((
+                BatchPosting(n, row.CustID, row.AcctNum, row.Interest, run.PeriodEnd, detail),
+                PostingResult(TxnID=0, AcctNum=row.AcctNum, TxnDate=run.PeriodEnd, NewBalance=new_balances[row.AcctNum]),
+            ))
+    await write_postings(db, credits, new_balances)
+
+    run.LastAcctNum = acct_nums[-1]
+    run.AccountsProcessed += len(acct_nums)
+    run.AccountsCredited += len(credits)
+    run.InterestTotal += sum((p.delta for p, _ in credits), Decimal("0.00"))
+    await db.execute(
+        update(InterestAccrualRun)
+        .where(InterestAccrualRun.PeriodStart == run.PeriodStart)
+        .values(
+            LastAcctNum=run.LastAcctNum, AccountsProcessed=run.AccountsProcessed,
+            AccountsCredited=run.AccountsCredited, InterestTotal=run.InterestTotal,
+        )
+    )
+    await db.commit()
+    return len(acct_nums)
+
+
+async def _load_run(db: AsyncSession, start: date, end: date, rate: Decimal) -> InterestAccrualRun:
+    await db.execute(
+        pg_insert(InterestAccrualRun)
+        .values(PeriodStart=start, PeriodEnd=end, Rate=rate, LastAcctNum=0, AccountsProcessed=0,
+                AccountsCredited=0, InterestTotal=0, Status="running")
+        .on_conflict_do_nothing(index_elements=["PeriodStart"])
+    )
+    await db.commit()
+    run = (await db.execute(select(InterestAccrualRun).where(InterestAccrualRun.PeriodStart == start))).scalar_one()
+    if run.Rate != rate:
+        raise ValueError(f"Run for {start:%Y-%m} was started at rate {run.Rate}, not {rate}")
+    # plain values from here on; the ORM object is only read
+    db.expunge(run)
+    return run
+
+
+async def accrue_interest(month: str | None = None, rate: Decimal = SAVINGS_INTEREST_RATE, chunk: int = 5000) -> dict:
+    start, end = month_period(month)
+    async with AsyncSessionLocal() as db:
+        run = await _load_run(db, start, end, rate)
+    if run.Status == "done":
+        logger.info("INTEREST.ACCRUAL period=%s already done", start)
+        return {"period": start.isoformat(), "status": "done", "accounts": run.AccountsProcessed}
+
+    if run.LastAcctNum:
+        logger.info("INTEREST.ACCRUAL period=%s resuming after AcctNum=%s", start, run.LastAcctNum)
+    started = time.perf_counter()
+    processed = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            done = await _accrue_chunk(db, run, chunk)
+        if not done:
+            break
+        processed += done
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "INTEREST.ACCRUAL period=%s accounts=%s last_acct=%s rows_per_sec=%.0f",
+            start, run.AccountsProcessed, run.LastAcctNum, processed / elapsed,
+        )
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(InterestAccrualRun)
+            .where(InterestAccrualRun.PeriodStart == start)
+            .values(Status="done", FinishedAt=datetime.now(timezone.utc))
+        )
+        await db.commit()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "period": start.isoformat(),
+        "status": "done",
+        "accounts": run.AccountsProcessed,
+        "credited": run.AccountsCredited,
+        "interest_total": str(run.InterestTotal),
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(processed / elapsed) if elapsed else 0,
+    }
+    logger.info("INTEREST.ACCRUAL done %s", stats)
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--month", help="YYYY-MM; defaults to the previous month")
+    parser.add_argument("--rate", type=Decimal, default=SAVINGS_INTEREST_RATE, help="annual interest rate in percent")
+    parser.add_argument("--chunk", type=int, default=5000, help="accounts per transaction")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    print(await accrue_interest(args.month, args.rate, args.chunk))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+# app/jobs/snapshot_backfill.py
+"""Rebuild SavingAccountMonthlySnapshot from SavingAccountTxnHistory.
+
+Needed once for history written before the snapshot table existed, and safe to re-run
+at any time: accounts are processed in AcctNum chunks, each chunk in its own transaction
+with the account rows locked, so postings to those accounts wait for the chunk instead of
+racing it. Accounts whose rebuilt closing balance differs from SavingAccountDetail.Balance
+(e.g. opened with a balance but no history row) are counted and logged.
+
+    cd Backend && python -m app.jobs.snapshot_backfill --chunk 1000
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from sqlalchemy import select, delete, insert, and_, func, Date, cast
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import engine, AsyncSessionLocal
+from app.models import SavingAccountDetail, SavingAccountTxnHistory, SavingAccountMonthlySnapshot
+
+logger = logging.getLogger("snapshot_backfill")
+
+
+def _rollup(first_acct: int, last_acct: int):
+    H = SavingAccountTxnHistory
+    deposits = func.coalesce(H.DepositAmount, 0)
+    withdrawals = func.coalesce(H.WithdrawAmount, 0)
+    monthly = (
+        select(
+            H.AcctNum,
+            cast(func.date_trunc("month", H.TxnDate), Date).label("Month"),
+            func.sum(deposits).label("DepositTotal"),
+            func.sum(withdrawals).label("WithdrawTotal"),
+            func.count().label("TxnCount"),
+            func.sum(deposits - withdrawals).label("Net"),
+        )
+        .where(H.AcctNum.between(first_acct, last_acct))
+        .group_by(H.AcctNum, "Month")
+        .subquery()
+    )
+    closing = func.sum(monthly.c.Net).over(partition_by=monthly.c.AcctNum, order_by=monthly.c.Month)
+    return select(
+        monthly.c.AcctNum,
+        monthly.c.Month,
+        (closing - monthly.c.Net).label("OpeningBalance"),
+        closing.label("ClosingBalance"),
+        monthly.c.DepositTotal,
+        monthly.c.WithdrawTotal,
+        monthly.c.TxnCount,
+    )
+
+
+async def _rebuild_chunk(db: AsyncSession, acct_nums: list[int]) -> int:
+    S = SavingAccountMonthlySnapshot
+    first, last = acct_nums[0], acct_nums[-1]
+    await db.execute(
+        select(SavingAccountDetail.AcctNum)
+        .where(SavingAccountDetail.AcctNum.between(first, last))
+        .order_by(SavingAccountDetail.AcctNum)
+        .with_for_update()
+    )
+    await db.execute(delete(S).where(S.AcctNum.between(first, last)))
+    await db.execute(
+        insert(S).from_select(
+            ["AcctNum", "Month", "OpeningBalance", "ClosingBalance", "DepositTotal", "WithdrawTotal", "TxnCount"],
+            _rollup(first, last),
+        )
+    )
+
+    latest = (
+        select(S.AcctNum, func.max(S.Month).label("Month"))
+        .where(S.AcctNum.between(first, last))
+        .group_by(S.AcctNum)
+        .subquery()
+    )
+    mismatched = (await db.execute(
+        select(func.count())
+        .select_from(SavingAccountDetail)
+        .outerjoin(latest, latest.c.AcctNum == SavingAccountDetail.AcctNum)
+        .outerjoin(S, and_(S.AcctNum == latest.c.AcctNum, S.Month == latest.c.Month))
+        .where(and_(
+            SavingAccountDetail.AcctNum.between(first, last),
+            func.coalesce(S.ClosingBalance, 0) != func.coalesce(SavingAccountDetail.Balance, 0),
+        ))
+    )).scalar_one()
+    await db.commit()
+    return mismatched
+
+
+async def backfill(chunk: int = 1000) -> dict:
+    started = time.perf_counter()
+    accounts = mismatched = 0
+    after = -1
+    while True:
+        async with AsyncSessionLocal() as db:
+            acct_nums = list((await db.execute(
+                select(SavingAccountDetail.AcctNum)
+                .where(SavingAccountDetail.AcctNum > after)
+                .order_by(SavingAccountDetail.AcctNum)
+                .limit(chunk)
+            )).scalars().all())
+            if not acct_nums:
+                break
+            mismatched += await _rebuild_chunk(db, acct_nums)
+        accounts += len(acct_nums)
+        after = acct_nums[-1]
+        logger.info("SNAPSHOT.BACKFILL accounts=%s last_acct=%s", accounts, after)
+
+    stats = {"accounts": accounts, "balance_mismatches": mismatched, "seconds": round(time.perf_counter() - started, 2)}
+    logger.info("SNAPSHOT.BACKFILL done %s", stats)
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk", type=int, default=1000, help="accounts per transaction")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    print(await backfill(args.chunk))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
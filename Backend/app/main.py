@@ -1,16 +1,31 @@
 # app/main.py
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text, inspect
-from app.db import engine, Base
+from app.db import engine, Base, AsyncSessionLocal, create_missing_indexes, add_missing_columns, fix_foreign_key_actions, validate_constraint
 from app.models import *
 from app.routes.admin import router as admin_router
 from app.routes.customers import router as customers_router
 from app.routes.account import router as account_router
 from app.routes.savings_txn import router as savings_txn_router
+from app.routes.transactions import router as transactions_router
+from app.routes.loan_txn import router as loan_txn_router
+from app.routes.loans import router as loans_router
+from app.services import idempotency
+from app.services.posting_queue import posting_queue, SAVINGS_POSTING_QUEUE
+from app.services.limits import daily_limits
+from app.services.customer_cache import customer_cache
+from app.services.geo_cache import geo_index
+from app.services.reminders import NdjsonFileSink
+from app.jobs.emi_reminders import send_reminders, EMI_REMINDER_FILE
+from app.jobs.portfolio_reconcile import reconcile, PORTFOLIO_RECONCILE_INTERVAL_SECONDS
+from app.services import portfolio
 # from app.routes.admin_sso import router as admin_sso_router
 
 app = FastAPI()
+logger = logging.getLogger("app")
 
 # CORS: allow frontend dev server(s) to access the API during development
 # Adjust or read from environment in production as needed.
@@ -28,6 +43,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    # paging and count headers of POST /customers/advSearch
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Exact"],
 )
 
 # Register routers
@@ -36,6 +53,9 @@ app.include_router(admin_router)
 app.include_router(customers_router)
 app.include_router(account_router)
 app.include_router(savings_txn_router)
+app.include_router(transactions_router)
+app.include_router(loan_txn_router)
+app.include_router(loans_router)
 
 
 # Startup: create tables asynchronously
@@ -43,7 +63,63 @@ app.include_router(savings_txn_router)
 async def on_startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        unvalidated = await conn.run_sync(fix_foreign_key_actions)
+        await conn.run_sync(create_missing_indexes)
+    for table_name, constraint in unvalidated:
+        async with engine.begin() as conn:
+            await conn.run_sync(validate_constraint, table_name, constraint)
     print("Database tables created")
+    await geo_index.load()
+    asyncio.create_task(purge_idempotency_keys())
+    if EMI_REMINDER_FILE:
+        asyncio.create_task(emi_reminder_scan())
+    if PORTFOLIO_RECONCILE_INTERVAL_SECONDS:
+        asyncio.create_task(portfolio_reconcile(PORTFOLIO_RECONCILE_INTERVAL_SECONDS))
+    if SAVINGS_POSTING_QUEUE:
+        posting_queue.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await posting_queue.stop()
+
+
+async def purge_idempotency_keys(interval_seconds: int = 3600):
+    # Expired keys are already ignored on lookup; this only keeps the table small
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                purged = await idempotency.purge_expired(db)
+            logger.info("IDEMPOTENCY.PURGE removed=%s", purged)
+        except Exception:
+            logger.exception("IDEMPOTENCY.PURGE failed")
+        await asyncio.sleep(interval_seconds)
+
+
+async def emi_reminder_scan(interval_seconds: int = 86400):
+    # Daily in-process run of app.jobs.emi_reminders; with several workers each runs it,
+    # and SKIP LOCKED plus the reminder flag keep an installment from being reminded twice
+    while True:
+        sink = NdjsonFileSink(EMI_REMINDER_FILE)
+        try:
+            await send_reminders(sink)
+        except Exception:
+            logger.exception("EMI.REMINDERS failed")
+        finally:
+            await sink.close()
+        await asyncio.sleep(interval_seconds)
+
+
+async def portfolio_reconcile(interval_seconds: int):
+    # Periodic full rebuild of the loan portfolio aggregate; with several workers a rebuild
+    # that overlaps another fails on the snapshot conflict and is simply retried next round
+    while True:
+        try:
+            await reconcile()
+        except Exception:
+            logger.exception("PORTFOLIO.RECONCILE failed")
+        await asyncio.sleep(interval_seconds)
 
 
 # Health: DB connectivity
@@ -54,6 +130,36 @@ async def db_health():
     return {"status": "ok", "db": "connected"}
 
 
+# Health: idempotency cache hit rate and size
+@app.get("/health/idempotency")
+async def idempotency_health():
+    return idempotency.metrics()
+
+
+# Health: daily transfer-limit counters (warm-ups should stay near one per account per day)
+@app.get("/health/limits")
+async def limits_health():
+    return daily_limits.stats()
+
+
+# Health: customer profile cache hits/misses/evictions
+@app.get("/health/customer-cache")
+async def customer_cache_health():
+    return customer_cache.stats()
+
+
+# Health: geo index size, hit rate and last reload
+@app.get("/health/geo-cache")
+async def geo_cache_health():
+    return geo_index.stats()
+
+
+# Health: loan portfolio cache hits/misses
+@app.get("/health/portfolio")
+async def portfolio_health():
+    return portfolio.metrics()
+
+
 # Health: list tables and verify expected ones
 @app.get("/health/tables")
 async def tables_health():
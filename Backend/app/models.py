@@ -14,11 +14,18 @@ from sqlalchemy import (
     UniqueConstraint,
     DateTime,
     Float,
+    Sequence,
+    Index,
+    text,
+    DDL,
+    event,
+    Computed,
+    inspect,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from app.db import Base
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 
 # ============== MASTER TABLES ==============
 
@@ -41,6 +48,10 @@ class Country(Base):
     CountryName = Column(String, nullable=False)
     states = relationship("State", back_populates="country")
 
+    # Location names are unique case-insensitively under their parent: the conflict
+    # targets of app.crud.locations
+    __table_args__ = (Index("uq_country_name_lower", func.lower(CountryName), unique=True),)
+
 
 class State(Base):
     __tablename__ = "State"
@@ -50,6 +61,8 @@ class State(Base):
     country = relationship("Country", back_populates="states")
     cities = relationship("City", back_populates="state")
 
+    __table_args__ = (Index("uq_state_name_lower", func.lower(StateName), CountryCode, unique=True),)
+
 
 class City(Base):
     __tablename__ = "City"
@@ -59,6 +72,38 @@ class City(Base):
     state = relationship("State", back_populates="cities")
     zips = relationship("PostalCode", back_populates="city")
 
+    __table_args__ = (Index("uq_city_name_lower", func.lower(CityName), StateCode, unique=True),)
+
+
+def _merge_case_duplicates(table: str, pk: str, name: str, parent: str | None, child: str, child_fk: str):
+    # Databases created before the unique name indexes may hold case variants of one
+    # location ("India", "INDIA"); keep the lowest code, move the children over to it and
+    # drop the others, so the index can be built. Runs only when the index is created.
+    partition = f'lower("{name}")' + (f', "{parent}"' if parent else "")
+    duplicates = (
+        f'(SELECT * FROM (SELECT "{pk}" AS code, min("{pk}") OVER (PARTITION BY {partition}) AS keep '
+        f'FROM "{table}") ranked WHERE code <> keep) d'
+    )
+
+    def merge(target, connection, **kw):
+        if not inspect(connection).has_table(child):
+            return  # a fresh database: the tables are being created in this run
+        connection.execute(text(f'UPDATE "{child}" SET "{child_fk}" = d.keep FROM {duplicates} WHERE "{child_fk}" = d.code'))
+        connection.execute(text(f'DELETE FROM "{table}" USING {duplicates} WHERE "{pk}" = d.code'))
+    return merge
+
+
+# in create order: merging countries can make states under the kept country collide,
+# and so on down
+for _model, _index, _args in (
+    (Country, "uq_country_name_lower", ("Country", "CountryCode", "CountryName", None, "State", "CountryCode")),
+    (State, "uq_state_name_lower", ("State", "StateCode", "StateName", "CountryCode", "City", "StateCode")),
+    (City, "uq_city_name_lower", ("City", "CityCode", "CityName", "StateCode", "PostalCode", "CityCode")),
+):
+    event.listen(
+        next(i for i in _model.__table__.indexes if i.name == _index), "before_create", _merge_case_duplicates(*_args)
+    )
+
 
 class PostalCode(Base):
     __tablename__ = "PostalCode"
@@ -84,9 +129,48 @@ class CustomerDetail(Base):
     DOB = Column(Date)
     MaritalStatus = Column(String)
     ZIPCode = Column(String, ForeignKey("PostalCode.ZIPCode"))
+    # Lowercase name trigrams for substring search, kept by Postgres. Stored rather than
+    # indexed as an expression so that rechecking index matches compares arrays instead of
+    # recomputing them per row.
+    FirstNameGrams = deferred(Column(ARRAY(Text), Computed('customer_name_grams("FirstName")', persisted=True)))
+    LastNameGrams = deferred(Column(ARRAY(Text), Computed('customer_name_grams("LastName")', persisted=True)))
 
     zipcode = relationship("PostalCode", back_populates="customers")
-    accounts = relationship("CustomerAccounts", back_populates="customer")
+    # Dependent rows go with ON DELETE CASCADE: the ORM leaves them to the database
+    # instead of loading them to delete (or orphan) one by one
+    accounts = relationship("CustomerAccounts", back_populates="customer", cascade="all, delete", passive_deletes=True)
+
+    __table_args__ = (
+        # Search keys for app.crud.search. On a large existing table add the *Grams columns
+        # and build these with CREATE INDEX CONCURRENTLY before deploying, or startup will
+        # do it under lock.
+        # Substring search on names: trigram containment
+        Index("ix_customer_firstname_grams", FirstNameGrams, postgresql_using="gin"),
+        Index("ix_customer_lastname_grams", LastNameGrams, postgresql_using="gin"),
+        # Name prefix matches in ranked order (app.crud.search.name_key), also for terms
+        # too short to have a trigram
+        Index("ix_customer_firstname_lower", func.lower(FirstName).collate("C"), CustID),
+        Index("ix_customer_lastname_lower", func.lower(LastName).collate("C"), CustID),
+        Index("ix_customer_email_lower", func.lower(EmailID)),
+        # Phone numbers by their last 10 digits, whatever the formatting or country prefix
+        Index("ix_customer_mobile_key", func.customer_phone_key(Mobile)),
+        Index("ix_customer_phone_key", func.customer_phone_key(Phone)),
+    )
+
+
+# IMMUTABLE so they can back the generated columns and expression indexes above;
+# CREATE OR REPLACE, so these run on every create_all()
+event.listen(Base.metadata, "before_create", DDL("""
+CREATE OR REPLACE FUNCTION customer_name_grams(name text) RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT substr(lower(name), i, 3)), '{}')
+    FROM generate_series(1, length(name) - 2) AS i
+$$"""))
+event.listen(Base.metadata, "before_create", DDL("""
+CREATE OR REPLACE FUNCTION customer_phone_key(phone text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT nullif(right(regexp_replace(phone, '[^0-9]', '', 'g'), 10), '')
+$$"""))
 
 
 class AccountType(Base):
@@ -98,6 +182,15 @@ class AccountType(Base):
     accounts = relationship("CustomerAccounts", back_populates="account_type")
 
 
+# Block sequences behind app.services.ids.acct_nums / emi_ids
+ACCT_NUM_SEQUENCE = Sequence(
+    "CustomerAccounts_AcctNum_block_seq", start=0, minvalue=0, increment=100, metadata=Base.metadata
+)
+EMI_ID_SEQUENCE = Sequence(
+    "LoanAccountDetail_EMIID_block_seq", start=0, minvalue=0, increment=100, metadata=Base.metadata
+)
+
+
 class CustomerAccounts(Base):
     __tablename__ = "CustomerAccounts"
     AcctNum = Column(BigInteger, primary_key=True, index=True)
@@ -109,10 +202,16 @@ class CustomerAccounts(Base):
     customer = relationship("CustomerDetail", back_populates="accounts")
     account_type = relationship("AccountType", back_populates="accounts")
     saving_detail = relationship(
-        "SavingAccountDetail", back_populates="account", uselist=False
+        "SavingAccountDetail", back_populates="account", uselist=False, cascade="all, delete", passive_deletes=True
     )
     loan_detail = relationship(
-        "LoanAccountDetail", back_populates="account", uselist=False
+        "LoanAccountDetail", back_populates="account", uselist=False, cascade="all, delete", passive_deletes=True
+    )
+
+    __table_args__ = (
+        # A customer's accounts, and the lookup behind deleting a customer's accounts
+        # by cascade, which would otherwise scan the table per deleted customer
+        Index("ix_customeraccounts_custid", "CustID"),
     )
 
 
@@ -133,10 +232,16 @@ class SavingAccountDetail(Base):
 
     account = relationship("CustomerAccounts", back_populates="saving_detail")
     transactions = relationship(
-        "SavingAccountTxnHistory", back_populates="saving_account"
+        "SavingAccountTxnHistory", back_populates="saving_account", cascade="all, delete", passive_deletes=True
     )
 
 
+# Block sequence behind app.services.ids.txn_ids: each nextval reserves 1000 TxnIDs
+TXN_ID_SEQUENCE = Sequence(
+    "SavingAccountTxnHistory_TxnID_block_seq", start=0, minvalue=0, increment=1000, metadata=Base.metadata
+)
+
+
 class SavingAccountTxnHistory(Base):
     __tablename__ = "SavingAccountTxnHistory"
     TxnID = Column(Integer, primary_key=True, index=True)
@@ -151,6 +256,33 @@ class SavingAccountTxnHistory(Base):
 
     saving_account = relationship("SavingAccountDetail", back_populates="transactions")
 
+    __table_args__ = (
+        # Keyset pagination of one account's history by (TxnDate, TxnID); amounts and
+        # running balance are carried in the index so pages rarely need the heap
+        Index(
+            "ix_savingtxn_acct_date_id", "AcctNum", "TxnDate", "TxnID",
+            postgresql_include=["WithdrawAmount", "DepositAmount", "Balance"],
+        ),
+    )
+
+
+class SavingAccountMonthlySnapshot(Base):
+    """Per-account, per-month rollup of SavingAccountTxnHistory by TxnDate, maintained by
+    every posting (app.crud.snapshots) and rebuilt by app.jobs.snapshot_backfill.
+    Months without transactions have no row; their balance is the previous row's closing."""
+    __tablename__ = "SavingAccountMonthlySnapshot"
+    AcctNum = Column(
+        BigInteger, ForeignKey("SavingAccountDetail.AcctNum", ondelete="CASCADE"), nullable=False
+    )
+    Month = Column(Date, nullable=False)  # first day of the month
+    OpeningBalance = Column(Numeric(18, 2), nullable=False)
+    ClosingBalance = Column(Numeric(18, 2), nullable=False)
+    DepositTotal = Column(Numeric(18, 2), nullable=False)
+    WithdrawTotal = Column(Numeric(18, 2), nullable=False)
+    TxnCount = Column(Integer, nullable=False)
+
+    __table_args__ = (PrimaryKeyConstraint("AcctNum", "Month", name="savingmonthlysnapshot_pk"),)
+
 
 # ============== LOAN ==============
 
@@ -173,7 +305,10 @@ class LoanAccountDetail(Base):
     __table_args__ = (PrimaryKeyConstraint("AcctNum", "EMIID", name="loanaccount_pk"),)
 
     account = relationship("CustomerAccounts", back_populates="loan_detail")
-    emis = relationship("LoanEMIDetail", back_populates="loan_account")
+    emis = relationship(
+        "LoanEMIDetail", back_populates="loan_account", order_by="LoanEMIDetail.EMIDate",
+        cascade="all, delete", passive_deletes=True,
+    )
 
 
 class LoanEMIDetail(Base):
@@ -186,6 +321,104 @@ class LoanEMIDetail(Base):
     EMIStatus = Column(String)  # Paid/Pending
     EMIReminder = Column(Boolean, default=False)
     RemainingBalance = Column(Numeric(18, 2))
+    PaidDate = Column(Date)
 
     loan_account = relationship("LoanAccountDetail", back_populates="emis")
- 
\ No newline at end of file
+
+    __table_args__ = (
+        # One loan's schedule in due-date order (and the "already scheduled?" check)
+        Index("ix_loanemi_emiid_emidate", "EMIID", "EMIDate"),
+        # Pending installments not yet reminded, by due date (app.jobs.emi_reminders);
+        # rows leave the index once reminded or paid, so it stays the size of the backlog
+        Index(
+            "ix_loanemi_pending_due", "EMIDate", "EMINum",
+            postgresql_where=text("\"EMIStatus\" = 'Pending' AND \"EMIReminder\" IS NOT TRUE"),
+        ),
+    )
+
+
+class LoanPortfolioAggregate(Base):
+    """Loan portfolio totals per (BranchCode, LoanAccountTypeId), rebuilt by
+    app.jobs.portfolio_reconcile. Changes since the last rebuild are in LoanPortfolioDelta;
+    current figures are the sum of both (app.crud.portfolio)."""
+    __tablename__ = "LoanPortfolioAggregate"
+    BranchCode = Column(String(20), nullable=False)  # '' when the loan has none
+    LoanAccountTypeId = Column(Integer, nullable=False)  # 0 when the loan has none
+    LoanCount = Column(Integer, nullable=False)
+    OutstandingPrincipal = Column(Numeric(18, 2), nullable=False)  # sum of BalanceAmount
+    RateWeightedPrincipal = Column(Numeric(24, 4), nullable=False)  # sum of BalanceAmount * RateOfInterest
+    OverdueEMICount = Column(Integer, nullable=False)  # pending EMIs due before AsOf
+    OverdueAmount = Column(Numeric(18, 2), nullable=False)
+    AsOf = Column(Date, nullable=False)
+    RefreshedAt = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (PrimaryKeyConstraint("BranchCode", "LoanAccountTypeId", name="loanportfolioaggregate_pk"),)
+
+
+class LoanPortfolioDelta(Base):
+    """Append-only changes to LoanPortfolioAggregate written by the loan and EMI write
+    paths (insert-only, so concurrent payments never contend on an aggregate row)."""
+    __tablename__ = "LoanPortfolioDelta"
+    DeltaID = Column(BigInteger, primary_key=True, autoincrement=True)
+    BranchCode = Column(String(20), nullable=False)
+    LoanAccountTypeId = Column(Integer, nullable=False)
+    LoanCount = Column(Integer, nullable=False, default=0)
+    OutstandingPrincipal = Column(Numeric(18, 2), nullable=False, default=0)
+    RateWeightedPrincipal = Column(Numeric(24, 4), nullable=False, default=0)
+    PaidEMIDueDate = Column(Date)  # set for an EMI payment: overdue if before the aggregate's AsOf
+    PaidEMIAmount = Column(Numeric(18, 2))
+    CreatedAt = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ============== READ MODELS ==============
+
+
+class Customer360(Base):
+    """One JSONB document per customer for the teller screen: profile, address, every
+    account with its balance and loan outstanding amounts (app.crud.customer360).
+    Refreshed in the transaction of every write marked with mark_customer_changed (patched
+    for mark_balances_changed); rebuilt and checked by app.jobs.customer360_rebuild."""
+    __tablename__ = "Customer360"
+    CustID = Column(Integer, ForeignKey("CustomerDetail.CustID", ondelete="CASCADE"), primary_key=True)
+    Document = Column(JSONB, nullable=False)
+    UpdatedAt = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+# ============== API SUPPORT ==============
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a money-moving request, replayed when a client retries with the same key."""
+    __tablename__ = "IdempotencyKey"
+    Scope = Column(String(100), nullable=False)  # route + customer, e.g. "savings.deposit:42"
+    Key = Column(String(255), nullable=False)  # client-supplied Idempotency-Key header
+    RequestHash = Column(String(64), nullable=False)
+    StatusCode = Column(Integer)  # NULL while the owning transaction is in flight
+    ResponseBody = Column(JSONB)
+    CreatedAt = Column(DateTime(timezone=True), server_default=func.now())
+    ExpiresAt = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("Scope", "Key", name="idempotencykey_pk"),
+        Index("ix_idempotencykey_expiresat", "ExpiresAt"),
+    )
+
+
+# ============== BATCH JOBS ==============
+
+
+class InterestAccrualRun(Base):
+    """Checkpoint of app.jobs.interest_accrual: one row per accrual period, advanced in the
+    same transaction as each chunk of interest credits, so a restarted run resumes after
+    LastAcctNum without crediting any account twice."""
+    __tablename__ = "InterestAccrualRun"
+    PeriodStart = Column(Date, primary_key=True)
+    PeriodEnd = Column(Date, nullable=False)
+    Rate = Column(Numeric(5, 2), nullable=False)  # annual %, fixed for the whole run
+    LastAcctNum = Column(BigInteger, nullable=False, default=0)
+    AccountsProcessed = Column(Integer, nullable=False, default=0)
+    AccountsCredited = Column(Integer, nullable=False, default=0)
+    InterestTotal = Column(Numeric(18, 2), nullable=False, default=0)
+    Status = Column(String(20), nullable=False, default="running")  # running/done
+    StartedAt = Column(DateTime(timezone=True), server_default=func.now())
+    FinishedAt = Column(DateTime(timezone=True))
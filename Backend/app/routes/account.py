@@ -1,5 +1,5 @@
 # app/routers/accounts.py (async version)
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, status
 from sqlalchemy import select, and_, func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,16 +11,21 @@ from app.models import (
 )
 from app.schemas.customer import SavingAccountCreate, LoanAccountCreate
 from app.security.combined import authorize_user
+from app.crud.snapshots import apply_to_snapshots
+from app.crud.loans import create_emi_schedules, first_due_date
+from app.crud.portfolio import record_loan_opened
+from app.services.ids import txn_ids, acct_nums, emi_ids
+from app.services import idempotency
+from app.services.limits import daily_limits
+from app.services.customer_cache import mark_customer_changed
+from app.services.idempotency import StoredResponse
 from app.schemas.customer import SavingAccountUpdateRequest
 from app.schemas.customer import SavingAccountUpdateResponse
 from decimal import Decimal
 from datetime import date
 from sqlalchemy.exc import IntegrityError
 
-import random
-
 router = APIRouter(prefix="/customers", tags=["accounts"])
-MAX_RETRIES = 5
 
 def normalize_type_pair(account_type: str, acc_subtype: str | None):
     t = (account_type or "").strip().title()
@@ -61,30 +66,28 @@ async def has_duplicate_account(db: AsyncSession, cust_id: int, account_type_id:
     )
     return (result.scalar_one() or 0) > 0
 
-def generate_random_acctnum_9() -> int:
-    return random.randint(100_000_000, 999_999_999)
-
-async def create_customer_account_with_random_acctnum(
+async def create_customer_account(
     db: AsyncSession, cust_id: int, account_type_id: int
 ) -> CustomerAccounts:
-    last_err = None
-    for _ in range(MAX_RETRIES):
-        acct_num = generate_random_acctnum_9()
-        ca = CustomerAccounts(AcctNum=acct_num, CustID=cust_id, AccountTypeID=account_type_id)
-        db.add(ca)
-        try:
-            await db.flush()  # try INSERT; collision triggers IntegrityError if AcctNum is unique
-            return ca
-        except IntegrityError as e:
-            await db.rollback()
-            last_err = e
-    raise HTTPException(status_code=503, detail="Unable to allocate account number, retry later")
+    # AcctNum comes from the block allocator, so the INSERT cannot collide and needs no retry
+    ca = CustomerAccounts(AcctNum=await acct_nums.next_id(db), CustID=cust_id, AccountTypeID=account_type_id)
+    db.add(ca)
+    await db.flush()
+    mark_customer_changed(db, cust_id)
+    return ca
 
 @router.post("/{cust_id}/savings", status_code=status.HTTP_201_CREATED)
 async def create_savings_account(
     cust_id: int, payload: SavingAccountCreate, db: AsyncSession = Depends(get_db),
-    admin=Depends(authorize_user)
+    admin=Depends(authorize_user), idempotency_key: str | None = Header(default=None),
 ):
+    claim = await idempotency.claim_or_replay(
+        db, idempotency_key, f"accounts.savings:{cust_id}",
+        idempotency.request_fingerprint(cust_id, payload.model_dump(mode="json")),
+    )
+    if isinstance(claim, StoredResponse):
+        return idempotency.replay_response(claim)
+
     if not await customer_exists(db, cust_id):
         raise HTTPException(status_code=404, detail="Customer not found")
 
@@ -93,7 +96,7 @@ async def create_savings_account(
     if await has_duplicate_account(db, cust_id, at.AccountTypeID):
         raise HTTPException(status_code=409, detail="Account of this type/subtype already exists for customer")
 
-    ca = await create_customer_account_with_random_acctnum(db, cust_id, at.AccountTypeID)
+    ca = await create_customer_account(db, cust_id, at.AccountTypeID)
 
     sd = SavingAccountDetail(
         AcctNum=ca.AcctNum,
@@ -114,6 +117,7 @@ async def create_savings_account(
     txn = None
     if balance_val > Decimal("0.00"):
         txn = SavingAccountTxnHistory(
+            TxnID = await txn_ids.next_id(db),
             TxnDate = date.today(),
             AcctNum = ca.AcctNum,
             TxnDetail = "Initial deposit",
@@ -123,9 +127,20 @@ async def create_savings_account(
         )
         db.add(txn)
 
+    body = {
+        "AcctNum": ca.AcctNum,
+        "CustID": cust_id,
+        "AccountTypeID": at.AccountTypeID,
+        "AccountType": at.AccountType,
+        "AccSubType": at.AccSubType,
+    }
+
     # flush and commit, handle errors
     try:
         await db.flush()
+        if txn is not None:
+            await apply_to_snapshots(db, [(ca.AcctNum, txn.TxnDate, balance_val)])
+        await idempotency.complete(db, claim, status.HTTP_201_CREATED, body)
         await db.commit()
         await db.refresh(sd)
         if txn is not None:
@@ -137,19 +152,21 @@ async def create_savings_account(
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to create saving account")
 
-    return {
-        "AcctNum": ca.AcctNum,
-        "CustID": cust_id,
-        "AccountTypeID": at.AccountTypeID,
-        "AccountType": at.AccountType,
-        "AccSubType": at.AccSubType,
-    }
+    idempotency.remember(claim)
+    return body
 
 @router.post("/{cust_id}/loan", status_code=status.HTTP_201_CREATED)
 async def create_loan_account(
     cust_id: int, payload: LoanAccountCreate, db: AsyncSession = Depends(get_db),
-    admin=Depends(authorize_user)
+    admin=Depends(authorize_user), idempotency_key: str | None = Header(default=None),
 ):
+    claim = await idempotency.claim_or_replay(
+        db, idempotency_key, f"accounts.loan:{cust_id}",
+        idempotency.request_fingerprint(cust_id, payload.model_dump(mode="json")),
+    )
+    if isinstance(claim, StoredResponse):
+        return idempotency.replay_response(claim)
+
     if not await customer_exists(db, cust_id):
         raise HTTPException(status_code=404, detail="Customer not found")
     at = await get_or_create_account_type(db, payload.AccountType, payload.AccSubType)
@@ -157,9 +174,9 @@ async def create_loan_account(
     if await has_duplicate_account(db, cust_id, at.AccountTypeID):
         raise HTTPException(status_code=409, detail="Account of this type/subtype already exists for customer")
 
-    ca = await create_customer_account_with_random_acctnum(db, cust_id, at.AccountTypeID)
+    ca = await create_customer_account(db, cust_id, at.AccountTypeID)
 
-    emiID = random.randint(100000, 999999)
+    emiID = await emi_ids.next_id(db)
 
     ld = LoanAccountDetail(
         AcctNum=ca.AcctNum,
@@ -173,13 +190,7 @@ async def create_loan_account(
     )
     db.add(ld)
 
-    try:
-        await db.commit()
-    except IntegrityError:
-        await db.rollback()
-        raise HTTPException(status_code=409, detail="Loan conflict detected")
-
-    return {
+    body = {
         "AcctNum": ca.AcctNum,
         "CustID": cust_id,
         "AccountTypeID": at.AccountTypeID,
@@ -188,6 +199,19 @@ async def create_loan_account(
         "EMIID": emiID,
     }
 
+    try:
+        await db.flush()
+        await create_emi_schedules(db, [emiID], first_due_date(date.today()))
+        await record_loan_opened(db, payload.BranchCode, at.AccountTypeID, payload.TotalLoanAmount, payload.RateOfInterest)
+        await idempotency.complete(db, claim, status.HTTP_201_CREATED, body)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Loan conflict detected")
+
+    idempotency.remember(claim)
+    return body
+
 @router.put("/savings/update", response_model=SavingAccountUpdateResponse)
 async def update_saving_account(
     request: SavingAccountUpdateRequest,
@@ -240,9 +264,15 @@ async def update_saving_account(
             cust_acc.AccountTypeID = account_type_id
             updated_columns.append("CustomerAccounts.AccountTypeID")
 
+    if updated_columns:
+        owner = await db.get(CustomerAccounts, request.AcctNum)
+        mark_customer_changed(db, owner.CustID if owner else None)
+
     # 4. Commit updates
     await db.commit()
     await db.refresh(saving_acc)
+    if "TransferLimit" in updated_columns:
+        daily_limits.invalidate(request.AcctNum)
 
     return SavingAccountUpdateResponse(
         message="Saving account updated successfully",
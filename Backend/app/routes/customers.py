@@ -1,17 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Query
+import csv
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_db
+from app.db import get_db, AsyncSessionLocal
 from app.schemas.customer import CustomerCreate, CustomerOut, CustomerUpdate, CustomerUpdateResponse, CustomerOutByID, AccountOut, PostalCodeOut, SavingTxnOut, LoanEMIOut
-from app.crud.customer import get_customer_full_by_id
+from app.crud.customer import get_customer_full_by_id, get_postal_hierarchy, search_postal_codes
 from app.crud.customer import create_customer, get_customer_by_email
 from app.crud.customer import get_customer_by_id, update_customer
 from app.crud.customer import delete_customer
-import sqlalchemy as sa
+from app.crud.customer_import import import_customers, parse_body
+from app.crud.customer_purge import iter_purge, purge_customers
+from app.crud.customer360 import read_document
+from app.crud.search import search_customers, search_filters, stream_customers, count_customers, SEARCH_LIMIT
+from app.crud.savings import recent_savings_txns
+from app.services.cursor import encode_cursor, decode_cursor
+from app.services.customer_cache import customer_cache
 from decimal import Decimal
-from typing import Optional
+from typing import Literal, Optional
 
-from app.models import CustomerDetail
-from app.schemas.customer import AdvSearchRequest, AdvSearchResponseItem
+from app.schemas.customer import AdvSearchRequest, AdvSearchResponseItem, CustomerImportResponse, CustomerImportError
+from app.schemas.customer import CustomerPurgeRequest, CustomerPurgeResponse, Customer360Out
 from app.security.combined import authorize_user
 
 router = APIRouter(prefix="/customers", tags=["customers"])
@@ -37,6 +47,58 @@ async def add_customer(payload: CustomerCreate, db: AsyncSession = Depends(get_d
     return CustomerOut.from_orm(cust)
 
 
+@router.post("/import", response_model=CustomerImportResponse)
+async def import_customers_route(request: Request, db: AsyncSession = Depends(get_db), admin=Depends(authorize_user)):
+    """Onboard many customers at once (same fields and rules as POST /customers/).
+
+    Body is CSV with a header row (Content-Type: text/csv), NDJSON (application/x-ndjson)
+    or a JSON array. Rows are committed in chunks; rejected rows (duplicate or existing
+    email, unknown ZIP without location, invalid fields) are listed in `errors` and do not
+    stop the import. For very large files use `python -m app.jobs.customer_import`.
+    """
+    try:
+        rows = list(parse_body(await request.body(), request.headers.get("content-type", "")))
+    except (ValueError, csv.Error) as ve:  # JSON and decoding errors are ValueErrors
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed import body: {ve}")
+
+    stats = await import_customers(db, rows)
+    return CustomerImportResponse(
+        **stats.summary(),
+        errors=[CustomerImportError(index=e.index, status_code=e.status_code, EmailID=e.EmailID, detail=e.detail) for e in stats.errors],
+    )
+
+
+@router.post("/purge", response_model=CustomerPurgeResponse)
+async def purge_customers_route(
+    payload: CustomerPurgeRequest,
+    format: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user),
+):
+    """Delete many customers at once, given by CustIDs and/or EmailIDs, with their accounts,
+    savings and loan details, transaction history and EMIs.
+
+    Customers are deleted in chunks of PURGE_CHUNK_CUSTOMERS, each committed on its own;
+    identifiers matching no customer are listed in `not_found`. format=ndjson streams the
+    progress instead: one line per committed chunk, the last with `done` and `not_found`.
+    For very large lists use `python -m app.jobs.customer_purge`.
+    """
+    if not payload.CustIDs and not payload.EmailIDs:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give CustIDs or EmailIDs to delete")
+
+    if format == "ndjson":
+        async def progress():
+            async with AsyncSessionLocal() as session:
+                async for stats in iter_purge(session, payload.CustIDs, payload.EmailIDs):
+                    line = stats.summary() if not stats.done else {**stats.summary(), "not_found": stats.not_found}
+                    yield (json.dumps(line) + "\n").encode("utf-8")
+
+        return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+    stats = await purge_customers(db, payload.CustIDs, payload.EmailIDs)
+    return CustomerPurgeResponse(**stats.summary(), not_found=stats.not_found)
+
+
 @router.put("/{cust_id}", response_model=CustomerUpdateResponse)
 async def update_customer_route(cust_id: int, payload_raw: dict = Body(...), db: AsyncSession = Depends(get_db), admin = Depends(authorize_user)):
     """Update an existing customer by CustID. The payload should include fields to update (same schema as create).
@@ -102,21 +164,67 @@ async def update_customer_route(cust_id: int, payload_raw: dict = Body(...), db:
         customer=CustomerOut.from_orm(updated_cust),
     )
 
+@router.get("/zipcodes", response_model=list[PostalCodeOut])
+async def autocomplete_zipcodes(
+    prefix: str = Query(..., min_length=1, max_length=20),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    admin = Depends(authorize_user)
+):
+    """ZIP code autocomplete: postal codes starting with `prefix`, in ZIPCode order, with
+    their city, state and country."""
+    return [PostalCodeOut.model_validate(postal) for postal in await search_postal_codes(db, prefix.strip(), limit)]
+
+
+@router.get("/{cust_id}/360", response_model=Customer360Out)
+async def get_customer_360(cust_id: int, db: AsyncSession = Depends(get_db), admin=Depends(authorize_user)):
+    """Teller view of a customer: profile, full address, every account with its balance
+    and loan outstanding amounts, with totals.
+
+    Served as stored in Customer360 (app.crud.customer360), one primary-key lookup whose
+    JSON is passed through as is; refreshed in the same transaction as every change.
+    """
+    document = await read_document(db, cust_id)
+    if document is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
+    return Response(content=document, media_type="application/json")
+
+
 @router.get("/{cust_id}", response_model=CustomerOutByID, status_code=status.HTTP_200_OK)
 async def get_customer(
     cust_id: int,
+    txn_limit: int = Query(20, ge=0, le=500, description="recent transactions embedded per savings account"),
     db: AsyncSession = Depends(get_db),
     admin = Depends(authorize_user)
 ):
+    # the generation is read before the database, so a profile loaded from rows that a
+    # concurrent commit has just replaced is stored as already stale
+    cached, generation = customer_cache.lookup(cust_id, txn_limit)
+    if cached is not None:
+        return cached
+
     cust = await get_customer_full_by_id(db, cust_id)
     if not cust:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
 
+    # one extra row per account tells whether older transactions remain
+    recent = await recent_savings_txns(db, [acc.AcctNum for acc in cust.accounts if acc.saving_detail], txn_limit + 1)
+
+    postal = await get_postal_hierarchy(db, cust.ZIPCode)
+
     accounts_out: list[AccountOut] = []
 
     for acc in cust.accounts:
         # Savings
         if acc.saving_detail:
+            txns = recent[acc.AcctNum]
+            transactions_next = None
+            if len(txns) > txn_limit:
+                txns = txns[:txn_limit]
+                transactions_next = f"/accounts/{acc.AcctNum}/transactions"
+                if txns:
+                    cursor = encode_cursor({"d": txns[-1].TxnDate.isoformat(), "i": txns[-1].TxnID})
+                    transactions_next += f"?limit={txn_limit}&cursor={cursor}"
             transactions = [
                 SavingTxnOut(
                     TxnID=txn.TxnID,
@@ -126,7 +234,7 @@ async def get_customer(
                     DepositAmount=txn.DepositAmount or Decimal("0.00"),
                     Balance=txn.Balance or Decimal("0.00"),
                 )
-                for txn in (acc.saving_detail.transactions or [])
+                for txn in txns
             ]
 
             accounts_out.append(
@@ -136,6 +244,7 @@ async def get_customer(
                     AccSubType=acc.account_type.AccSubType,
                     Balance=float(acc.saving_detail.Balance or 0),
                     transactions=transactions,
+                    transactions_next=transactions_next,
                     emis=[],
                 )
             )
@@ -145,10 +254,12 @@ async def get_customer(
             emis = [
                 LoanEMIOut(
                     EMIID=emi.EMIID,
+                    EMINum=emi.EMINum,
                     EMIAmount=float(emi.EMIAmount or 0),
-                    DueDate=emi.DueDate,
+                    DueDate=emi.EMIDate,
                     PaidDate=emi.PaidDate,
-                    Status=emi.Status,
+                    Status=emi.EMIStatus,
+                    RemainingBalance=float(emi.RemainingBalance or 0),
                 )
                 for emi in (acc.loan_detail.emis or [])
             ]
@@ -176,9 +287,10 @@ async def get_customer(
         DOB=cust.DOB,
         MaritalStatus=cust.MaritalStatus,
         ZIPCode=cust.ZIPCode,
-        zipcode=PostalCodeOut.model_validate(cust.zipcode) if cust.zipcode else None,
+        zipcode=PostalCodeOut.model_validate(postal) if postal is not None else None,
         accounts=accounts_out,
     )
+    customer_cache.store(cust_id, generation, customer_out.model_dump(mode="json"), txn_limit)
     return customer_out
 
 
@@ -216,30 +328,52 @@ async def delete_customer_route(
 
 
 @router.post("/advSearch", response_model=list[AdvSearchResponseItem])
-async def adv_search(payload: AdvSearchRequest, session: AsyncSession = Depends(get_db)):
-    filters = []
-    if payload.firstName:
-        filters.append(sa.func.lower(CustomerDetail.FirstName).like(f"%{payload.firstName.lower()}%"))
-    if payload.lastName:
-        filters.append(sa.func.lower(CustomerDetail.LastName).like(f"%{payload.lastName.lower()}%"))
-    if payload.email:
-        filters.append(sa.func.lower(CustomerDetail.EmailID) == payload.email.lower())
-    if payload.mobile:
-        filters.append(CustomerDetail.Mobile == payload.mobile)
-
-    if not filters:
+async def adv_search(
+    payload: AdvSearchRequest,
+    response: Response,
+    format: Literal["json", "ndjson"] = "json",
+    session: AsyncSession = Depends(get_db),
+):
+    """Ranked, index-backed customer search; see app.crud.search for the matching rules.
+
+    The body is one page as a JSON array. While more matches follow, X-Next-Cursor holds
+    the cursor for the next page (send it back as `cursor` with the same filters and
+    sort). With includeCount, X-Total-Count is exact up to SEARCH_COUNT_CAP matches
+    (X-Total-Count-Exact: true) and the planner's estimate past that. format=ndjson
+    streams every match from the cursor on (or `limit` of them), one object per line.
+    """
+    try:
+        search = search_filters(payload.firstName, payload.lastName, payload.email, payload.mobile)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    if not search:
         raise HTTPException(status_code=400, detail="At least one filter is required")
 
-    stmt = (
-        sa.select(
-            CustomerDetail.CustID.label("custId"),
-            CustomerDetail.FirstName.label("firstName"),
-            CustomerDetail.LastName.label("lastName"),
-            CustomerDetail.Phone.label("phone"),
-            CustomerDetail.EmailID.label("email"),
+    after = None
+    if payload.cursor:
+        try:
+            key = decode_cursor(payload.cursor)
+            after = (int(key["t"]), str(key["k"]), int(key["i"]))
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if key.get("s") != payload.sort or key.get("f") != search.fingerprint:
+            raise HTTPException(status_code=400, detail="Cursor belongs to a different search or sort")
+
+    headers = {}
+    if payload.includeCount:
+        total, exact = await count_customers(session, search)
+        headers = {"X-Total-Count": str(total), "X-Total-Count-Exact": "true" if exact else "false"}
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_customers(search, payload.sort, after, payload.limit),
+            media_type="application/x-ndjson",
+            headers=headers,
         )
-        .where(sa.and_(*filters))
-        .limit(200)
-    )
-    result = await session.execute(stmt)
-    return [dict(row._mapping) for row in result]
+
+    items, next_after = await search_customers(session, search, payload.limit or SEARCH_LIMIT, payload.sort, after)
+    if next_after is not None:
+        tier, key, cust_id = next_after
+        headers["X-Next-Cursor"] = encode_cursor({"s": payload.sort, "f": search.fingerprint, "t": tier, "k": key, "i": cust_id})
+    response.headers.update(headers)
+    return items
@@ -0,0 +1,125 @@
+# app/routers/loan_txn.py
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_db
+from app.crud.loans import pay_emis, EMIPayment, EMIPaid
+from app.crud.savings import PostingError
+from app.schemas.customer import LoanEMIPayRequest, LoanEMIPayItem, LoanEMIPayResult, LoanEMIPayBatchResponse
+from app.routes.savings_txn import parse_date_only, _commit_posting, _parse_batch_body
+from app.security.combined import authorize_user
+from app.services import idempotency
+from app.services.idempotency import StoredResponse
+from app.services.limits import daily_limits
+
+router = APIRouter(prefix="/customers", tags=["loan-transactions"])
+
+
+def _record_debits(paid: list[EMIPaid]):
+    # EMI debits are not held to the daily TransferLimit, but they count towards it
+    for r in paid:
+        if r.Savings is not None:
+            daily_limits.record(r.Savings.AcctNum, r.EMIAmount, r.Savings.TxnDate)
+
+
+@router.post("/{cust_id}/loan/{acct_num}/emi/pay", status_code=status.HTTP_201_CREATED)
+async def pay_loan_emi(
+    cust_id: int,
+    acct_num: int,
+    payload: LoanEMIPayRequest,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user),
+    idempotency_key: str | None = Header(default=None),
+):
+    """Pay the loan's next pending installment (or the given EMINum, which must be the next
+    one), optionally debiting one of the customer's savings accounts, in one transaction."""
+    try:
+        paid_date = parse_date_only(payload.PaidDate)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid PaidDate")
+
+    claim = await idempotency.claim_or_replay(
+        db, idempotency_key, f"loan.emi.pay:{cust_id}",
+        idempotency.request_fingerprint(cust_id, {"AcctNum": acct_num, **payload.model_dump(mode="json")}),
+    )
+    if isinstance(claim, StoredResponse):
+        return idempotency.replay_response(claim)
+
+    outcome = (await pay_emis(db, [EMIPayment(0, cust_id, acct_num, payload.EMINum, paid_date, payload.FromAcctNum)]))[0]
+    if isinstance(outcome, PostingError):
+        await db.rollback()
+        raise HTTPException(status_code=outcome.status_code, detail=outcome.detail)
+
+    body = {
+        "CustID": cust_id,
+        "AcctNum": acct_num,
+        "EMINum": outcome.EMINum,
+        "EMIID": outcome.EMIID,
+        "EMIAmount": str(outcome.EMIAmount),
+        "DueDate": outcome.EMIDate.isoformat(),
+        "PaidDate": paid_date.isoformat(),
+        "Interest": str(outcome.Interest),
+        "Principal": str(outcome.Principal),
+        "BalanceAmount": str(outcome.BalanceAmount),
+        "FromAcctNum": payload.FromAcctNum,
+        "SavingsTxnID": outcome.Savings.TxnID if outcome.Savings else None,
+        "SavingsBalance": str(outcome.Savings.NewBalance) if outcome.Savings else None,
+    }
+    await idempotency.complete(db, claim, status.HTTP_201_CREATED, body)
+    await _commit_posting(db)
+    idempotency.remember(claim)
+    _record_debits([outcome])
+    return body
+
+
+@router.post("/loan/emi/batch", response_model=LoanEMIPayBatchResponse)
+async def pay_loan_emi_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user)
+):
+    """Pay many installments across many loans in one transaction.
+
+    Body is a JSON array or NDJSON (Content-Type: application/x-ndjson) of LoanEMIPayItem.
+    Items for the same loan pay its installments in due order; each item gets its own
+    result and invalid or rejected items do not fail the batch.
+    """
+    try:
+        raw_items = _parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as ve:  # json.JSONDecodeError is a ValueError
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed batch body: {ve}")
+
+    results: dict[int, LoanEMIPayResult] = {}
+    payments: list[EMIPayment] = []
+    for index, raw in enumerate(raw_items):
+        try:
+            if isinstance(raw, str):
+                item = LoanEMIPayItem.model_validate_json(raw)
+            else:
+                item = LoanEMIPayItem.model_validate(raw)
+            paid_date = parse_date_only(item.PaidDate)
+        except (ValidationError, ValueError, TypeError) as e:
+            results[index] = LoanEMIPayResult(index=index, status_code=422, detail=str(e))
+            continue
+        payments.append(EMIPayment(index, item.CustID, item.AcctNum, item.EMINum, paid_date, item.FromAcctNum))
+
+    outcomes = await pay_emis(db, payments)
+    await _commit_posting(db)
+    _record_debits([o for o in outcomes.values() if isinstance(o, EMIPaid)])
+
+    for p in payments:
+        outcome = outcomes[p.index]
+        if isinstance(outcome, PostingError):
+            results[p.index] = LoanEMIPayResult(
+                index=p.index, status_code=outcome.status_code, AcctNum=p.acct_num, EMINum=p.emi_num, detail=outcome.detail
+            )
+        else:
+            results[p.index] = LoanEMIPayResult(
+                index=p.index, status_code=201, AcctNum=p.acct_num, EMINum=outcome.EMINum,
+                EMIAmount=outcome.EMIAmount, BalanceAmount=outcome.BalanceAmount,
+                SavingsTxnID=outcome.Savings.TxnID if outcome.Savings else None,
+            )
+
+    ordered = [results[i] for i in sorted(results)]
+    paid = sum(1 for r in ordered if r.status_code == 201)
+    return LoanEMIPayBatchResponse(paid=paid, rejected=len(ordered) - paid, results=ordered)
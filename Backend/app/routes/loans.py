@@ -0,0 +1,25 @@
+# app/routes/loans.py
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_db
+from app.schemas.customer import LoanPortfolioResponse
+from app.security.combined import authorize_user
+from app.services.portfolio import get_portfolio
+
+router = APIRouter(prefix="/loans", tags=["loans"])
+
+
+@router.get("/portfolio", response_model=LoanPortfolioResponse)
+async def loan_portfolio(
+    branch_code: str | None = None,
+    loan_type_id: int | None = None,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user)
+):
+    """Outstanding principal, weighted average RateOfInterest and overdue EMIs per
+    (BranchCode, LoanAccountTypeId), optionally filtered to one branch and/or loan type.
+
+    Served from the precomputed portfolio aggregate plus the changes since its last rebuild,
+    cached in process for a few seconds; overdue figures are as of AsOf.
+    """
+    return await get_portfolio(db, branch_code, loan_type_id)
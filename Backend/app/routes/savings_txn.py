@@ -1,23 +1,25 @@
 # app/routers/savings_txn.py
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy import select, and_
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, status
+from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_db
-from app.models import SavingAccountDetail, SavingAccountTxnHistory, CustomerAccounts
+from app.crud.savings import post_savings_txn, post_savings_batch, transfer_between_savings
+from app.crud.savings import BatchPosting, PostingResult, PostingError
 from app.schemas.customer import SavingDepositRequest
 from app.schemas.customer import SavingWithdrawRequest
+from app.schemas.customer import SavingPostingItem, SavingPostingResult, SavingBatchResponse
+from app.schemas.customer import SavingTransferRequest
 from datetime import date, datetime
-import random
+import json
 from app.security.combined import authorize_user
+from app.services import idempotency
+from app.services.idempotency import StoredResponse
+from app.services.posting_queue import posting_queue
+from app.services.limits import daily_limits, LimitReservation
 
 router = APIRouter(prefix="/customers", tags=["savings-transactions"])
 
-MAX_TXNID_RETRIES = 7
-
-def generate_9_digit() -> int:
-    # exactly 9 digits, no leading zero
-    return random.randint(100_000_000, 999_999_999)
 
 def parse_date_only(raw: str) -> date:
     # Accept "YYYY-MM-DD" or ISO datetime strings; store only the date
@@ -26,191 +28,238 @@ def parse_date_only(raw: str) -> date:
     except ValueError:
         return datetime.fromisoformat(raw).date()
 
-async def acct_belongs_to_customer(db: AsyncSession, cust_id: int, acct_num: int) -> bool:
-    q = (
-        select(CustomerAccounts.AcctNum)
-        .where(and_(CustomerAccounts.CustID == cust_id, CustomerAccounts.AcctNum == acct_num))
-        .limit(1)
-    )
-    res = await db.execute(q)
-    return res.scalar_one_or_none() is not None
 
-@router.post("/{cust_id}/savings/deposit", status_code=status.HTTP_201_CREATED)
-async def deposit_to_savings(
-    cust_id: int,
-    payload: SavingDepositRequest,
-    db: AsyncSession = Depends(get_db),
-    admin=Depends(authorize_user)
+async def _commit_posting(db: AsyncSession):
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Transaction conflict, please retry")
+
+
+async def _reserve_daily_limit(db: AsyncSession, acct_num: int, amount, txn_date: date) -> LimitReservation | None:
+    try:
+        return await daily_limits.reserve(db, acct_num, amount, txn_date)
+    except PostingError as pe:
+        await db.rollback()
+        raise HTTPException(status_code=pe.status_code, detail=pe.detail)
+
+
+async def _post_and_respond(
+    db: AsyncSession, cust_id: int, payload, delta, amount_key: str, scope: str, idempotency_key: str | None
 ):
-    # Verify account belongs to this customer
-    if not await acct_belongs_to_customer(db, cust_id, payload.AcctNum):
-        raise HTTPException(status_code=404, detail="Account not found for customer")
+    # A retried request with the same Idempotency-Key gets the stored response back
+    claim = await idempotency.claim_or_replay(
+        db, idempotency_key, scope, idempotency.request_fingerprint(cust_id, payload.model_dump(mode="json"))
+    )
+    if isinstance(claim, StoredResponse):
+        return idempotency.replay_response(claim)
 
     # Parse TxnDate to a pure date (avoids tz issues; DB should use DATE type)
     txn_date = parse_date_only(payload.TxnDate)
 
-    # Load current balance
-    res = await db.execute(
-        select(SavingAccountDetail).where(SavingAccountDetail.AcctNum == payload.AcctNum)
-    )
-    sad = res.scalar_one_or_none()
-    if not sad:
-        raise HTTPException(status_code=404, detail="Saving account detail not found")
+    def build_body(posted: PostingResult) -> dict:
+        return {
+            "CustID": cust_id,
+            "AcctNum": payload.AcctNum,
+            "TxnID": posted.TxnID,
+            amount_key: str(payload.Amount),
+            "TxnDate": txn_date.isoformat(),  # safe: this is a date object
+            "NewBalance": str(posted.NewBalance),
+        }
+
+    # Withdrawals count against the account's daily TransferLimit; given back if not posted
+    reservation = await _reserve_daily_limit(db, payload.AcctNum, -delta, txn_date) if delta < 0 else None
+    try:
+        body = await _submit_posting(db, cust_id, payload, delta, txn_date, claim, build_body)
+    except Exception:
+        daily_limits.release(reservation)
+        raise
+    daily_limits.settle(reservation)
+    return body
 
-    current = sad.Balance or 0
-    new_balance = current + payload.Amount
 
-    # Insert txn with 9-digit TxnID and update master balance, with retry on TxnID collision
-    txn = None
-    for _ in range(MAX_TXNID_RETRIES):
+async def _submit_posting(db: AsyncSession, cust_id: int, payload, delta, txn_date: date, claim, build_body) -> dict:
+    if posting_queue.running:
+        # The queue posts in its own transaction, so the claim has to be committed first
+        if claim is not None:
+            await db.commit()
         try:
-            txn = SavingAccountTxnHistory(
-                TxnID=generate_9_digit(),     # 9-digit transaction id
-                TxnDate=txn_date,             # store only date
-                AcctNum=payload.AcctNum,
-                TxnDetail=payload.TxnDetail,
-                WithdrawAmount=0,
-                DepositAmount=payload.Amount,
-                Balance=new_balance,          # running balance after this deposit
+            posted = await posting_queue.submit(
+                BatchPosting(0, cust_id, payload.AcctNum, delta, txn_date, payload.TxnDetail), claim, build_body
             )
-            db.add(txn)
-
-            sad.Balance = new_balance
-            db.add(sad)
-
-            await db.flush()  # materialize TxnID uniqueness and updates
-            break
-        except IntegrityError:
-            await db.rollback()
-            # Re-read row before retry
-            res = await db.execute(
-                select(SavingAccountDetail).where(SavingAccountDetail.AcctNum == payload.AcctNum)
-            )
-            sad = res.scalar_one_or_none()
-            if not sad:
-                raise HTTPException(status_code=409, detail="Account changed; retry deposit")
-            txn = None
-            continue
-
-    if txn is None:
-        raise HTTPException(status_code=503, detail="Unable to allocate transaction id, retry later")
+        except PostingError as pe:
+            await idempotency.release(db, claim)
+            raise HTTPException(status_code=pe.status_code, detail=pe.detail)
+        idempotency.remember(claim)
+        return build_body(posted)
 
+    # Ownership check, balance update and history insert in one statement
     try:
-        await db.commit()
-    except IntegrityError:
+        posted = await post_savings_txn(db, cust_id, payload.AcctNum, delta, txn_date, payload.TxnDetail)
+    except PostingError as pe:
         await db.rollback()
-        raise HTTPException(status_code=409, detail="Transaction conflict, please retry")
-
-    return {
-        "CustID": cust_id,
-        "AcctNum": payload.AcctNum,
-        "TxnID": txn.TxnID,
-        "Deposited": str(payload.Amount),
-        "TxnDate": txn_date.isoformat(),  # safe: this is a date object
-        "NewBalance": str(new_balance),
-    }
+        raise HTTPException(status_code=pe.status_code, detail=pe.detail)
 
+    body = build_body(posted)
+    await idempotency.complete(db, claim, status.HTTP_201_CREATED, body)
+    await _commit_posting(db)
+    idempotency.remember(claim)
+    return body
 
-def generate_9_digit() -> int:
-    return random.randint(100_000_000, 999_999_999)
 
-def parse_date_only(raw: str) -> date:
-    try:
-        return date.fromisoformat(raw)
-    except ValueError:
-        return datetime.fromisoformat(raw).date()
-
-async def acct_belongs_to_customer(db: AsyncSession, cust_id: int, acct_num: int) -> bool:
-    q = (
-        select(CustomerAccounts.AcctNum)
-        .where(and_(CustomerAccounts.CustID == cust_id, CustomerAccounts.AcctNum == acct_num))
-        .limit(1)
+@router.post("/{cust_id}/savings/deposit", status_code=status.HTTP_201_CREATED)
+async def deposit_to_savings(
+    cust_id: int,
+    payload: SavingDepositRequest,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user),
+    idempotency_key: str | None = Header(default=None),
+):
+    return await _post_and_respond(
+        db, cust_id, payload, payload.Amount, "Deposited", f"savings.deposit:{cust_id}", idempotency_key
     )
-    res = await db.execute(q)
-    return res.scalar_one_or_none() is not None
+
 
 @router.post("/{cust_id}/savings/withdraw", status_code=status.HTTP_201_CREATED)
 async def withdraw_from_savings(
     cust_id: int,
     payload: SavingWithdrawRequest,
     db: AsyncSession = Depends(get_db),
-    admin=Depends(authorize_user)
+    admin=Depends(authorize_user),
+    idempotency_key: str | None = Header(default=None),
 ):
-    # 1) Verify account ownership
-    if not await acct_belongs_to_customer(db, cust_id, payload.AcctNum):
-        raise HTTPException(status_code=404, detail="Account not found for customer")
+    # Negative delta; the posting refuses to take the balance below zero
+    return await _post_and_respond(
+        db, cust_id, payload, -payload.Amount, "Withdrawn", f"savings.withdraw:{cust_id}", idempotency_key
+    )
 
-    # 2) Parse date-only
-    txn_date = parse_date_only(payload.TxnDate)
 
-    # 3) Fetch current balance
-    res = await db.execute(
-        select(SavingAccountDetail).where(SavingAccountDetail.AcctNum == payload.AcctNum)
+@router.post("/{cust_id}/savings/transfer", status_code=status.HTTP_201_CREATED)
+async def transfer_between_savings_route(
+    cust_id: int,
+    payload: SavingTransferRequest,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user),
+    idempotency_key: str | None = Header(default=None),
+):
+    """Debit one of the customer's savings accounts and credit another savings account in one transaction."""
+    claim = await idempotency.claim_or_replay(
+        db, idempotency_key, f"savings.transfer:{cust_id}",
+        idempotency.request_fingerprint(cust_id, payload.model_dump(mode="json")),
     )
-    sad = res.scalar_one_or_none()
-    if not sad:
-        raise HTTPException(status_code=404, detail="Saving account detail not found")
+    if isinstance(claim, StoredResponse):
+        return idempotency.replay_response(claim)
+
+    txn_date = parse_date_only(payload.TxnDate)
+    reservation = await _reserve_daily_limit(db, payload.FromAcctNum, payload.Amount, txn_date)
+    try:
+        moved = await transfer_between_savings(
+            db, cust_id, payload.FromAcctNum, payload.ToAcctNum, payload.Amount, txn_date, payload.TxnDetail
+        )
+    except PostingError as pe:
+        daily_limits.release(reservation)
+        await db.rollback()
+        raise HTTPException(status_code=pe.status_code, detail=pe.detail)
+
+    body = {
+        "CustID": cust_id,
+        "FromAcctNum": payload.FromAcctNum,
+        "ToAcctNum": payload.ToAcctNum,
+        "Transferred": str(payload.Amount),
+        "TxnDate": txn_date.isoformat(),
+        "DebitTxnID": moved.debit.TxnID,
+        "CreditTxnID": moved.credit.TxnID,
+        "NewBalance": str(moved.debit.NewBalance),
+    }
+    await idempotency.complete(db, claim, status.HTTP_201_CREATED, body)
+    try:
+        await _commit_posting(db)
+    except HTTPException:
+        daily_limits.release(reservation)
+        raise
+    daily_limits.settle(reservation)
+    idempotency.remember(claim)
+    return body
+
 
-    current = sad.Balance or 0
+def _parse_batch_body(raw: bytes, content_type: str) -> list:
+    # NDJSON: one posting per line, kept as text and parsed with the item so that a broken
+    # line only rejects that item; otherwise a JSON array of postings
+    text = raw.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return [line for line in text.splitlines() if line.strip()]
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of postings")
+    return items
 
-    # 4) Validate sufficient funds
-    if payload.Amount > current:
-        raise HTTPException(status_code=409, detail="Insufficient funds")
 
-    new_balance = current - payload.Amount
+@router.post("/savings/batch", response_model=SavingBatchResponse)
+async def post_savings_batch_route(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user)
+):
+    """Post a feed of deposits/withdrawals for many accounts in one transaction.
+
+    Body is a JSON array or NDJSON (Content-Type: application/x-ndjson) of SavingPostingItem.
+    Each item gets its own result; invalid or rejected items do not fail the batch.
+    """
+    try:
+        raw_items = _parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as ve:  # json.JSONDecodeError is a ValueError
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed batch body: {ve}")
 
-    # 5) Create txn and update master balance atomically (retry on TxnID collisions)
-    txn = None
-    for _ in range(MAX_TXNID_RETRIES):
+    results: dict[int, SavingPostingResult] = {}
+    postings: list[BatchPosting] = []
+    for index, raw in enumerate(raw_items):
         try:
-            txn = SavingAccountTxnHistory(
-                TxnID=generate_9_digit(),
-                TxnDate=txn_date,              # DATE column
-                AcctNum=payload.AcctNum,
-                TxnDetail=payload.TxnDetail,
-                WithdrawAmount=payload.Amount,
-                DepositAmount=0,
-                Balance=new_balance,           # running balance after withdrawal
-            )
-            db.add(txn)
-
-            sad.Balance = new_balance
-            db.add(sad)
-
-            await db.flush()
-            break
-        except IntegrityError:
-            await db.rollback()
-            # Re-fetch in case of concurrent changes
-            res = await db.execute(
-                select(SavingAccountDetail).where(SavingAccountDetail.AcctNum == payload.AcctNum)
-            )
-            sad = res.scalar_one_or_none()
-            if not sad:
-                raise HTTPException(status_code=409, detail="Account changed; retry withdrawal")
-            # Recompute current and validate again in case of concurrent updates
-            current = sad.Balance or 0
-            if payload.Amount > current:
-                raise HTTPException(status_code=409, detail="Insufficient funds")
-            new_balance = current - payload.Amount
-            txn = None
+            if isinstance(raw, str):
+                item = SavingPostingItem.model_validate_json(raw)
+            else:
+                item = SavingPostingItem.model_validate(raw)
+            txn_date = parse_date_only(item.TxnDate)
+        except (ValidationError, ValueError, TypeError) as e:
+            results[index] = SavingPostingResult(index=index, status_code=422, detail=str(e))
             continue
+        delta = item.Amount if item.TxnType == "deposit" else -item.Amount
+        postings.append(BatchPosting(index, item.CustID, item.AcctNum, delta, txn_date, item.TxnDetail))
 
-    if txn is None:
-        raise HTTPException(status_code=503, detail="Unable to allocate transaction id, retry later")
+    # Withdrawals over the daily limit are rejected per item, before the batch runs
+    reservations: dict[int, LimitReservation | None] = {}
+    outcomes: dict[int, PostingResult | PostingError] = {}
+    for p in postings:
+        if p.delta < 0:
+            try:
+                reservations[p.index] = await daily_limits.reserve(db, p.acct_num, -p.delta, p.txn_date)
+            except PostingError as pe:
+                outcomes[p.index] = pe
 
-    # 6) Commit
     try:
-        await db.commit()
-    except IntegrityError:
-        await db.rollback()
-        raise HTTPException(status_code=409, detail="Transaction conflict, please retry")
+        outcomes.update(await post_savings_batch(db, [p for p in postings if p.index not in outcomes]))
+        await _commit_posting(db)
+    except Exception:
+        for reservation in reservations.values():
+            daily_limits.release(reservation)
+        raise
+    for index, reservation in reservations.items():
+        if isinstance(outcomes[index], PostingError):
+            daily_limits.release(reservation)
+        else:
+            daily_limits.settle(reservation)
 
-    return {
-        "CustID": cust_id,
-        "AcctNum": payload.AcctNum,
-        "TxnID": txn.TxnID,
-        "Withdrawn": str(payload.Amount),
-        "TxnDate": txn_date.isoformat(),
-        "NewBalance": str(new_balance),
-    }
\ No newline at end of file
+    for p in postings:
+        outcome = outcomes[p.index]
+        if isinstance(outcome, PostingError):
+            results[p.index] = SavingPostingResult(
+                index=p.index, status_code=outcome.status_code, AcctNum=p.acct_num, detail=outcome.detail
+            )
+        else:
+            results[p.index] = SavingPostingResult(
+                index=p.index, status_code=201, AcctNum=p.acct_num, TxnID=outcome.TxnID, NewBalance=outcome.NewBalance
+            )
+
+    ordered = [results[i] for i in sorted(results)]
+    posted = sum(1 for r in ordered if r.status_code == 201)
+    return SavingBatchResponse(posted=posted, rejected=len(ordered) - posted, results=ordered)
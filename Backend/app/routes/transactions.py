@@ -0,0 +1,117 @@
+# app/routes/transactions.py
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_db
+from app.models import SavingAccountDetail
+from app.crud.savings import list_savings_txns
+from app.crud.statements import export_statement
+from app.crud.snapshots import list_snapshots, opening_balance
+from app.schemas.customer import SavingTxnOut, SavingTxnPage, SavingSnapshotResponse, SavingOpeningBalanceOut
+from app.security.combined import authorize_user
+from app.services.cursor import encode_cursor, decode_cursor
+from datetime import date
+from decimal import Decimal
+from typing import Literal
+
+router = APIRouter(prefix="/accounts", tags=["transactions"])
+
+
+@router.get("/statements/export")
+async def export_statement_route(
+    format: Literal["csv", "ndjson"] = "csv",
+    acct_num: int | None = None,
+    branch_code: str | None = None,
+    from_date: date | None = None,
+    to_date: date | None = None,
+    admin=Depends(authorize_user)
+):
+    """Stream savings transactions for an account and/or a branch as CSV or NDJSON.
+
+    The body is sent with chunked transfer encoding as rows come off a server-side cursor,
+    so multi-year, branch-wide statements never sit in worker memory.
+    """
+    if acct_num is None and branch_code is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide acct_num and/or branch_code")
+
+    scope = str(acct_num) if acct_num is not None else f"branch-{branch_code}"
+    filename = f"statement-{scope}.{format}"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_statement(format, acct_num, branch_code, from_date, to_date),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/{acct_num}/transactions", response_model=SavingTxnPage, status_code=status.HTTP_200_OK)
+async def get_account_transactions(
+    acct_num: int,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    from_date: date | None = None,
+    to_date: date | None = None,
+    min_amount: Decimal | None = None,
+    max_amount: Decimal | None = None,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user)
+):
+    """Savings transactions of one account, newest first, one page at a time."""
+    after = None
+    if cursor:
+        try:
+            key = decode_cursor(cursor)
+            after = (date.fromisoformat(key["d"]), int(key["i"]))
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if await db.get(SavingAccountDetail, acct_num) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Saving account not found")
+
+    # fetch one extra row to know whether there is a next page
+    rows = await list_savings_txns(db, acct_num, limit + 1, after, from_date, to_date, min_amount, max_amount)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"d": rows[-1].TxnDate.isoformat(), "i": rows[-1].TxnID})
+
+    return SavingTxnPage(
+        AcctNum=acct_num,
+        transactions=[SavingTxnOut.model_validate(txn) for txn in rows],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/{acct_num}/snapshots", response_model=SavingSnapshotResponse, status_code=status.HTTP_200_OK)
+async def get_account_snapshots(
+    acct_num: int,
+    from_month: date | None = Query(None, description="any date in the first month"),
+    to_month: date | None = Query(None, description="any date in the last month"),
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user)
+):
+    """Monthly opening/closing balances and totals of a savings account, oldest first.
+
+    Served from SavingAccountMonthlySnapshot; months without transactions are filled in
+    with the previous closing balance.
+    """
+    if from_month and to_month and from_month > to_month:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="from_month must not be after to_month")
+    if await db.get(SavingAccountDetail, acct_num) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Saving account not found")
+
+    months = await list_snapshots(db, acct_num, from_month, to_month)
+    return SavingSnapshotResponse(AcctNum=acct_num, months=months)
+
+
+@router.get("/{acct_num}/opening-balance", response_model=SavingOpeningBalanceOut, status_code=status.HTTP_200_OK)
+async def get_opening_balance(
+    acct_num: int,
+    on: date,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(authorize_user)
+):
+    """Balance of a savings account at the start of a given day (statement opening balance)."""
+    if await db.get(SavingAccountDetail, acct_num) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Saving account not found")
+    return SavingOpeningBalanceOut(AcctNum=acct_num, Date=on, OpeningBalance=await opening_balance(db, acct_num, on))
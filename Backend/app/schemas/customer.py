@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, condecimal
-from typing import Annotated, Optional, List
+from typing import Annotated, Literal, Optional, List
 from datetime import date, datetime
 from decimal import Decimal
 
@@ -103,10 +103,12 @@ class SavingTxnOut(BaseModel):
 
 class LoanEMIOut(BaseModel):
     EMIID: int
+    EMINum: int | None = None
     EMIAmount: float
     DueDate: date
     PaidDate: date | None = None
     Status: str
+    RemainingBalance: float | None = None
 
     class Config:
         from_attributes = True
@@ -118,7 +120,8 @@ class AccountOut(BaseModel):
     AccountType: str
     AccSubType: Optional[str] = None
     Balance: float | None = None
-    transactions: list[SavingTxnOut] = []   # for savings
+    transactions: list[SavingTxnOut] = []   # for savings: the most recent ones, newest first
+    transactions_next: str | None = None    # link to the older transactions, when there are more
     emis: list[LoanEMIOut] = []             # for loans
 
     class Config:
@@ -168,17 +171,95 @@ class LoanAccountCreate(BaseModel):
     LoanDuration: int                 # months
     TotalLoanAmount: Decimal18_2
 
+class CustomerImportError(BaseModel):
+    index: int                        # 0-based position of the row in the upload
+    status_code: int                  # 409 duplicate email, 400 unknown ZIP, 422 invalid row
+    EmailID: str | None = None
+    detail: str
+
+
+class CustomerImportResponse(BaseModel):
+    rows: int
+    imported: int
+    rejected: int
+    seconds: float
+    rows_per_second: float
+    errors: list[CustomerImportError]
+
+
+class CustomerPurgeRequest(BaseModel):
+    CustIDs: list[int] = Field(default_factory=list, max_length=100_000)
+    EmailIDs: list[str] = Field(default_factory=list, max_length=100_000)
+
+
+class CustomerPurgeResponse(BaseModel):
+    requested: int
+    total: int                        # distinct customers to delete
+    processed: int
+    deleted: int
+    accounts: int                     # accounts deleted with them (with their details and history)
+    seconds: float
+    customers_per_second: float
+    done: bool
+    not_found: list[int | str]        # CustIDs and emails that matched no customer
+
+
+class Customer360Address(BaseModel):
+    Address1: Optional[str] = None
+    Address2: Optional[str] = None
+    ZIPCode: Optional[str] = None
+    CityName: Optional[str] = None
+    StateName: Optional[str] = None
+    CountryName: Optional[str] = None
+
+
+class Customer360Account(BaseModel):
+    AcctNum: int
+    AccountType: Optional[str] = None
+    AccSubType: Optional[str] = None
+    BranchCode: Optional[str] = None
+    # savings accounts
+    Balance: Optional[Decimal] = None
+    TransferLimit: Optional[Decimal] = None
+    # loan accounts
+    OutstandingAmount: Optional[Decimal] = None
+    TotalLoanAmount: Optional[Decimal] = None
+    RateOfInterest: Optional[Decimal] = None
+    LoanDuration: Optional[int] = None
+
+
+class Customer360Out(BaseModel):
+    CustID: int
+    FirstName: str
+    LastName: str
+    EmailID: str
+    Phone: Optional[str] = None
+    Mobile: Optional[str] = None
+    DOB: Optional[date] = None
+    MaritalStatus: Optional[str] = None
+    Address: Customer360Address
+    Accounts: list[Customer360Account]
+    SavingsBalance: Decimal
+    LoanOutstanding: Decimal
+
+
 class AdvSearchRequest(BaseModel):
     firstName: Optional[str] = None
     lastName: Optional[str] = None
     email: Optional[str] = None
     mobile: Optional[str] = None
+    # page size; defaults to 200, or every match when streaming NDJSON
+    limit: Optional[int] = Field(None, ge=1, le=1000)
+    cursor: Optional[str] = None  # X-Next-Cursor of the previous page
+    sort: Literal["relevance", "custId"] = "relevance"
+    includeCount: bool = False
 
 class AdvSearchResponseItem(BaseModel):
     custId: int
     firstName: str
     lastName: str
     phone: Optional[str]
+    mobile: Optional[str] = None
     email: Optional[str]
 
 class SavingDepositRequest(BaseModel):
@@ -230,3 +311,119 @@ class SavingAccountUpdateResponse(BaseModel):
     updated_columns: List[str]
     account_type_id: int
     saving_detail: SavingAccountDetailOut
+
+
+class SavingPostingItem(BaseModel):
+    # one line of a batch feed; TxnType decides the sign of Amount
+    CustID: int
+    AcctNum: int
+    TxnType: Literal["deposit", "withdraw"]
+    Amount: Decimal18_2 = Field(..., gt=Decimal("0"))
+    TxnDate: str
+    TxnDetail: str | None = None
+
+
+class SavingPostingResult(BaseModel):
+    index: int                        # position of the item in the submitted batch
+    status_code: int                  # 201 when posted, otherwise the error status
+    AcctNum: int | None = None
+    TxnID: int | None = None
+    NewBalance: Decimal | None = None
+    detail: str | None = None
+
+
+class SavingBatchResponse(BaseModel):
+    posted: int
+    rejected: int
+    results: list[SavingPostingResult]
+
+
+class SavingTransferRequest(BaseModel):
+    FromAcctNum: int                  # must belong to the customer in the path
+    ToAcctNum: int                    # any savings account
+    Amount: Decimal18_2 = Field(..., gt=Decimal("0"))
+    TxnDate: str
+    TxnDetail: str | None = None
+
+
+class SavingTxnPage(BaseModel):
+    AcctNum: int
+    transactions: list[SavingTxnOut] = []
+    next_cursor: str | None = None    # pass back as ?cursor= for the next (older) page
+
+
+class SavingMonthlySnapshotOut(BaseModel):
+    Month: date                       # first day of the month
+    OpeningBalance: Decimal
+    ClosingBalance: Decimal
+    DepositTotal: Decimal
+    WithdrawTotal: Decimal
+    TxnCount: int
+
+
+class SavingSnapshotResponse(BaseModel):
+    AcctNum: int
+    months: list[SavingMonthlySnapshotOut] = []
+
+
+class SavingOpeningBalanceOut(BaseModel):
+    AcctNum: int
+    Date: date
+    OpeningBalance: Decimal
+
+
+class LoanEMIPayRequest(BaseModel):
+    EMINum: int | None = None         # omit to pay the earliest pending installment
+    PaidDate: str
+    FromAcctNum: int | None = None    # savings account of the same customer to debit
+
+
+class LoanEMIPayItem(BaseModel):
+    # one line of a bulk EMI payment feed
+    CustID: int
+    AcctNum: int                      # loan account
+    EMINum: int | None = None
+    PaidDate: str
+    FromAcctNum: int | None = None
+
+
+class LoanEMIPayResult(BaseModel):
+    index: int                        # position of the item in the submitted batch
+    status_code: int                  # 201 when paid, otherwise the error status
+    AcctNum: int | None = None
+    EMINum: int | None = None
+    EMIAmount: Decimal | None = None
+    BalanceAmount: Decimal | None = None
+    SavingsTxnID: int | None = None
+    detail: str | None = None
+
+
+class LoanEMIPayBatchResponse(BaseModel):
+    paid: int
+    rejected: int
+    results: list[LoanEMIPayResult]
+
+
+class LoanPortfolioGroupOut(BaseModel):
+    BranchCode: str                   # '' for loans without a branch
+    LoanAccountTypeId: int            # 0 for loans without a type
+    LoanCount: int
+    OutstandingPrincipal: Decimal
+    WeightedAvgRate: Decimal | None = None   # by outstanding principal; None when nothing is outstanding
+    OverdueEMICount: int
+    OverdueAmount: Decimal
+
+
+class LoanPortfolioTotalsOut(BaseModel):
+    LoanCount: int
+    OutstandingPrincipal: Decimal
+    WeightedAvgRate: Decimal | None = None
+    OverdueEMICount: int
+    OverdueAmount: Decimal
+
+
+class LoanPortfolioResponse(BaseModel):
+    AsOf: date | None = None          # overdue figures are as of this date (last full rebuild)
+    RefreshedAt: datetime | None = None
+    groups: list[LoanPortfolioGroupOut] = []
+    totals: LoanPortfolioTotalsOut
@@ -0,0 +1,221 @@
+# app/services/customer_cache.py
+"""Read cache for GET /customers/{cust_id} profiles.
+
+Two tiers: a size-bounded LRU/TTL cache in each process, and optionally a shared tier
+that all workers see (anything implementing SharedTier, e.g. a Redis adapter;
+InProcessSharedTier is a local stand-in). A profile is stored together with its
+customer's generation number, read before the profile was loaded from the database, and
+is only served while that generation is still current.
+
+Writers never touch cached profiles directly. They call mark_customer_changed(db, ...)
+inside their transaction, and the generations of those customers are bumped from the
+session's after_commit hook, i.e. only once the change is visible to new readers. A
+reader that loaded the old rows before the commit stored them under the old generation,
+so nothing committed earlier than a request is ever served stale to it. Rolled back
+transactions bump nothing.
+
+The same marks keep the customer-360 documents (app.crud.customer360) current: they are
+refreshed from the session's before_commit hook, inside the writing transaction. Writes
+that only move balances use mark_balances_changed instead, which patches the documents.
+
+Without a shared tier generations are per process: with several uvicorn workers, or for
+postings made by out-of-process jobs (app.jobs.interest_accrual), other processes only
+see the change when their entry expires (CUSTOMER_CACHE_TTL_SECONDS). Configure a
+shared tier (customer_cache.shared) for the no-stale guarantee across processes.
+"""
+import itertools
+import os
+from typing import Any, Protocol
+
+from cachetools import LRUCache, TTLCache, TLRUCache
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.crud.customer360 import refresh_statements
+
+load_dotenv()
+
+CUSTOMER_CACHE_SIZE = int(os.environ.get("CUSTOMER_CACHE_SIZE", "10000"))  # 0 disables the cache
+CUSTOMER_CACHE_TTL_SECONDS = float(os.environ.get("CUSTOMER_CACHE_TTL_SECONDS", "300"))
+# "memory" enables the in-process stand-in for the shared tier
+CUSTOMER_CACHE_SHARED = os.environ.get("CUSTOMER_CACHE_SHARED", "")
+
+_CHANGED = "customer_cache_changed"
+_RECOMPUTE = "customer360_recompute"
+_BALANCES = "customer360_balances"
+
+
+class SharedTier(Protocol):
+    def get(self, key: str) -> Any | None: ...
+
+    def set(self, key: str, value: Any, ttl: float): ...
+
+    def incr(self, key: str) -> int:
+        """Atomically increment a counter that never expires (missing counts as 0)."""
+        ...
+
+
+class InProcessSharedTier:
+    """Stand-in for a shared store such as Redis, with the same semantics in one process."""
+
+    def __init__(self, maxsize: int):
+        self._values: TLRUCache = TLRUCache(maxsize=maxsize, ttu=lambda _key, value, now: now + value[1])
+        self._counters: dict[str, int] = {}
+
+    def get(self, key: str) -> Any | None:
+        if key in self._counters:
+            return self._counters[key]
+        entry = self._values.get(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._values[key] = (value, ttl)
+
+    def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class _CountingTTLCache(TTLCache):
+    # TTLCache evicts least-recently-used entries when full; count those for the metrics
+    evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class _Generations(LRUCache):
+    """Per-customer generations for the process-local mode, bounded.
+
+    Generations come from one increasing counter. A customer that is not tracked has the
+    floor generation; evicting a tracked customer moves the floor past every generation
+    handed out so far, so profiles stored under an evicted (or earlier floor) generation
+    can never become current again.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self._counter = itertools.count(1)
+        self.floor = 0
+
+    def current(self, cust_id: int) -> int:
+        return self.get(cust_id, self.floor)
+
+    def bump(self, cust_id: int):
+        self[cust_id] = next(self._counter)
+
+    def popitem(self):
+        item = super().popitem()
+        self.floor = next(self._counter)
+        return item
+
+
+class CustomerProfileCache:
+    def __init__(self, maxsize: int, ttl: float, shared: SharedTier | None = None):
+        self.enabled = maxsize > 0
+        self.ttl = ttl
+        self.shared = shared
+        self._local = _CountingTTLCache(maxsize=max(maxsize, 1), ttl=ttl)
+        self._generations = _Generations(maxsize=max(maxsize, 1) * 10)
+        self.metrics = {"hits": 0, "shared_hits": 0, "misses": 0, "stale": 0, "invalidations": 0}
+
+    def _generation(self, cust_id: int) -> int:
+        if self.shared is not None:
+            return self.shared.get(f"customer:{cust_id}:gen") or 0
+        return self._generations.current(cust_id)
+
+    def lookup(self, cust_id: int, variant: Any = None) -> tuple[dict | None, int]:
+        """Return (profile or None, generation). On a miss, load the profile and pass the
+        returned generation to store(), so it is dropped if the customer changed meanwhile."""
+        if not self.enabled:
+            return None, 0
+        generation = self._generation(cust_id)
+        entry = self._local.get((cust_id, variant))
+        if entry is not None and entry[0] == generation:
+            self.metrics["hits"] += 1
+            return entry[1], generation
+        if self.shared is not None:
+            shared_entry = self.shared.get(f"customer:{cust_id}:{variant}")
+            if shared_entry is not None and shared_entry[0] == generation:
+                self._local[(cust_id, variant)] = shared_entry
+                self.metrics["shared_hits"] += 1
+                return shared_entry[1], generation
+            entry = entry or shared_entry
+        self.metrics["stale" if entry is not None else "misses"] += 1
+        return None, generation
+
+    def store(self, cust_id: int, generation: int, profile: dict, variant: Any = None):
+        if not self.enabled:
+            return
+        self._local[(cust_id, variant)] = (generation, profile)
+        if self.shared is not None:
+            self.shared.set(f"customer:{cust_id}:{variant}", (generation, profile), self.ttl)
+
+    def invalidate(self, cust_ids):
+        for cust_id in cust_ids:
+            self.metrics["invalidations"] += 1
+            if self.shared is not None:
+                self.shared.incr(f"customer:{cust_id}:gen")
+            else:
+                self._generations.bump(cust_id)
+
+    def stats(self) -> dict:
+        lookups = self.metrics["hits"] + self.metrics["shared_hits"] + self.metrics["misses"] + self.metrics["stale"]
+        hits = self.metrics["hits"] + self.metrics["shared_hits"]
+        return {
+            **self.metrics,
+            "enabled": self.enabled,
+            "shared_tier": type(self.shared).__name__ if self.shared is not None else None,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._local),
+            "maxsize": self._local.maxsize,
+            "evictions": self._local.evictions,
+        }
+
+
+# To share profiles and generations between workers, set customer_cache.shared to a
+# SharedTier implementation at startup
+customer_cache = CustomerProfileCache(
+    CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL_SECONDS,
+    InProcessSharedTier(max(CUSTOMER_CACHE_SIZE, 1)) if CUSTOMER_CACHE_SHARED == "memory" else None,
+)
+
+
+def mark_customer_changed(db: AsyncSession, *cust_ids: int):
+    """Refresh these customers' customer-360 documents when db's transaction commits, and
+    invalidate their cached profiles once it has."""
+    cust_ids = {c for c in cust_ids if c is not None}
+    db.info.setdefault(_CHANGED, set()).update(cust_ids)
+    db.info.setdefault(_RECOMPUTE, set()).update(cust_ids)
+
+
+def mark_balances_changed(db: AsyncSession, accounts: dict[int, int]):
+    """Like mark_customer_changed for writes that only change balances (AcctNum -> owning
+    CustID): the customer-360 documents get those accounts patched instead of recomputed.
+    The caller must hold the accounts' row locks until it commits."""
+    db.info.setdefault(_CHANGED, set()).update(accounts.values())
+    db.info.setdefault(_BALANCES, {}).update(accounts)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_customer_360(session: Session):
+    for statement, params in refresh_statements(session.info.get(_RECOMPUTE, ()), session.info.get(_BALANCES)):
+        session.execute(statement, params)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    session.info.pop(_RECOMPUTE, None)
+    session.info.pop(_BALANCES, None)
+    changed = session.info.pop(_CHANGED, None)
+    if changed:
+        customer_cache.invalidate(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    for key in (_CHANGED, _RECOMPUTE, _BALANCES):
+        session.info.pop(key, None)
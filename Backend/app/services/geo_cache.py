@@ -0,0 +1,197 @@
+# app/services/geo_cache.py
+"""In-process index of the location hierarchy (PostalCode -> City -> State -> Country).
+
+Locations are reference data: read on every customer create, update and profile, written
+only when a customer brings a new ZIP. The whole hierarchy is loaded into one immutable
+snapshot (ZIP -> city -> state -> country) at startup and replaced:
+
+  - after a commit that created location rows (mark_geo_changed, applied from the
+    session's after_commit hook like mark_customer_changed), and
+  - GEO_CACHE_TTL_SECONDS after the last load, which is how rows written by other
+    processes (other workers, app.jobs.customer_import) show up.
+
+A reload runs in the first request that finds the snapshot stale; concurrent requests keep
+using the previous snapshot meanwhile. The index only ever answers "found": a ZIP it does
+not know is looked up in the database as before, so a stale snapshot costs a round trip,
+never a wrong 400. When there are more than GEO_CACHE_MAX_ZIPS ZIP codes the index stays
+empty and every lookup goes to the database.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+from sqlalchemy import select, func, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db import engine
+from app.models import PostalCode, City, State, Country
+
+load_dotenv()
+
+logger = logging.getLogger("geo_cache")
+
+GEO_CACHE_MAX_ZIPS = int(os.environ.get("GEO_CACHE_MAX_ZIPS", "200000"))  # 0 disables the index
+GEO_CACHE_TTL_SECONDS = float(os.environ.get("GEO_CACHE_TTL_SECONDS", "600"))
+
+_CHANGED = "geo_cache_changed"
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    zips: dict = field(default_factory=dict)           # ZIPCode -> CityCode
+    sorted_zips: list = field(default_factory=list)    # for prefix search
+    cities: dict = field(default_factory=dict)         # CityCode -> (CityName, StateCode)
+    states: dict = field(default_factory=dict)         # StateCode -> (StateName, CountryCode)
+    countries: dict = field(default_factory=dict)      # CountryCode -> CountryName
+    loaded_at: float = 0.0
+    complete: bool = False                             # holds every ZIP code
+
+
+class GeoIndex:
+    def __init__(self, max_zips: int, ttl: float):
+        self.max_zips = max_zips
+        self.ttl = ttl
+        self._snapshot = _Snapshot()
+        self._stale = True
+        self._loading: asyncio.Lock | None = None
+        self.metrics = {"hits": 0, "misses": 0, "loads": 0, "last_load_seconds": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_zips > 0
+
+    async def load(self):
+        """Replace the snapshot with the current hierarchy (or an empty one past max_zips)."""
+        started = time.perf_counter()
+        self._stale = False  # changes committed while loading mark it stale again
+        try:
+            self._snapshot = await self._read()
+        except Exception:
+            self._stale = True
+            raise
+        self.metrics["loads"] += 1
+        self.metrics["last_load_seconds"] = round(time.perf_counter() - started, 4)
+        logger.info("GEO.CACHE loaded zips=%s cities=%s seconds=%s",
+                    len(self._snapshot.zips), len(self._snapshot.cities), self.metrics["last_load_seconds"])
+
+    async def _read(self) -> _Snapshot:
+        async with engine.connect() as conn:
+            zip_count = (await conn.execute(select(func.count()).select_from(PostalCode))).scalar_one()
+            if zip_count > self.max_zips:
+                if self.enabled:
+                    logger.warning("GEO.CACHE disabled: %s ZIP codes > GEO_CACHE_MAX_ZIPS=%s", zip_count, self.max_zips)
+                return _Snapshot(loaded_at=time.monotonic())
+            zips = dict((await conn.execute(select(PostalCode.ZIPCode, PostalCode.CityCode))).all())
+            cities = {code: (name, parent) for code, name, parent in await conn.execute(select(City.CityCode, City.CityName, City.StateCode))}
+            states = {code: (name, parent) for code, name, parent in await conn.execute(select(State.StateCode, State.StateName, State.CountryCode))}
+            countries = dict((await conn.execute(select(Country.CountryCode, Country.CountryName))).all())
+        return _Snapshot(
+            zips=zips,
+            sorted_zips=sorted(zips),
+            cities=cities,
+            states=states,
+            countries=countries,
+            loaded_at=time.monotonic(),
+            complete=True,
+        )
+
+    async def current(self) -> _Snapshot:
+        """The snapshot to answer from, reloading it first if it is stale (unless another
+        request already is, in which case the previous one is returned)."""
+        if not self.enabled:
+            return self._snapshot
+        if self._stale or time.monotonic() - self._snapshot.loaded_at > self.ttl:
+            if self._loading is None:
+                self._loading = asyncio.Lock()
+            if not self._loading.locked():
+                async with self._loading:
+                    try:
+                        await self.load()
+                    except Exception:
+                        # keep answering from the previous snapshot; retried on the next call
+                        logger.exception("GEO.CACHE reload failed")
+        return self._snapshot
+
+    def invalidate(self):
+        self._stale = True
+
+    def _count(self, found) -> bool:
+        if self.enabled:
+            self.metrics["hits" if found else "misses"] += 1
+        return found
+
+    async def has_zip(self, zip_code: str) -> bool:
+        return self._count(zip_code in (await self.current()).zips)
+
+    @staticmethod
+    def _postal(snapshot: _Snapshot, zip_code: str) -> dict:
+        # the PostalCodeOut shape: ZIP -> city -> state -> country
+        city_code = snapshot.zips[zip_code]
+        city = state = country = None
+        if city_code in snapshot.cities:
+            city_name, state_code = snapshot.cities[city_code]
+            if state_code in snapshot.states:
+                state_name, country_code = snapshot.states[state_code]
+                if country_code in snapshot.countries:
+                    country = {"CountryCode": country_code, "CountryName": snapshot.countries[country_code]}
+                state = {"StateCode": state_code, "StateName": state_name, "country": country}
+            city = {"CityCode": city_code, "CityName": city_name, "state": state}
+        return {"ZIPCode": zip_code, "city": city}
+
+    async def postal(self, zip_code: str) -> dict | None:
+        """The ZIP's hierarchy as PostalCodeOut data, or None when it is not indexed."""
+        snapshot = await self.current()
+        if not self._count(zip_code in snapshot.zips):
+            return None
+        return self._postal(snapshot, zip_code)
+
+    async def autocomplete(self, prefix: str, limit: int) -> list[dict] | None:
+        """Up to `limit` ZIPs starting with prefix, in ZIPCode order, as PostalCodeOut
+        data; None when the index does not hold every ZIP (disabled or too many)."""
+        snapshot = await self.current()
+        if not snapshot.complete:
+            return None
+        out = []
+        start = bisect.bisect_left(snapshot.sorted_zips, prefix)
+        for zip_code in snapshot.sorted_zips[start:start + limit]:
+            if not zip_code.startswith(prefix):
+                break
+            out.append(self._postal(snapshot, zip_code))
+        return out
+
+    def stats(self) -> dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        snapshot = self._snapshot
+        return {
+            **self.metrics,
+            "enabled": self.enabled,
+            "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0,
+            "zips": len(snapshot.zips),
+            "cities": len(snapshot.cities),
+            "states": len(snapshot.states),
+            "countries": len(snapshot.countries),
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot.loaded_at else None,
+        }
+
+
+geo_index = GeoIndex(GEO_CACHE_MAX_ZIPS, GEO_CACHE_TTL_SECONDS)
+
+
+def mark_geo_changed(db: AsyncSession):
+    """Reload the geo index once db's transaction commits (it created location rows)."""
+    db.info[_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_committed(session: Session):
+    if session.info.pop(_CHANGED, None):
+        geo_index.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    session.info.pop(_CHANGED, None)
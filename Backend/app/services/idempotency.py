@@ -0,0 +1,182 @@
+# app/services/idempotency.py
+"""Idempotency-Key support for money-moving routes.
+
+The first request with a key claims it by inserting a row into IdempotencyKey inside the
+route's own transaction; the route stores its response on that row before committing, so
+the posting and the stored response commit (or roll back) together. A concurrent request
+with the same key blocks on the primary key until the first one finishes, then replays it.
+Completed responses are also kept in a bounded in-process TTL/LRU cache, so replays
+usually do not touch the database at all. Error responses are never stored: the claim
+is rolled back with the failed transaction and the client may retry.
+
+When the posting runs in another transaction (the posting queue), the route commits the
+claim first; a duplicate then gets 409 while the original is in flight, and the claim
+is released again if the posting is rejected.
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, update, delete, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import IdempotencyKey
+
+load_dotenv()
+
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+
+@dataclass
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: dict
+
+
+@dataclass
+class IdempotencyClaim:
+    scope: str
+    key: str
+    request_hash: str
+    response: StoredResponse | None = field(default=None)
+
+
+class _CountingTTLCache(TTLCache):
+    # TTLCache evicts least-recently-used entries when full; count those for the metrics
+    evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+_cache = _CountingTTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL_SECONDS)
+_metrics = {"requests": 0, "cache_hits": 0, "db_hits": 0, "claims": 0, "conflicts": 0}
+
+
+def request_fingerprint(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def replay_response(stored: StoredResponse) -> JSONResponse:
+    return JSONResponse(status_code=stored.status_code, content=stored.body, headers={"Idempotent-Replayed": "true"})
+
+
+def _check_same_request(stored: StoredResponse, request_hash: str):
+    if stored.request_hash != request_hash:
+        _metrics["conflicts"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+
+
+async def claim_or_replay(
+    db: AsyncSession, key: str | None, scope: str, request_hash: str
+) -> IdempotencyClaim | StoredResponse | None:
+    """Return None when no key was sent, the stored response for a replay, or a claim for a new key.
+
+    The claim row is only flushed, not committed: it belongs to the caller's transaction.
+    """
+    if not key:
+        return None
+    _metrics["requests"] += 1
+
+    stored = _cache.get((scope, key))
+    if stored is not None:
+        _check_same_request(stored, request_hash)
+        _metrics["cache_hits"] += 1
+        return stored
+
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    claimed = await db.execute(
+        pg_insert(IdempotencyKey)
+        .values(Scope=scope, Key=key, RequestHash=request_hash, ExpiresAt=expires_at)
+        .on_conflict_do_nothing(index_elements=["Scope", "Key"])
+        .returning(IdempotencyKey.Key)
+    )
+    if claimed.first() is None:
+        row = (await db.execute(
+            select(IdempotencyKey).where(and_(IdempotencyKey.Scope == scope, IdempotencyKey.Key == key))
+        )).scalar_one_or_none()
+        if row is not None and row.ExpiresAt > now:
+            if row.StatusCode is None:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A request with this Idempotency-Key is in progress")
+            stored = StoredResponse(row.RequestHash, row.StatusCode, row.ResponseBody)
+            _check_same_request(stored, request_hash)
+            _cache[(scope, key)] = stored
+            _metrics["db_hits"] += 1
+            return stored
+        # Expired (or purged in between): take the key over for this request
+        await db.execute(
+            pg_insert(IdempotencyKey)
+            .values(Scope=scope, Key=key, RequestHash=request_hash, ExpiresAt=expires_at)
+            .on_conflict_do_update(
+                index_elements=["Scope", "Key"],
+                set_={"RequestHash": request_hash, "StatusCode": None, "ResponseBody": None, "CreatedAt": now, "ExpiresAt": expires_at},
+            )
+        )
+
+    _metrics["claims"] += 1
+    return IdempotencyClaim(scope=scope, key=key, request_hash=request_hash)
+
+
+async def complete(db: AsyncSession, claim: IdempotencyClaim | None, status_code: int, body: dict):
+    """Store the response on the claimed row, in the caller's transaction (call before commit)."""
+    if claim is None:
+        return
+    await db.execute(
+        update(IdempotencyKey)
+        .where(and_(IdempotencyKey.Scope == claim.scope, IdempotencyKey.Key == claim.key))
+        .values(StatusCode=status_code, ResponseBody=body)
+    )
+    claim.response = StoredResponse(claim.request_hash, status_code, body)
+
+
+async def release(db: AsyncSession, claim: IdempotencyClaim | None):
+    """Delete a claim that was committed before its request failed, so the key can be retried."""
+    if claim is None:
+        return
+    await db.execute(
+        delete(IdempotencyKey).where(and_(
+            IdempotencyKey.Scope == claim.scope, IdempotencyKey.Key == claim.key, IdempotencyKey.StatusCode.is_(None)
+        ))
+    )
+    await db.commit()
+
+
+def remember(claim: IdempotencyClaim | None):
+    """Cache a completed claim; call only after the transaction committed."""
+    if claim is not None and claim.response is not None:
+        _cache[(claim.scope, claim.key)] = claim.response
+
+
+async def purge_expired(db: AsyncSession) -> int:
+    res = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.ExpiresAt <= datetime.now(timezone.utc)))
+    await db.commit()
+    return res.rowcount
+
+
+def metrics() -> dict:
+    requests = _metrics["requests"]
+    hits = _metrics["cache_hits"] + _metrics["db_hits"]
+    return {
+        **_metrics,
+        "replays": hits,
+        "hit_rate": round(hits / requests, 4) if requests else 0.0,
+        "cache_hit_rate": round(_metrics["cache_hits"] / requests, 4) if requests else 0.0,
+        "cache_size": len(_cache),
+        "cache_maxsize": _cache.maxsize,
+        "cache_evictions": _cache.evictions,
+    }
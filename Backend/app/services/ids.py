@@ -0,0 +1,141 @@
+# app/services/ids.py
+"""Identifier allocation backed by database sequences.
+
+Each allocator reserves a block of sequence numbers with one `nextval` (the sequence is
+declared with INCREMENT BY <block size>) and hands them out from memory, so a process
+goes to the database once per block instead of guessing random ids and retrying on
+IntegrityError. Sequence numbers are pushed through a keyed permutation of the id range,
+so ids keep their fixed width and do not look sequential, while remaining unique.
+
+Used for TxnID, AcctNum and EMIID; none of them needs a collision retry.
+"""
+import asyncio
+import os
+from collections import deque
+
+from dotenv import load_dotenv
+from sqlalchemy import select, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import (
+    SavingAccountTxnHistory, CustomerAccounts, LoanAccountDetail,
+    TXN_ID_SEQUENCE, ACCT_NUM_SEQUENCE, EMI_ID_SEQUENCE,
+)
+
+load_dotenv()
+
+# Append a Luhn check digit to new account numbers (8-digit body + 1 check digit)
+ACCTNUM_CHECK_DIGIT = os.environ.get("ACCTNUM_CHECK_DIGIT", "false").lower() in ("1", "true", "yes")
+
+
+def _feistel30(n: int, keys: tuple[int, ...]) -> int:
+    # Balanced Feistel network on 30 bits: a bijection whatever the round function is
+    left, right = n >> 15, n & 0x7FFF
+    for k in keys:
+        left, right = right, left ^ ((((right + k) * 0x5BD1E995) >> 11) & 0x7FFF)
+    return (left << 15) | right
+
+
+def luhn_check_digit(body: int) -> int:
+    total = 0
+    # rightmost body digit is doubled, since the check digit is appended after it
+    for i, ch in enumerate(reversed(str(body))):
+        d = int(ch)
+        if i % 2 == 0:
+            d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return (10 - total % 10) % 10
+
+
+def has_valid_check_digit(value: int) -> bool:
+    return value > 9 and luhn_check_digit(value // 10) == value % 10
+
+
+class BlockIdAllocator:
+    """Allocates unique ids in [low, high] from blocks of a DB sequence.
+
+    With `check_digit=True`, [low, high] is the range of the id body and every id is
+    `body * 10 + luhn_check_digit(body)`, i.e. one digit wider.
+
+    `taken` is the id column of the target table: when a block is reserved, ids from it
+    that already exist there (e.g. rows written before the allocator existed) are dropped,
+    with one query per block.
+
+    NOTE: `keys` define the permutation. Changing them (or the sequence increment) on a
+    live database can re-issue ids that were already handed out.
+    """
+
+    def __init__(
+        self, sequence: Sequence, low: int, high: int, keys: tuple[int, ...], taken=None, check_digit: bool = False
+    ):
+        span = high - low + 1
+        if span > 1 << 30:
+            raise ValueError("Id range too wide for the 30-bit permutation")
+        self.sequence = sequence
+        self.block_size = sequence.increment
+        self.low = low
+        self.span = span
+        self.keys = keys
+        self.taken = taken
+        self.check_digit = check_digit
+        self._ids: deque[int] = deque()
+        self._lock = asyncio.Lock()
+
+    def permute(self, n: int) -> int:
+        # Cycle-walk the 30-bit permutation until it lands inside the range
+        x = _feistel30(n, self.keys)
+        while x >= self.span:
+            x = _feistel30(x, self.keys)
+        body = self.low + x
+        return body * 10 + luhn_check_digit(body) if self.check_digit else body
+
+    async def _reserve_block(self, db: AsyncSession):
+        start = (await db.execute(select(self.sequence.next_value()))).scalar_one()
+        if start + self.block_size > self.span:
+            raise RuntimeError(f"Sequence {self.sequence.name} exhausted the id range")
+        block = [self.permute(n) for n in range(start, start + self.block_size)]
+        if self.taken is not None:
+            res = await db.execute(select(self.taken).where(self.taken.in_(block)))
+            existing = set(res.scalars().all())
+            block = [i for i in block if i not in existing]
+        self._ids.extend(block)
+
+    async def take(self, db: AsyncSession, count: int) -> list[int]:
+        async with self._lock:
+            while len(self._ids) < count:
+                await self._reserve_block(db)
+            return [self._ids.popleft() for _ in range(count)]
+
+    async def next_id(self, db: AsyncSession) -> int:
+        if self._ids:
+            # fast path, no await between the check and the pop
+            return self._ids.popleft()
+        return (await self.take(db, 1))[0]
+
+
+# 9-digit transaction ids, same shape as the random ones they replace
+txn_ids = BlockIdAllocator(
+    TXN_ID_SEQUENCE,
+    low=100_000_000,
+    high=999_999_999,
+    keys=(0x2F6B, 0x51C3, 0x7A09, 0x13D7),
+    taken=SavingAccountTxnHistory.TxnID,
+)
+
+# 9-digit account numbers; with ACCTNUM_CHECK_DIGIT the last digit is a Luhn check digit
+acct_nums = BlockIdAllocator(
+    ACCT_NUM_SEQUENCE,
+    low=10_000_000 if ACCTNUM_CHECK_DIGIT else 100_000_000,
+    high=99_999_999 if ACCTNUM_CHECK_DIGIT else 999_999_999,
+    keys=(0x6A1D, 0x0F35, 0x4C8B, 0x3E51),
+    taken=CustomerAccounts.AcctNum,
+    check_digit=ACCTNUM_CHECK_DIGIT,
+)
+
+# 9-digit EMI schedule ids (fits the Integer EMIID column)
+emi_ids = BlockIdAllocator(
+    EMI_ID_SEQUENCE,
+    low=100_000_000,
+    high=999_999_999,
+    keys=(0x1B73, 0x6D0F, 0x2A95, 0x5E27),
+    taken=LoanAccountDetail.EMIID,
+)
@@ -0,0 +1,164 @@
+# app/services/limits.py
+"""Daily transfer-limit enforcement for savings withdrawals and outgoing transfers.
+
+SavingAccountDetail.TransferLimit is the most an account may send out (withdrawals plus
+transfer debits) per TxnDate; NULL/0 means no limit. Instead of summing the day's
+WithdrawAmount rows on every request, each process keeps a running counter per account
+for today: the first withdrawal of the day loads TransferLimit and the day's total in one
+query, later ones are checked and added in memory with no query at all. Counters are
+dropped when the date changes, and an account's counter is dropped when its
+TransferLimit is edited.
+
+A withdrawal reserves its amount before posting, then settles it once the posting has
+committed or releases it if the posting is rejected or rolled back, so concurrent
+requests in one process cannot both slip under the limit. Counters are per process and
+do not see debits made by other uvicorn workers or out-of-process writers, so the day's
+committed total is read again before a reservation when the counter is older than
+DAILY_LIMIT_COUNTER_TTL_SECONDS, or when the reservation would take the account past
+DAILY_LIMIT_RECHECK_SHARE of its limit. A burst of withdrawals far from the limit still
+costs no query, and every rejection is decided on a fresh total. What other processes
+commit goes unseen for at most one TTL, and only while the account stays below the
+recheck share; near the limit, only their in-flight reservations do.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+
+from cachetools import LRUCache
+from dotenv import load_dotenv
+from sqlalchemy import select, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import SavingAccountDetail, SavingAccountTxnHistory
+from app.crud.savings import PostingError
+
+load_dotenv()
+
+DAILY_LIMIT_CACHE_SIZE = int(os.environ.get("DAILY_LIMIT_CACHE_SIZE", "100000"))
+# past this share of the limit, a reservation re-reads the day's committed total first
+DAILY_LIMIT_RECHECK_SHARE = Decimal(os.environ.get("DAILY_LIMIT_RECHECK_SHARE", "0.8"))
+# a counter older than this re-reads the day's committed total on its next reservation
+DAILY_LIMIT_COUNTER_TTL_SECONDS = float(os.environ.get("DAILY_LIMIT_COUNTER_TTL_SECONDS", "5"))
+
+
+@dataclass
+class _DailyCounter:
+    limit: Decimal | None
+    committed: Decimal                 # the day's debits as last read, plus this process's since
+    pending: Decimal = Decimal("0")    # reserved by this process, not committed yet
+    read_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def used(self) -> Decimal:
+        return self.committed + self.pending
+
+
+@dataclass
+class LimitReservation:
+    acct_num: int
+    day: date
+    amount: Decimal
+
+
+class DailyLimits:
+    def __init__(self, maxsize: int):
+        self._day = date.today()
+        self._counters: LRUCache = LRUCache(maxsize=maxsize)
+        self.metrics = {"checks": 0, "warmups": 0, "rechecks": 0, "rejections": 0}
+
+    def _roll_day(self) -> date:
+        today = date.today()
+        if today != self._day:
+            self._counters.clear()
+            self._day = today
+        return today
+
+    async def _load(self, db: AsyncSession, acct_num: int, day: date) -> _DailyCounter | None:
+        H = SavingAccountTxnHistory
+        sent_today = (
+            select(func.coalesce(func.sum(H.WithdrawAmount), 0))
+            .where(and_(H.AcctNum == acct_num, H.TxnDate == day))
+            .scalar_subquery()
+        )
+        row = (await db.execute(
+            select(SavingAccountDetail.TransferLimit, sent_today).where(SavingAccountDetail.AcctNum == acct_num)
+        )).first()
+        if row is None:
+            return None
+        return _DailyCounter(limit=row[0] or None, committed=row[1])
+
+    async def reserve(self, db: AsyncSession, acct_num: int, amount: Decimal, txn_date: date) -> LimitReservation | None:
+        """Count `amount` against the account's limit for `txn_date`, or raise PostingError(409).
+
+        Returns None when nothing was reserved (no limit, unknown account, or a date other
+        than today, which is checked against the database and not cached).
+        """
+        self.metrics["checks"] += 1
+        today = self._roll_day()
+        if txn_date != today:
+            counter = await self._load(db, acct_num, txn_date)
+            if counter is not None and counter.limit is not None and counter.used + amount > counter.limit:
+                self.metrics["rejections"] += 1
+                raise PostingError(409, "Daily transfer limit exceeded")
+            return None
+
+        counter = self._counters.get(acct_num)
+        if counter is None:
+            self.metrics["warmups"] += 1
+            loaded = await self._load(db, acct_num, today)
+            if loaded is None:
+                return None
+            # another request may have warmed (and reserved on) it while we were loading
+            counter = self._counters.setdefault(acct_num, loaded)
+        elif (time.monotonic() - counter.read_at > DAILY_LIMIT_COUNTER_TTL_SECONDS
+              or counter.limit is not None and counter.used + amount > counter.limit * DAILY_LIMIT_RECHECK_SHARE):
+            # stale or near the limit: count what other processes have committed since
+            self.metrics["rechecks"] += 1
+            fresh = await self._load(db, acct_num, today)
+            if fresh is None:
+                return None
+            counter.limit, counter.committed, counter.read_at = fresh.limit, fresh.committed, fresh.read_at
+        if counter.limit is None:
+            return None
+        if counter.used + amount > counter.limit:
+            self.metrics["rejections"] += 1
+            raise PostingError(409, "Daily transfer limit exceeded")
+        counter.pending += amount
+        return LimitReservation(acct_num, today, amount)
+
+    def settle(self, reservation: LimitReservation | None):
+        """The reservation's posting has committed: it is now part of the day's total."""
+        if reservation is None or reservation.day != self._day:
+            return
+        counter = self._counters.get(reservation.acct_num)
+        if counter is not None:
+            counter.pending -= reservation.amount
+            counter.committed += reservation.amount
+
+    def release(self, reservation: LimitReservation | None):
+        """Give back a reservation whose posting did not commit."""
+        if reservation is None or reservation.day != self._day:
+            return
+        counter = self._counters.get(reservation.acct_num)
+        if counter is not None:
+            counter.pending -= reservation.amount
+
+    def record(self, acct_num: int, amount: Decimal, txn_date: date):
+        """Count a committed debit that is not subject to the limit (an EMI debit), so a
+        warm counter keeps matching the day's WithdrawAmount total it was loaded from."""
+        if txn_date != self._day:
+            return
+        counter = self._counters.get(acct_num)
+        if counter is not None:
+            counter.committed += amount
+
+    def invalidate(self, acct_num: int):
+        # TransferLimit changed: reload on next use
+        self._counters.pop(acct_num, None)
+
+    def stats(self) -> dict:
+        return {**self.metrics, "accounts_cached": len(self._counters)}
+
+
+daily_limits = DailyLimits(DAILY_LIMIT_CACHE_SIZE)
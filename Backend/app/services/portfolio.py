@@ -0,0 +1,36 @@
+# app/services/portfolio.py
+"""Short-lived in-process cache in front of app.crud.portfolio.read_portfolio.
+
+Dashboards poll the same few portfolio views; each distinct (branch, loan type) filter is
+served from memory for PORTFOLIO_CACHE_TTL_SECONDS, so a refresh storm costs one query
+per view per TTL per process. Figures may lag writes by up to the TTL.
+"""
+import os
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.portfolio import read_portfolio
+
+load_dotenv()
+
+PORTFOLIO_CACHE_TTL_SECONDS = float(os.environ.get("PORTFOLIO_CACHE_TTL_SECONDS", "15"))
+
+_cache: TTLCache = TTLCache(maxsize=1024, ttl=PORTFOLIO_CACHE_TTL_SECONDS)
+_metrics = {"hits": 0, "misses": 0}
+
+
+async def get_portfolio(db: AsyncSession, branch_code: str | None = None, loan_type_id: int | None = None) -> dict:
+    key = (branch_code, loan_type_id)
+    cached = _cache.get(key)
+    if cached is not None:
+        _metrics["hits"] += 1
+        return cached
+    _metrics["misses"] += 1
+    portfolio = await read_portfolio(db, branch_code, loan_type_id)
+    _cache[key] = portfolio
+    return portfolio
+
+
+def metrics() -> dict:
+    return {**_metrics, "size": len(_cache), "ttl_seconds": PORTFOLIO_CACHE_TTL_SECONDS}
@@ -0,0 +1,129 @@
+# app/services/posting_queue.py
+"""Optional in-process posting queue for hot savings accounts.
+
+With SAVINGS_POSTING_QUEUE=true, deposit/withdraw requests are not posted by the request
+itself. They are sharded by AcctNum onto asyncio queues, one worker per shard, so postings
+to one account are applied by a single worker in arrival order. Each worker collects a
+micro-batch (up to POSTING_QUEUE_MAX_BATCH items or POSTING_QUEUE_MAX_LATENCY_MS after the
+first one arrived) and applies it with post_savings_batch: one lock per account, one
+multi-row history insert and one balance update per account, one commit. Every caller
+still gets its own TxnID/NewBalance (or PostingError).
+
+Shards live in one process: with several uvicorn workers an account can still be posted
+from more than one process; correctness then relies on the row locks taken by the batch.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Callable
+
+from dotenv import load_dotenv
+from app.db import AsyncSessionLocal
+from app.crud.savings import post_savings_batch, BatchPosting, PostingResult, PostingError
+from app.services import idempotency
+from app.services.idempotency import IdempotencyClaim
+
+load_dotenv()
+
+SAVINGS_POSTING_QUEUE = os.environ.get("SAVINGS_POSTING_QUEUE", "false").lower() in ("1", "true", "yes")
+POSTING_QUEUE_SHARDS = int(os.environ.get("POSTING_QUEUE_SHARDS", "8"))
+POSTING_QUEUE_MAX_BATCH = int(os.environ.get("POSTING_QUEUE_MAX_BATCH", "200"))
+POSTING_QUEUE_MAX_LATENCY_MS = float(os.environ.get("POSTING_QUEUE_MAX_LATENCY_MS", "5"))
+
+logger = logging.getLogger("posting_queue")
+
+
+@dataclass
+class _QueuedPosting:
+    posting: BatchPosting
+    future: asyncio.Future
+    # Idempotency claim committed by the request; completed in the batch transaction
+    claim: IdempotencyClaim | None = None
+    build_body: Callable[[PostingResult], dict] | None = field(default=None)
+
+
+class PostingQueue:
+    def __init__(self, shards: int, max_batch: int, max_latency_ms: float):
+        self.shards = shards
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self._queues: list[asyncio.Queue] = []
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        if self.running:
+            return
+        self._queues = [asyncio.Queue() for _ in range(self.shards)]
+        self._workers = [asyncio.create_task(self._worker(q)) for q in self._queues]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self,
+        posting: BatchPosting,
+        claim: IdempotencyClaim | None = None,
+        build_body: Callable[[PostingResult], dict] | None = None,
+    ) -> PostingResult:
+        """Queue a posting and wait for its batch to commit. Raises PostingError if rejected."""
+        future = asyncio.get_running_loop().create_future()
+        self._queues[posting.acct_num % self.shards].put_nowait(_QueuedPosting(posting, future, claim, build_body))
+        return await future
+
+    async def _next_batch(self, queue: asyncio.Queue) -> list[_QueuedPosting]:
+        loop = asyncio.get_running_loop()
+        batch = [await queue.get()]
+        deadline = loop.time() + self.max_latency
+        while len(batch) < self.max_batch:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            batch = await self._next_batch(queue)
+            # indexes only need to be unique inside this flush
+            for index, item in enumerate(batch):
+                item.posting.index = index
+            try:
+                async with AsyncSessionLocal() as db:
+                    outcomes = await post_savings_batch(db, [item.posting for item in batch])
+                    for item in batch:
+                        outcome = outcomes[item.posting.index]
+                        if item.claim is not None and isinstance(outcome, PostingResult):
+                            await idempotency.complete(db, item.claim, 201, item.build_body(outcome))
+                    await db.commit()
+            except Exception:
+                logger.exception("POSTING_QUEUE.FLUSH failed size=%s", len(batch))
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(PostingError(503, "Posting failed, please retry"))
+                continue
+
+            for item in batch:
+                if item.future.done():  # caller went away
+                    continue
+                outcome = outcomes[item.posting.index]
+                if isinstance(outcome, PostingError):
+                    item.future.set_exception(outcome)
+                else:
+                    item.future.set_result(outcome)
+
+
+posting_queue = PostingQueue(POSTING_QUEUE_SHARDS, POSTING_QUEUE_MAX_BATCH, POSTING_QUEUE_MAX_LATENCY_MS)
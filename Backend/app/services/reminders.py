@@ -0,0 +1,49 @@
+# app/services/reminders.py
+"""Destinations for the EMI reminders produced by app.jobs.emi_reminders.
+
+A sink gets each chunk of reminders after the rows were marked EMIReminder = true and
+before that chunk commits: if the sink raises, the marks roll back and the next run
+picks the rows up again, so delivery is at-least-once. E-mail/SMS delivery plugs in
+here; the two sinks below are local stand-ins (an NDJSON file for a downstream sender,
+an asyncio queue for an in-process consumer).
+"""
+import asyncio
+import json
+import sys
+from typing import Protocol
+
+
+class ReminderSink(Protocol):
+    async def send(self, reminders: list[dict]) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class NdjsonFileSink:
+    """Appends one JSON object per reminder to `path` ("-" writes to stdout)."""
+
+    def __init__(self, path: str):
+        self._file = sys.stdout if path == "-" else open(path, "a", encoding="utf-8")
+
+    async def send(self, reminders: list[dict]) -> None:
+        self._file.write("".join(json.dumps(r, default=str) + "\n" for r in reminders))
+        # flushed per chunk: once the chunk commits its reminders must be on disk
+        self._file.flush()
+
+    async def close(self) -> None:
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class QueueSink:
+    """Puts every reminder on an asyncio.Queue; a bounded queue makes the scan wait for the consumer."""
+
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+
+    async def send(self, reminders: list[dict]) -> None:
+        for reminder in reminders:
+            await self.queue.put(reminder)
+
+    async def close(self) -> None:
+        pass
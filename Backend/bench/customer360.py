@@ -0,0 +1,106 @@
+# bench/customer360.py
+"""Teller view of a customer: the join path (get_customer_full_by_id plus
+get_postal_hierarchy, what GET /customers/{cust_id} runs) against the customer-360
+document (read_document: one primary-key lookup, JSON passed through).
+
+Seeds --customers customers with a savings account of --txns transactions and a loan of
+--emis installments each, rebuilds their documents (app.jobs.customer360_rebuild, timed),
+then reads --reads random customers both ways and times the commit-time work a write to
+one customer now pays: a full refresh, and the balance patch postings and EMI payments
+get instead. Writes into DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.customer360 --customers 20000 --reads 5000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import select, text
+
+from app.db import engine, Base, AsyncSessionLocal, create_missing_indexes
+from app.crud.customer import get_customer_full_by_id, get_postal_hierarchy
+from app.crud.customer360 import read_document, refresh_documents, refresh_statements
+from app.crud.locations import upsert_postal_code
+from app.models import CustomerAccounts, SavingAccountDetail
+from app.jobs import customer360_rebuild
+from bench.customer_purge import seed
+
+
+def summary(samples: list[float]) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    return f"p50 {statistics.median(ms):6.2f} ms  p95 {ms[int(len(ms) * 0.95)]:6.2f} ms"
+
+
+async def join_path(db, cust_id: int):
+    cust = await get_customer_full_by_id(db, cust_id)
+    await get_postal_hierarchy(db, cust.ZIPCode)
+    return cust
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--reads", type=int, default=5_000)
+    parser.add_argument("--txns", type=int, default=50)
+    parser.add_argument("--emis", type=int, default=60)
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes)
+    cust_ids = await seed(args.customers, args.txns, args.emis)
+    zip_code = f"Z{uuid.uuid4().hex[:8]}"
+    async with AsyncSessionLocal() as db:
+        await upsert_postal_code(db, zip_code, "Bench City", "Bench State", "Bench Country")
+        await db.execute(text("""UPDATE "CustomerDetail" SET "ZIPCode" = :zip WHERE "CustID" = ANY(:ids)"""),
+                         {"zip": zip_code, "ids": cust_ids})
+        await db.commit()
+
+    stats = await customer360_rebuild.rebuild()
+    print(f"rebuild          {stats['customers']:,} documents in {stats['seconds']:.1f}s "
+          f"({stats['customers'] / stats['seconds']:,.0f} customers/s)")
+
+    rng = random.Random(25)
+    sample = [rng.choice(cust_ids) for _ in range(args.reads)]
+    joins, lookups, refreshes, patches = [], [], [], []
+    async with AsyncSessionLocal() as db:
+        for cust_id in sample:
+            t = time.perf_counter()
+            await join_path(db, cust_id)
+            await db.rollback()
+            joins.append(time.perf_counter() - t)
+            db.expunge_all()
+            t = time.perf_counter()
+            await read_document(db, cust_id)
+            await db.rollback()
+            lookups.append(time.perf_counter() - t)
+        for cust_id in sample[:1000]:
+            t = time.perf_counter()
+            await refresh_documents(db, [cust_id])
+            await db.commit()
+            refreshes.append(time.perf_counter() - t)
+        owners = dict((await db.execute(
+            select(SavingAccountDetail.AcctNum, CustomerAccounts.CustID)
+            .join(CustomerAccounts, CustomerAccounts.AcctNum == SavingAccountDetail.AcctNum)
+            .where(CustomerAccounts.CustID.in_(sample[:1000]))
+        )).all())
+        await db.rollback()
+        for acct_num, cust_id in owners.items():
+            t = time.perf_counter()
+            for statement, params in refresh_statements((), {acct_num: cust_id}):
+                await db.execute(statement, params)
+            await db.commit()
+            patches.append(time.perf_counter() - t)
+    print(f"join path        {summary(joins)}")
+    print(f"customer-360     {summary(lookups)}")
+    print(f"refresh + commit {summary(refreshes)}  (added to each write, per transaction)")
+    print(f"patch + commit   {summary(patches)}  (added to each posting or EMI payment)")
+    print(await customer360_rebuild.check())
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
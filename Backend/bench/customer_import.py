@@ -0,0 +1,87 @@
+# bench/customer_import.py
+"""Bulk onboarding throughput: import_customers (POST /customers/import and
+app.jobs.customer_import) against the per-customer POST /customers/ path (email lookup,
+then create_customer: location lookups, flushes and a commit per customer).
+
+Generates --rows customers spread over --zips ZIP codes (new ones, with City/State/Country
+names in varying case, so the location levels are resolved and created as they would be
+from a real file) with --duplicates of them repeating an earlier email, imports them in
+--chunk row chunks, and runs the per-customer path on --sample more. Reports rows/s.
+Writes into DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.customer_import --rows 200000 --sample 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.crud.customer import create_customer, get_customer_by_email
+from app.crud.customer_import import import_customers, IMPORT_CHUNK_ROWS
+from app.schemas.customer import CustomerCreate
+
+COUNTRIES = {"India": ["Karnataka", "Kerala", "Delhi", "Punjab"], "Nepal": ["Bagmati", "Gandaki"]}
+
+
+def rows(count: int, zips: int, duplicates: float, tag: str, rng: random.Random) -> list[dict]:
+    places = []
+    for z in range(zips):
+        country = rng.choice(list(COUNTRIES))
+        state = rng.choice(COUNTRIES[country])
+        places.append((f"{tag[:4]}{z:05d}", f"City{z % (zips // 4 + 1)}", state, country))
+    out = []
+    for i in range(count):
+        zip_code, city, state, country = rng.choice(places)
+        case = rng.choice([str, str.lower, str.upper])
+        email = f"imp{rng.randrange(i) if i and rng.random() < duplicates else i}-{tag}@bench.example"
+        out.append({
+            "FirstName": f"First{i}", "LastName": f"Last{i % 997}", "EmailID": email,
+            "Mobile": f"9{i:09d}", "DOB": "1990-01-01", "MaritalStatus": "Single",
+            "ZIPCode": zip_code, "CityName": case(city), "StateName": case(state), "CountryName": case(country),
+        })
+    return out
+
+
+async def per_customer(payloads: list[dict]) -> int:
+    created = 0
+    async with AsyncSessionLocal() as db:
+        for payload in payloads:
+            if await get_customer_by_email(db, payload["EmailID"]):
+                continue
+            await create_customer(db, payload=CustomerCreate.model_validate(payload).model_dump(exclude_none=True))
+            created += 1
+    return created
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--zips", type=int, default=2_000)
+    parser.add_argument("--duplicates", type=float, default=0.01)
+    parser.add_argument("--chunk", type=int, default=IMPORT_CHUNK_ROWS)
+    parser.add_argument("--sample", type=int, default=2_000)
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    rng = random.Random(21)
+    tag = uuid.uuid4().hex[:8]
+    bulk = rows(args.rows, args.zips, args.duplicates, tag, rng)
+
+    async with AsyncSessionLocal() as db:
+        stats = await import_customers(db, bulk, args.chunk)
+    print(f"import_customers   {stats.rows:,} rows, {stats.imported:,} imported, {len(stats.errors):,} rejected "
+          f"in {stats.seconds:.1f}s ({stats.rows_per_second:,.0f} rows/s)")
+
+    sample = rows(args.sample, args.zips, args.duplicates, uuid.uuid4().hex[:8], rng)
+    started = time.perf_counter()
+    created = await per_customer(sample)
+    elapsed = time.perf_counter() - started
+    print(f"per-customer       {len(sample):,} rows, {created:,} created in {elapsed:.1f}s ({len(sample) / elapsed:,.0f} rows/s)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
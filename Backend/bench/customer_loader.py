@@ -0,0 +1,114 @@
+# bench/customer_loader.py
+"""GET /customers/{cust_id} loader: the previous single joinedload query (customer x
+accounts x transactions x EMIs, de-duplicated in Python) against get_customer_full_by_id
+plus recent_savings_txns (batched SELECT ... IN per relationship, --limit most recent
+transactions). For each --sizes history length it seeds a customer with one savings
+account of that many transactions and a --months loan, then reports median latency and
+peak traced memory of both. Seeds its own customers in DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.customer_loader --sizes 10 1000 100000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import joinedload
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import (
+    CustomerDetail, CustomerAccounts, SavingAccountDetail, LoanAccountDetail, PostalCode, City, State,
+)
+from app.crud.customer import get_customer_full_by_id
+from app.crud.loans import create_emi_schedules
+from app.crud.savings import recent_savings_txns
+
+
+async def seed(txns: int, months: int) -> int:
+    async with AsyncSessionLocal() as db:
+        cust = CustomerDetail(FirstName="Bench", LastName="Loader", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+        db.add(cust)
+        await db.flush()
+        acct_base = (await db.execute(text('SELECT coalesce(max("AcctNum"), 0) FROM "CustomerAccounts"'))).scalar_one()
+        emi_base = (await db.execute(text('SELECT coalesce(max("EMIID"), 0) FROM "LoanAccountDetail"'))).scalar_one()
+        txn_base = max(1_000_000_000, (await db.execute(text('SELECT coalesce(max("TxnID"), 0) FROM "SavingAccountTxnHistory"'))).scalar_one())
+        savings_acct, loan_acct = acct_base + 1, acct_base + 2
+        db.add_all([CustomerAccounts(AcctNum=savings_acct, CustID=cust.CustID), CustomerAccounts(AcctNum=loan_acct, CustID=cust.CustID)])
+        await db.flush()
+        db.add(SavingAccountDetail(AcctNum=savings_acct, Balance=Decimal("0.00"), BranchCode="BENCH"))
+        db.add(LoanAccountDetail(
+            AcctNum=loan_acct, EMIID=emi_base + 1, BalanceAmount=Decimal("500000.00"), BranchCode="BENCH",
+            RateOfInterest=Decimal("9.25"), LoanDuration=months, TotalLoanAmount=Decimal("500000.00"),
+        ))
+        await db.flush()
+        await db.execute(text(
+            'INSERT INTO "SavingAccountTxnHistory" ("TxnID", "TxnDate", "AcctNum", "TxnDetail", "WithdrawAmount", "DepositAmount", "Balance") '
+            "SELECT :txn_base + g, DATE '2000-01-01' + g / 20, :acct, 'bench posting', 0, 10.00, g * 10.00 "
+            "FROM generate_series(1, :rows) g"
+        ), {"txn_base": txn_base, "acct": savings_acct, "rows": txns})
+        await create_emi_schedules(db, [emi_base + 1], date(2001, 1, 31))
+        await db.commit()
+        return cust.CustID
+
+
+async def legacy(cust_id: int):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(CustomerDetail)
+            .options(
+                joinedload(CustomerDetail.zipcode).joinedload(PostalCode.city).joinedload(City.state).joinedload(State.country),
+                joinedload(CustomerDetail.accounts).joinedload(CustomerAccounts.account_type),
+                joinedload(CustomerDetail.accounts).joinedload(CustomerAccounts.saving_detail).joinedload(SavingAccountDetail.transactions),
+                joinedload(CustomerDetail.accounts).joinedload(CustomerAccounts.loan_detail).joinedload(LoanAccountDetail.emis),
+            )
+            .where(CustomerDetail.CustID == cust_id)
+        )
+        cust = result.unique().scalar_one()
+        return sum(len(a.saving_detail.transactions) for a in cust.accounts if a.saving_detail)
+
+
+async def batched(cust_id: int, limit: int):
+    async with AsyncSessionLocal() as db:
+        cust = await get_customer_full_by_id(db, cust_id)
+        recent = await recent_savings_txns(db, [a.AcctNum for a in cust.accounts if a.saving_detail], limit + 1)
+        return sum(min(len(rows), limit) for rows in recent.values())
+
+
+async def measure(fn, runs: int) -> tuple[float, float, int]:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        embedded = await fn()
+        samples.append(time.perf_counter() - started)
+    tracemalloc.start()
+    await fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(samples) * 1000, peak / 2**20, embedded
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100_000])
+    parser.add_argument("--months", type=int, default=240)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    for size in args.sizes:
+        cust_id = await seed(size, args.months)
+        for name, fn in (("joined", lambda: legacy(cust_id)), ("batched", lambda: batched(cust_id, args.limit))):
+            ms, mib, embedded = await measure(fn, args.runs)
+            print(f"{size:>8,} txns  {name:<8} {ms:9.1f} ms  peak {mib:8.1f} MiB  ({embedded:,} transactions embedded)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+# bench/customer_purge.py
+"""Deleting customers with large histories: the ORM way (load the customer with every
+account, savings detail, transaction and EMI, then delete row by row, which is what a
+relationship cascade without passive_deletes does) against delete_customer (one DELETE,
+the rest by ON DELETE CASCADE) and purge_customers (--chunk customers per DELETE).
+
+Seeds customers with one savings account of --txns transactions and one loan of --emis
+installments each, deletes --customers of them one at a time through each per-customer
+path and --purge more through purge_customers, and reports customers/s and the rows
+removed. Then --contended more are each deleted while a posting to their savings account
+is in flight (posted, not yet committed): the delete must wait for the posting and then
+succeed, not fail with a deadlock. Writes into DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.customer_purge --customers 100 --purge 5000 --txns 500
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import selectinload
+
+from app.db import engine, Base, AsyncSessionLocal, create_missing_indexes
+from app.models import CustomerDetail, CustomerAccounts, SavingAccountDetail, LoanAccountDetail
+from app.crud.customer import delete_customer
+from app.crud.savings import post_savings_txn
+from app.crud.customer_purge import purge_customers, PURGE_CHUNK_CUSTOMERS
+
+TABLES = ["CustomerAccounts", "SavingAccountDetail", "SavingAccountTxnHistory", "LoanAccountDetail", "LoanEMIDetail"]
+
+
+async def seed(count: int, txns: int, emis: int) -> list[int]:
+    tag = uuid.uuid4().hex[:8]
+    async with engine.begin() as conn:
+        cust_ids = list((await conn.execute(text("""
+            INSERT INTO "CustomerDetail" ("FirstName", "LastName", "EmailID")
+            SELECT 'Purge', 'Bench', 'purge' || g || '-' || :tag || '@bench.example' FROM generate_series(1, CAST(:n AS integer)) g
+            RETURNING "CustID"
+        """), {"tag": tag, "n": count})).scalars())
+        base = (await conn.execute(text("""SELECT coalesce(max("AcctNum"), 0) + 1 FROM "CustomerAccounts" """))).scalar_one()
+        # account base + 2i is the savings account of the i-th customer, base + 2i + 1 its loan
+        await conn.execute(text("""
+            INSERT INTO "CustomerAccounts" ("AcctNum", "CustID")
+            SELECT CAST(:base AS bigint) + 2 * (i - 1) + k, c FROM unnest(CAST(:ids AS integer[])) WITH ORDINALITY AS t(c, i), generate_series(0, 1) k
+        """), {"base": base, "ids": cust_ids})
+        await conn.execute(text("""
+            INSERT INTO "SavingAccountDetail" ("AcctNum", "Balance", "BranchCode")
+            SELECT CAST(:base AS bigint) + 2 * g, 1000, 'B1' FROM generate_series(0, CAST(:n AS integer) - 1) g
+        """), {"base": base, "n": count})
+        first_txn = (await conn.execute(text("""SELECT coalesce(max("TxnID"), 0) + 1 FROM "SavingAccountTxnHistory" """))).scalar_one()
+        await conn.execute(text("""
+            INSERT INTO "SavingAccountTxnHistory" ("TxnID", "TxnDate", "AcctNum", "TxnDetail", "DepositAmount", "WithdrawAmount", "Balance")
+            SELECT CAST(:first AS integer) + g * CAST(:txns AS integer) + t, DATE '2024-01-01' + t % 700, CAST(:base AS bigint) + 2 * g,
+                   'bench', 10, 0, 1000 + 10 * t
+            FROM generate_series(0, CAST(:n AS integer) - 1) g, generate_series(0, CAST(:txns AS integer) - 1) t
+        """), {"first": first_txn, "txns": txns, "base": base, "n": count})
+        first_emi = (await conn.execute(text("""SELECT coalesce(max("EMIID"), 0) + 1 FROM "LoanAccountDetail" """))).scalar_one()
+        await conn.execute(text("""
+            INSERT INTO "LoanAccountDetail" ("AcctNum", "EMIID", "BalanceAmount", "BranchCode", "RateOfInterest", "LoanDuration", "TotalLoanAmount")
+            SELECT CAST(:base AS bigint) + 2 * g + 1, CAST(:first AS integer) + g, 12000, 'B1', 10, CAST(:emis AS integer), 12000
+            FROM generate_series(0, CAST(:n AS integer) - 1) g
+        """), {"base": base, "first": first_emi, "emis": emis, "n": count})
+        await conn.execute(text("""
+            INSERT INTO "LoanEMIDetail" ("EMIID", "AcctNum", "EMIDate", "EMIAmount", "EMIStatus", "RemainingBalance")
+            SELECT CAST(:first AS integer) + g, CAST(:base AS bigint) + 2 * g + 1, DATE '2025-01-01' + 30 * m, 1000, 'Pending', 12000 - 1000 * m
+            FROM generate_series(0, CAST(:n AS integer) - 1) g, generate_series(1, CAST(:emis AS integer)) m
+        """), {"first": first_emi, "base": base, "emis": emis, "n": count})
+    return cust_ids
+
+
+async def orm_delete(cust_id: int):
+    async with AsyncSessionLocal() as db:
+        accounts = selectinload(CustomerDetail.accounts)
+        customer = (await db.execute(
+            select(CustomerDetail).where(CustomerDetail.CustID == cust_id).options(
+                accounts.selectinload(CustomerAccounts.saving_detail).selectinload(SavingAccountDetail.transactions),
+                accounts.selectinload(CustomerAccounts.loan_detail).selectinload(LoanAccountDetail.emis),
+            )
+        )).scalar_one()
+        for account in customer.accounts:
+            if account.saving_detail is not None:
+                for txn in account.saving_detail.transactions:
+                    await db.delete(txn)
+                await db.delete(account.saving_detail)
+            if account.loan_detail is not None:
+                for emi in account.loan_detail.emis:
+                    await db.delete(emi)
+                await db.delete(account.loan_detail)
+            await db.delete(account)
+        await db.delete(customer)
+        await db.commit()
+
+
+async def delete_during_posting(cust_id: int) -> str:
+    # the posting holds its account row and, from its commit, the customer row; the delete
+    # starts in between and must queue behind it
+    async with AsyncSessionLocal() as posting, AsyncSessionLocal() as deleting:
+        acct_num = (await posting.execute(
+            select(SavingAccountDetail.AcctNum)
+            .join(CustomerAccounts, CustomerAccounts.AcctNum == SavingAccountDetail.AcctNum)
+            .where(CustomerAccounts.CustID == cust_id)
+        )).scalar_one()
+        await post_savings_txn(posting, cust_id, acct_num, Decimal("1.00"), date.today(), "bench")
+        delete = asyncio.create_task(delete_customer(deleting, cust_id=cust_id))
+        await asyncio.sleep(0.5)
+        await posting.commit()
+        try:
+            return "deleted" if await delete else "not found"
+        except DBAPIError as e:
+            return type(e.orig.__cause__ or e.orig).__name__  # e.g. DeadlockDetectedError
+
+
+async def row_counts() -> dict:
+    async with engine.connect() as conn:
+        return {t: (await conn.execute(text(f'SELECT count(*) FROM "{t}"'))).scalar_one() for t in TABLES}
+
+
+async def timed(label: str, fn):
+    before = await row_counts()
+    started = time.perf_counter()
+    customers = await fn()
+    elapsed = time.perf_counter() - started
+    removed = sum(before.values()) - sum((await row_counts()).values())
+    print(f"{label:<16} {customers:,} customers, {removed:,} dependent rows in {elapsed:.2f}s "
+          f"({customers / elapsed:,.1f} customers/s)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--purge", type=int, default=5_000)
+    parser.add_argument("--txns", type=int, default=500)
+    parser.add_argument("--emis", type=int, default=60)
+    parser.add_argument("--chunk", type=int, default=PURGE_CHUNK_CUSTOMERS)
+    parser.add_argument("--contended", type=int, default=20)
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes)
+    orm_ids = await seed(args.customers, args.txns, args.emis)
+    cascade_ids = await seed(args.customers, args.txns, args.emis)
+    purge_ids = await seed(args.purge, args.txns, args.emis)
+    contended_ids = await seed(args.contended, args.txns, args.emis)
+
+    async def one_by_one(fn, ids):
+        for cust_id in ids:
+            await fn(cust_id)
+        return len(ids)
+
+    async def by_cascade(cust_id):
+        async with AsyncSessionLocal() as db:
+            assert await delete_customer(db, cust_id=cust_id)
+
+    async def purge():
+        async with AsyncSessionLocal() as db:
+            return (await purge_customers(db, purge_ids, chunk=args.chunk)).deleted
+
+    await timed("ORM row by row", lambda: one_by_one(orm_delete, orm_ids))
+    await timed("delete_customer", lambda: one_by_one(by_cascade, cascade_ids))
+    await timed(f"purge ({args.chunk})", purge)
+    outcomes = await asyncio.gather(*(delete_during_posting(cust_id) for cust_id in contended_ids))
+    print(f"{'during posting':<16} " + ", ".join(f"{outcomes.count(o)} {o}" for o in sorted(set(outcomes))))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
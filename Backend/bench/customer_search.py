@@ -0,0 +1,172 @@
+# bench/customer_search.py
+"""Customer search latency (app.crud.search, behind POST /customers/advSearch): seeds
+--customers synthetic customers, (re)builds the search indexes, then runs --queries
+random searches of each kind and reports p50/p95/max latency, next to the previous
+unindexed lower(name) LIKE '%x%' filter for name searches (--legacy runs of it). Then,
+for a common name term, walks --pages keyset pages in both sorts, times includeCount for
+common and rare terms, and streams every match as NDJSON (rows/s, peak traced memory).
+
+Seeds into DATABASE_URL (use a scratch database; it truncates nothing but adds rows):
+
+    cd Backend && python -m bench.customer_search --customers 1000000
+    cd Backend && python -m bench.customer_search --customers 9000000 --legacy 5
+
+--customers 0 reuses the customers seeded by earlier runs (adding any missing search
+column or index).
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import select, and_, func, text
+
+from app.db import engine, Base, AsyncSessionLocal, create_missing_indexes, add_missing_columns
+from app.models import CustomerDetail
+from app.crud.search import search_filters, search_customers, count_customers, stream_customers
+
+FIRST = ["Aarav", "Vivaan", "Aditya", "Vihaan", "Arjun", "Sai", "Reyansh", "Ayaan", "Krishna", "Ishaan",
+         "Priya", "Ananya", "Diya", "Saanvi", "Aadhya", "John", "Mary", "Robert", "Patricia", "Michael"]
+LAST = ["Sharma", "Verma", "Gupta", "Singh", "Kumar", "Patel", "Reddy", "Nair", "Iyer", "Das",
+        "Smith", "Johnson", "Williams", "Brown", "Jones"]
+SEARCH_INDEXES = [i for i in CustomerDetail.__table__.indexes if i.name.startswith("ix_customer_")]
+
+
+async def seed(customers: int) -> tuple[int, int]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        if customers:
+            base = (await conn.execute(text('SELECT coalesce(max("CustID"), 0) FROM "CustomerDetail"'))).scalar_one()
+            # bulk load without the search indexes, then build them once
+            for index in SEARCH_INDEXES:
+                await conn.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+            # names: a common first/last name plus a random-ish suffix, so terms range from
+            # very common ("arj") to nearly unique; numbers in a mix of formats
+            await conn.execute(text(
+                'INSERT INTO "CustomerDetail" ("CustID", "FirstName", "LastName", "EmailID", "Mobile", "Phone") '
+                "SELECT :base + g, (CAST(:first AS text[]))[1 + g % 20] || substr(md5(g::text), 1, 4), "
+                "(CAST(:last AS text[]))[1 + (g / 7) % 15] || substr(md5((g * 3)::text), 1, 3), "
+                "'Cust' || (:base + g) || '@Bench.example', "
+                "CASE g % 3 WHEN 0 THEN '+91 ' || (9000000000 + g) WHEN 1 THEN (9000000000 + g)::text "
+                "ELSE '0' || substr((9000000000 + g)::text, 1, 5) || '-' || substr((9000000000 + g)::text, 6) END, "
+                "NULL FROM generate_series(1, :n) g"
+            ), {"base": base, "n": customers, "first": FIRST, "last": LAST})
+            await conn.execute(text("SELECT setval(pg_get_serial_sequence('\"CustomerDetail\"', 'CustID'), :v)"), {"v": base + customers})
+        else:
+            base, customers = (await conn.execute(text(
+                'SELECT coalesce(min("CustID"), 1) - 1, count(*) FROM "CustomerDetail" '
+                "WHERE \"EmailID\" LIKE 'Cust%@Bench.example'"
+            ))).one()
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(create_missing_indexes)
+    print(f"search indexes built in {time.perf_counter() - started:.1f}s")
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text('ANALYZE "CustomerDetail"'))
+    return base, customers
+
+
+def queries(kind: str, base: int, customers: int, rng: random.Random) -> dict:
+    g = rng.randint(1, customers)
+    first = FIRST[g % 20]
+    if kind == "first_substring":
+        return {"first_name": first[1:4]}
+    if kind == "first_rare":
+        name = first + hashlib.md5(str(g).encode()).hexdigest()[:4]
+        return {"first_name": name[-5:]}
+    if kind == "first_prefix_short":
+        return {"first_name": first[:2]}
+    if kind == "first_and_last":
+        return {"first_name": first[:4], "last_name": LAST[(g // 7) % 15][2:5]}
+    if kind == "email":
+        return {"email": f"cust{base + g}@bench.EXAMPLE"}
+    if kind == "mobile":
+        return {"mobile": f"+91-{9000000000 + g}"}
+    raise ValueError(kind)
+
+
+async def legacy(db, first_name: str):
+    C = CustomerDetail
+    await db.execute(
+        select(C.CustID, C.FirstName, C.LastName, C.Phone, C.EmailID)
+        .where(and_(func.lower(C.FirstName).like(f"%{first_name.lower()}%")))
+        .limit(200)
+    )
+
+
+def summary(samples: list[float]) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"p50 {statistics.median(ms):8.1f} ms  p95 {p95:8.1f} ms  max {ms[-1]:8.1f} ms"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--legacy", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    base, customers = await seed(args.customers)
+    print(f"{customers:,} bench customers ready in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    async with AsyncSessionLocal() as db:
+        for kind in ("first_substring", "first_rare", "first_prefix_short", "first_and_last", "email", "mobile"):
+            samples, found = [], 0
+            for _ in range(args.queries):
+                search = search_filters(**queries(kind, base, customers, rng))
+                t = time.perf_counter()
+                page, _ = await search_customers(db, search)
+                found += bool(page)
+                samples.append(time.perf_counter() - t)
+            print(f"{kind:<19} {summary(samples)}  ({found}/{args.queries} found)")
+        samples = []
+        for _ in range(args.legacy):
+            t = time.perf_counter()
+            await legacy(db, queries("first_rare", base, customers, rng)["first_name"])
+            samples.append(time.perf_counter() - t)
+        print(f"{'legacy LIKE (rare)':<19} {summary(samples)}")
+
+        common = search_filters(first_name=FIRST[0][1:4])
+        for sort in ("relevance", "custId"):
+            samples, after = [], None
+            for _ in range(args.pages):
+                t = time.perf_counter()
+                page, after = await search_customers(db, common, sort=sort, after=after)
+                samples.append(time.perf_counter() - t)
+                if after is None:
+                    break
+            print(f"{'pages ' + sort:<19} {summary(samples)}  (page {len(samples)}: {samples[-1] * 1000:.1f} ms)")
+        for kind in ("first_substring", "first_rare"):
+            samples = []
+            for _ in range(10):
+                search = search_filters(**queries(kind, base, customers, rng))
+                t = time.perf_counter()
+                total, exact = await count_customers(db, search)
+                samples.append(time.perf_counter() - t)
+            print(f"{'count ' + kind:<19} {summary(samples)}  (last: {total:,}{'' if exact else ' estimated'})")
+
+    async def stream() -> int:
+        return sum([chunk.count(b"\n") async for chunk in stream_customers(common)])
+
+    t = time.perf_counter()
+    rows = await stream()
+    elapsed = time.perf_counter() - t
+    tracemalloc.start()
+    await stream()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{'ndjson stream':<19} {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s), peak {peak / 2**20:.1f} MiB")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
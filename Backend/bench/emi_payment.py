@@ -0,0 +1,125 @@
+# bench/emi_payment.py
+"""Concurrency check for EMI payments (app.crud.loans.pay_emis).
+
+Sets up one customer with a funded savings account and a --months loan, then:
+
+  retry   --clients concurrent sessions all pay the SAME installment (EMINum given) from
+          the savings account, as parallel retries of one payment would. Exactly one must
+          succeed; the rest get 409 "EMI already paid" and the account is debited once.
+  next    --clients concurrent sessions each pay "the next pending installment". Each must
+          pay a different installment, in due order, with the loan balance stepping down
+          through every payment and the savings debited once per payment.
+
+Runs against DATABASE_URL (use a scratch database, it creates its own customer):
+
+    cd Backend && python -m bench.emi_payment --clients 50 --months 240
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, func, and_
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import (
+    CustomerDetail, CustomerAccounts, SavingAccountDetail, SavingAccountTxnHistory, LoanAccountDetail, LoanEMIDetail,
+)
+from app.crud.loans import create_emi_schedules, pay_emis, EMIPayment, EMIPaid
+from app.crud.savings import PostingError
+
+
+async def setup(months: int) -> tuple[int, int, int, int]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        cust = CustomerDetail(FirstName="Bench", LastName="EMI", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+        db.add(cust)
+        await db.flush()
+        savings_acct, loan_acct, emi_id = 910_000_000 + cust.CustID, 920_000_000 + cust.CustID, 930_000_000 + cust.CustID
+        db.add_all([
+            CustomerAccounts(AcctNum=savings_acct, CustID=cust.CustID),
+            CustomerAccounts(AcctNum=loan_acct, CustID=cust.CustID),
+        ])
+        await db.flush()
+        db.add(SavingAccountDetail(AcctNum=savings_acct, Balance=Decimal("10000000.00")))
+        db.add(LoanAccountDetail(
+            AcctNum=loan_acct, EMIID=emi_id, BalanceAmount=Decimal("500000.00"), BranchCode="BENCH",
+            RateOfInterest=Decimal("9.25"), LoanDuration=months, TotalLoanAmount=Decimal("500000.00"),
+        ))
+        await db.flush()
+        await create_emi_schedules(db, [emi_id], date(2001, 1, 31))
+        await db.commit()
+        return cust.CustID, savings_acct, loan_acct, emi_id
+
+
+async def pay(cust_id: int, loan_acct: int, emi_num: int | None, savings_acct: int) -> EMIPaid | PostingError:
+    async with AsyncSessionLocal() as db:
+        outcome = (await pay_emis(db, [EMIPayment(0, cust_id, loan_acct, emi_num, date.today(), savings_acct)]))[0]
+        if isinstance(outcome, PostingError):
+            await db.rollback()
+        else:
+            await db.commit()
+        return outcome
+
+
+async def state(savings_acct: int, emi_id: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        E, H = LoanEMIDetail, SavingAccountTxnHistory
+        paid = (await db.execute(
+            select(E.EMINum, E.EMIAmount, E.RemainingBalance).where(and_(E.EMIID == emi_id, E.EMIStatus == "Paid"))
+            .order_by(E.EMIDate, E.EMINum)
+        )).all()
+        debits = (await db.execute(
+            select(func.count(), func.coalesce(func.sum(H.WithdrawAmount), 0)).where(H.AcctNum == savings_acct)
+        )).one()
+        balance = (await db.execute(select(LoanAccountDetail.BalanceAmount).where(LoanAccountDetail.EMIID == emi_id))).scalar_one()
+    return {"paid": paid, "debits": debits[0], "debited": debits[1], "loan_balance": balance}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--months", type=int, default=240)
+    args = parser.parse_args()
+
+    cust_id, savings_acct, loan_acct, emi_id = await setup(args.months)
+    async with AsyncSessionLocal() as db:
+        first = (await db.execute(
+            select(func.min(LoanEMIDetail.EMINum)).where(LoanEMIDetail.EMIID == emi_id)
+        )).scalar_one()
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(pay(cust_id, loan_acct, first, savings_acct) for _ in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    codes = Counter(201 if isinstance(o, EMIPaid) else o.status_code for o in outcomes)
+    s = await state(savings_acct, emi_id)
+    ok = codes[201] == 1 and len(s["paid"]) == 1 and s["debits"] == 1 and s["loan_balance"] == s["paid"][0].RemainingBalance
+    print(f"retry: {args.clients} parallel payments of EMINum={first} in {elapsed:.2f}s -> {dict(codes)}; "
+          f"paid={len(s['paid'])} debits={s['debits']} loan_balance={s['loan_balance']} {'OK' if ok else 'FAILED'}")
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(pay(cust_id, loan_acct, None, savings_acct) for _ in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    paid_now = [o for o in outcomes if isinstance(o, EMIPaid)]
+    s = await state(savings_acct, emi_id)
+    balances = [row.RemainingBalance for row in s["paid"]]
+    ok = (
+        len(paid_now) == args.clients
+        and len({o.EMINum for o in paid_now}) == args.clients
+        and len(s["paid"]) == args.clients + 1
+        and s["debits"] == args.clients + 1
+        and s["debited"] == sum(row.EMIAmount for row in s["paid"])
+        and balances == sorted(balances, reverse=True)
+        and s["loan_balance"] == balances[-1]
+    )
+    print(f"next: {args.clients} parallel 'pay next' in {elapsed:.2f}s ({args.clients / elapsed:.0f}/s); "
+          f"paid={len(s['paid'])} debits={s['debits']} loan_balance={s['loan_balance']} {'OK' if ok else 'FAILED'}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
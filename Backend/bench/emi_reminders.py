@@ -0,0 +1,99 @@
+# bench/emi_reminders.py
+"""EMI reminder scan cost vs. table size: seeds --loans loans with --months installments
+each, the first due the day after --as-of, then runs app.jobs.emi_reminders twice for
+--as-of (lead 3 days) into a discarding sink. The first run finds --loans due rows out of
+loans x months, the second finds none; both should take time in proportion to the due
+rows only. Prints the plan of the claim query and both runs' stats. Any other pending,
+unreminded installment in DATABASE_URL that falls due is reminded as well (use a
+scratch database):
+
+    cd Backend && python -m bench.emi_reminders --loans 20000 --months 240
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import CustomerDetail
+from app.crud.loans import create_emi_schedules
+from app.jobs.emi_reminders import send_reminders, _claim_due
+
+
+class _CountingSink:
+    def __init__(self):
+        self.count = 0
+
+    async def send(self, reminders: list[dict]) -> None:
+        self.count += len(reminders)
+
+    async def close(self) -> None:
+        pass
+
+
+async def seed(loans: int, months: int, first_due: date, chunk: int = 2000):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        cust = CustomerDetail(FirstName="Bench", LastName="Reminders", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+        db.add(cust)
+        await db.flush()
+        acct_base = (await db.execute(text('SELECT coalesce(max("AcctNum"), 0) FROM "CustomerAccounts"'))).scalar_one()
+        emi_base = (await db.execute(text('SELECT coalesce(max("EMIID"), 0) FROM "LoanAccountDetail"'))).scalar_one()
+        params = {"cust": cust.CustID, "acct_base": acct_base, "emi_base": emi_base, "loans": loans, "months": months}
+        await db.execute(text(
+            'INSERT INTO "CustomerAccounts" ("AcctNum", "CustID") SELECT :acct_base + g, :cust FROM generate_series(1, :loans) g'
+        ), params)
+        await db.execute(text(
+            'INSERT INTO "LoanAccountDetail" ("AcctNum", "EMIID", "BalanceAmount", "BranchCode", "RateOfInterest", "LoanDuration", "TotalLoanAmount") '
+            "SELECT :acct_base + g, :emi_base + g, 100000, 'BENCH', 9.50, :months, 100000 FROM generate_series(1, :loans) g"
+        ), params)
+        await db.commit()
+        for start in range(1, loans + 1, chunk):
+            ids = list(range(emi_base + start, emi_base + min(start + chunk, loans + 1)))
+            await create_emi_schedules(db, ids, first_due)
+            await db.commit()
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text('ANALYZE "LoanEMIDetail"'))
+
+
+async def explain(horizon: date, chunk: int) -> str:
+    stmt = _claim_due(horizon, chunk)
+    async with engine.connect() as conn:
+        compiled = stmt.compile(dialect=engine.dialect)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        rows = await conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + str(compiled), params)
+        plan = "\n".join(row[0] for row in rows)
+        await conn.rollback()
+    return plan
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=20_000)
+    parser.add_argument("--months", type=int, default=240)
+    parser.add_argument("--as-of", type=date.fromisoformat, default=date(2001, 1, 1))
+    parser.add_argument("--chunk", type=int, default=1000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    started = time.perf_counter()
+    await seed(args.loans, args.months, args.as_of + timedelta(days=1))
+    async with engine.connect() as conn:
+        total = (await conn.execute(text('SELECT count(*) FROM "LoanEMIDetail"'))).scalar_one()
+    print(f"seeded {args.loans:,} loans x {args.months} months in {time.perf_counter() - started:.1f}s; "
+          f"LoanEMIDetail has {total:,} rows")
+    print(await explain(args.as_of + timedelta(days=3), args.chunk))
+    for _ in range(2):
+        sink = _CountingSink()
+        print(await send_reminders(sink, args.as_of, 3, args.chunk))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+# bench/emi_schedule.py
+"""EMI schedule generation throughput: seeds --loans loan accounts of --months installments
+(amounts and rates varied per loan, no schedules), runs app.jobs.emi_schedule_backfill
+over them and prints installments/s, then checks every seeded loan was scheduled and closes at exactly 0 without going
+negative. The backfill covers every unscheduled loan in DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.emi_schedule --loans 100000 --months 240
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from datetime import date
+
+from sqlalchemy import text
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import CustomerDetail
+from app.jobs.emi_schedule_backfill import backfill
+
+
+async def seed(loans: int, months: int) -> tuple[int, int]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        cust = CustomerDetail(FirstName="Bench", LastName="Loans", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+        db.add(cust)
+        await db.flush()
+        acct_base = (await db.execute(text('SELECT coalesce(max("AcctNum"), 0) FROM "CustomerAccounts"'))).scalar_one()
+        emi_base = (await db.execute(text('SELECT coalesce(max("EMIID"), 0) FROM "LoanAccountDetail"'))).scalar_one()
+        params = {"cust": cust.CustID, "acct_base": acct_base, "emi_base": emi_base, "loans": loans, "months": months}
+        await db.execute(text(
+            'INSERT INTO "CustomerAccounts" ("AcctNum", "CustID") SELECT :acct_base + g, :cust FROM generate_series(1, :loans) g'
+        ), params)
+        # principal 50k..1M, rate 6.00%..11.99%, every 50th loan interest-free
+        await db.execute(text(
+            'INSERT INTO "LoanAccountDetail" ("AcctNum", "EMIID", "BalanceAmount", "BranchCode", "RateOfInterest", "LoanDuration", "TotalLoanAmount") '
+            "SELECT :acct_base + g, :emi_base + g, 50000 + (g * 7919) % 950000, 'BENCH', "
+            "CASE WHEN g % 50 = 0 THEN 0 ELSE 6 + (g % 600) / 100.0 END, :months, 50000 + (g * 7919) % 950000 "
+            "FROM generate_series(1, :loans) g"
+        ), params)
+        await db.commit()
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text('ANALYZE "LoanAccountDetail"'))
+    return emi_base + 1, emi_base + loans
+
+
+async def verify(first: int, last: int) -> dict:
+    async with engine.connect() as conn:
+        row = (await conn.execute(text(
+            'SELECT count(DISTINCT e."EMIID") AS loans, '
+            'count(*) FILTER (WHERE e."EMIDate" = s.last_due AND e."RemainingBalance" <> 0) AS not_closed, '
+            'count(*) FILTER (WHERE e."RemainingBalance" < 0) AS negative '
+            'FROM "LoanEMIDetail" e JOIN (SELECT "EMIID", max("EMIDate") AS last_due FROM "LoanEMIDetail" '
+            'WHERE "EMIID" BETWEEN :first AND :last GROUP BY "EMIID") s USING ("EMIID")'
+        ), {"first": first, "last": last})).one()
+    return dict(row._mapping)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=240)
+    parser.add_argument("--chunk", type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    started = time.perf_counter()
+    first, last = await seed(args.loans, args.months)
+    print(f"seeded {args.loans:,} loans x {args.months} months in {time.perf_counter() - started:.1f}s")
+    print(await backfill(date(2001, 1, 31), args.chunk))
+    print(await verify(first, last))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+# bench/geo_cache.py
+"""Location lookups with and without the geo index (app.services.geo_cache): seeds
+--zips postal codes (over --cities cities in a few states and countries), then times
+--customers create_customer calls on existing ZIPs, rendering PostalCodeOut for GET
+/customers/{cust_id} (get_postal_hierarchy) and ZIP autocomplete (search_postal_codes),
+each once answered from the database (index disabled) and once from the index. Also
+reports the index load time. Writes into DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.geo_cache --zips 100000 --customers 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.crud.customer import create_customer, get_postal_hierarchy, search_postal_codes
+from app.services.geo_cache import geo_index
+
+
+async def seed(zips: int, cities: int) -> list[str]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        existing = (await conn.execute(text("""SELECT count(*) FROM "PostalCode" WHERE "ZIPCode" LIKE 'G%'"""))).scalar_one()
+        if existing < zips:
+            await conn.execute(text(
+                """INSERT INTO "Country" ("CountryName") SELECT 'GeoCountry' || g FROM generate_series(1, 5) g"""
+            ))
+            await conn.execute(text("""
+                INSERT INTO "State" ("StateName", "CountryCode")
+                SELECT 'GeoState' || g, (SELECT max("CountryCode") FROM "Country") - g % 5 FROM generate_series(1, 50) g
+            """))
+            await conn.execute(text("""
+                INSERT INTO "City" ("CityName", "StateCode")
+                SELECT 'GeoCity' || g, (SELECT max("StateCode") FROM "State") - g % 50 FROM generate_series(1, CAST(:cities AS integer)) g
+            """), {"cities": cities})
+            await conn.execute(text("""
+                INSERT INTO "PostalCode" ("ZIPCode", "CityCode")
+                SELECT 'G' || lpad(g::text, 7, '0'), (SELECT max("CityCode") FROM "City") - g % :cities
+                FROM generate_series(CAST(:first AS integer), :zips) g ON CONFLICT DO NOTHING
+            """), {"cities": cities, "first": existing + 1, "zips": zips})
+    return [f"G{g:07d}" for g in range(1, zips + 1)]
+
+
+def summary(samples: list[float]) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    return f"p50 {statistics.median(ms):7.2f} ms  p95 {ms[int(len(ms) * 0.95)]:7.2f} ms"
+
+
+async def run(label: str, zip_codes: list[str], customers: int, rng: random.Random):
+    tag = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        creates, renders, completes = [], [], []
+        for i in range(customers):
+            payload = {"FirstName": "Geo", "LastName": "Bench", "EmailID": f"geo{i}-{tag}@bench.example", "ZIPCode": rng.choice(zip_codes)}
+            t = time.perf_counter()
+            await create_customer(db, payload=payload)
+            creates.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            await get_postal_hierarchy(db, rng.choice(zip_codes))
+            await db.commit()
+            renders.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            await search_postal_codes(db, rng.choice(zip_codes)[:5], 10)
+            await db.commit()
+            completes.append(time.perf_counter() - t)
+    print(f"{label:<9} create_customer {summary(creates)} | PostalCodeOut {summary(renders)} | autocomplete {summary(completes)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--zips", type=int, default=100_000)
+    parser.add_argument("--cities", type=int, default=5_000)
+    parser.add_argument("--customers", type=int, default=2_000)
+    args = parser.parse_args()
+
+    zip_codes = await seed(args.zips, args.cities)
+    rng = random.Random(22)
+
+    max_zips = geo_index.max_zips
+    geo_index.max_zips = 0
+    await geo_index.load()
+    await run("database", zip_codes, args.customers, rng)
+
+    geo_index.max_zips = max(max_zips, args.zips * 2)
+    await geo_index.load()
+    print(f"index load {geo_index.stats()['last_load_seconds'] * 1000:.0f} ms for {geo_index.stats()['zips']:,} ZIPs")
+    await run("index", zip_codes, args.customers, rng)
+    print(geo_index.stats())
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
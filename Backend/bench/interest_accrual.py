@@ -0,0 +1,74 @@
+# bench/interest_accrual.py
+"""Interest accrual throughput: seeds --accounts savings accounts with --postings postings
+each inside --month, then runs app.jobs.interest_accrual for that month and prints its
+rows/s. The job covers every savings account in DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.interest_accrual --accounts 200000 --postings 5 --month 2001-01
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import text, delete
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import CustomerDetail, InterestAccrualRun
+from app.jobs.interest_accrual import accrue_interest, month_period
+
+
+async def seed(accounts: int, postings: int, month: str):
+    start, _ = month_period(month)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        cust = CustomerDetail(FirstName="Bench", LastName="Interest", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+        db.add(cust)
+        await db.flush()
+        acct_base = (await db.execute(text('SELECT coalesce(max("AcctNum"), 0) FROM "CustomerAccounts"'))).scalar_one()
+        txn_base = max(1_000_000_000, (await db.execute(text('SELECT coalesce(max("TxnID"), 0) FROM "SavingAccountTxnHistory"'))).scalar_one())
+        params = {"cust": cust.CustID, "acct_base": acct_base, "txn_base": txn_base, "accounts": accounts,
+                  "postings": postings, "start": start}
+        await db.execute(text(
+            'INSERT INTO "CustomerAccounts" ("AcctNum", "CustID") SELECT :acct_base + g, :cust FROM generate_series(1, :accounts) g'
+        ), params)
+        await db.execute(text(
+            'INSERT INTO "SavingAccountDetail" ("AcctNum", "Balance") '
+            "SELECT :acct_base + g, :postings * 100.00 FROM generate_series(1, :accounts) g"
+        ), params)
+        # postings of 100.00 spread over the first four weeks of the month
+        await db.execute(text(
+            'INSERT INTO "SavingAccountTxnHistory" ("TxnID", "TxnDate", "AcctNum", "TxnDetail", "WithdrawAmount", "DepositAmount", "Balance") '
+            "SELECT :txn_base + (a - 1) * :postings + p, CAST(:start AS date) + (p * 5) % 28, :acct_base + a, 'bench deposit', 0, 100.00, p * 100.00 "
+            "FROM generate_series(1, :accounts) a, generate_series(1, :postings) p"
+        ), params)
+        await db.execute(delete(InterestAccrualRun).where(InterestAccrualRun.PeriodStart == start))
+        await db.commit()
+    # fresh statistics, as autovacuum would have them on a live database
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in ("CustomerAccounts", "SavingAccountDetail", "SavingAccountTxnHistory"):
+            await conn.execute(text(f'ANALYZE "{table}"'))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=200_000)
+    parser.add_argument("--postings", type=int, default=5, help="postings per account inside the month")
+    parser.add_argument("--month", default="2001-01")
+    parser.add_argument("--rate", type=Decimal, default=Decimal("3.50"))
+    parser.add_argument("--chunk", type=int, default=5000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    started = time.perf_counter()
+    await seed(args.accounts, args.postings, args.month)
+    print(f"seeded {args.accounts:,} accounts x {args.postings} postings in {time.perf_counter() - started:.1f}s")
+    print(await accrue_interest(args.month, args.rate, args.chunk))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+# bench/loan_portfolio.py
+"""Loan portfolio dashboard latency: seeds --loans loans over --branches branches with
+--months installment schedules, then times
+
+  live      the GROUP BY over LoanAccountDetail/LoanEMIDetail a dashboard would otherwise run
+  rebuild   app.jobs.portfolio_reconcile (the same query, written to LoanPortfolioAggregate)
+  read      app.crud.portfolio.read_portfolio after --deltas incremental write-path deltas
+  cached    app.services.portfolio.get_portfolio served from the in-process TTL cache
+
+and checks the incremental figures match a fresh rebuild. Reconciles every loan in
+DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.loan_portfolio --loans 100000 --months 60
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import CustomerDetail
+from app.crud.portfolio import read_portfolio, record_emi_payments
+from app.jobs.emi_schedule_backfill import backfill
+from app.jobs.portfolio_reconcile import reconcile, _rebuild_query
+from app.services.portfolio import get_portfolio
+
+AS_OF = date(2004, 1, 1)
+
+
+async def seed(loans: int, branches: int, months: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        cust = CustomerDetail(FirstName="Bench", LastName="Portfolio", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+        db.add(cust)
+        await db.flush()
+        acct_base = (await db.execute(text('SELECT coalesce(max("AcctNum"), 0) FROM "CustomerAccounts"'))).scalar_one()
+        emi_base = (await db.execute(text('SELECT coalesce(max("EMIID"), 0) FROM "LoanAccountDetail"'))).scalar_one()
+        params = {"cust": cust.CustID, "acct_base": acct_base, "emi_base": emi_base, "loans": loans,
+                  "months": months, "branches": branches}
+        await db.execute(text(
+            'INSERT INTO "CustomerAccounts" ("AcctNum", "CustID") SELECT :acct_base + g, :cust FROM generate_series(1, :loans) g'
+        ), params)
+        await db.execute(text(
+            'INSERT INTO "LoanAccountDetail" ("AcctNum", "EMIID", "BalanceAmount", "BranchCode", "RateOfInterest", "LoanDuration", "TotalLoanAmount") '
+            "SELECT :acct_base + g, :emi_base + g, 50000 + (g * 7919) % 950000, 'BR' || (g % :branches), "
+            "6 + (g % 600) / 100.0, :months, 50000 + (g * 7919) % 950000 FROM generate_series(1, :loans) g"
+        ), params)
+        await db.commit()
+    # schedules start in 2001, so by AS_OF every loan has ~36 installments overdue
+    await backfill(date(2001, 1, 31), 2000)
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text('ANALYZE "LoanAccountDetail"'))
+        await conn.execute(text('ANALYZE "LoanEMIDetail"'))
+
+
+async def timed(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=100_000)
+    parser.add_argument("--branches", type=int, default=200)
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--deltas", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    started = time.perf_counter()
+    await seed(args.loans, args.branches, args.months)
+    print(f"seeded {args.loans:,} loans x {args.months} months in {time.perf_counter() - started:.1f}s")
+
+    async with AsyncSessionLocal() as db:
+        async def live():
+            (await db.execute(_rebuild_query(AS_OF))).all()
+        print(f"live:    {await timed(live, args.runs):8.1f} ms")
+    print(f"rebuild: {(await reconcile(AS_OF))['seconds'] * 1000:8.1f} ms")
+
+    # what the write paths append between rebuilds: one delta per paid installment
+    async with AsyncSessionLocal() as db:
+        await record_emi_payments(db, [
+            (f"BR{i % args.branches}", None, Decimal("100.00"), Decimal("9.5"), date(2003, 6, 30), Decimal("1200.00"))
+            for i in range(args.deltas)
+        ])
+        await db.commit()
+        print(f"read:    {await timed(lambda: read_portfolio(db), args.runs):8.1f} ms  ({args.deltas:,} pending deltas)")
+        print(f"read 1:  {await timed(lambda: read_portfolio(db, 'BR1'), args.runs):8.1f} ms  (one branch)")
+        incremental = await read_portfolio(db)
+        await get_portfolio(db)
+        print(f"cached:  {await timed(lambda: get_portfolio(db), args.runs) * 1000:8.1f} us")
+
+    stats = await reconcile(AS_OF)
+    print(stats)
+    async with AsyncSessionLocal() as db:
+        rebuilt = await read_portfolio(db)
+    # the synthetic deltas have no loans behind them, so the rebuild drops exactly them
+    expected = incremental["totals"]["OutstandingPrincipal"] + args.deltas * Decimal("100.00")
+    ok = stats["deltas_folded"] == args.deltas and rebuilt["totals"]["OutstandingPrincipal"] == expected
+    print("OK" if ok else "FAILED")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+# bench/location_upsert.py
+"""Concurrent onboarding into one new city: --parallel create_customer calls at once,
+each with its own ZIP in the same new City/State/Country (spelled in varying case), run
+--rounds times with fresh names. Checks that every customer was created and that each
+round left exactly one Country, State and City row, and reports latency.
+
+--legacy first runs the same rounds through the previous find-or-create sequence
+(SELECT by lower(name), then INSERT and flush per level): with the unique name indexes in
+place its races surface as IntegrityErrors instead of duplicate rows.
+Writes into DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.location_upsert --parallel 50 --rounds 5 --legacy
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+
+from app.db import engine, Base, AsyncSessionLocal, create_missing_indexes
+from app.models import CustomerDetail, PostalCode, City, State, Country
+from app.crud.customer import create_customer
+
+
+async def legacy_onboard(payload: dict):
+    async with AsyncSessionLocal() as db:
+        country = (await db.execute(select(Country).where(func.lower(Country.CountryName) == payload["CountryName"].lower()))).scalars().first()
+        if not country:
+            country = Country(CountryName=payload["CountryName"])
+            db.add(country)
+            await db.flush()
+        state = (await db.execute(select(State).where(
+            func.lower(State.StateName) == payload["StateName"].lower(), State.CountryCode == country.CountryCode
+        ))).scalars().first()
+        if not state:
+            state = State(StateName=payload["StateName"], CountryCode=country.CountryCode)
+            db.add(state)
+            await db.flush()
+        city = (await db.execute(select(City).where(
+            func.lower(City.CityName) == payload["CityName"].lower(), City.StateCode == state.StateCode
+        ))).scalars().first()
+        if not city:
+            city = City(CityName=payload["CityName"], StateCode=state.StateCode)
+            db.add(city)
+            await db.flush()
+        db.add(PostalCode(ZIPCode=payload["ZIPCode"], CityCode=city.CityCode))
+        await db.flush()
+        db.add(CustomerDetail(FirstName="Loc", LastName="Bench", EmailID=payload["EmailID"], ZIPCode=payload["ZIPCode"]))
+        await db.commit()
+
+
+async def onboard(payload: dict):
+    async with AsyncSessionLocal() as db:
+        await create_customer(db, payload=dict(payload, FirstName="Loc", LastName="Bench"))
+
+
+async def run_round(fn, parallel: int) -> tuple[list[float], int, tuple]:
+    tag = uuid.uuid4().hex[:8]
+    names = (f"Country-{tag}", f"State-{tag}", f"City-{tag}")
+    spellings = [str, str.lower, str.upper]
+
+    def payload(i: int) -> dict:
+        case = spellings[i % 3]
+        country, state, city = (case(name) for name in names)
+        return {"EmailID": f"loc{i}-{tag}@bench.example", "ZIPCode": f"L{tag}{i:03d}",
+                "CityName": city, "StateName": state, "CountryName": country}
+
+    async def timed(i: int):
+        started = time.perf_counter()
+        await fn(payload(i))
+        return time.perf_counter() - started
+
+    results = await asyncio.gather(*(timed(i) for i in range(parallel)), return_exceptions=True)
+    errors = sum(isinstance(r, IntegrityError) for r in results)
+    unexpected = [r for r in results if isinstance(r, BaseException) and not isinstance(r, IntegrityError)]
+    if unexpected:
+        raise unexpected[0]
+    async with AsyncSessionLocal() as db:
+        counts = (
+            (await db.execute(select(func.count()).where(func.lower(Country.CountryName) == names[0].lower()))).scalar_one(),
+            (await db.execute(select(func.count()).where(func.lower(State.StateName) == names[1].lower()))).scalar_one(),
+            (await db.execute(select(func.count()).where(func.lower(City.CityName) == names[2].lower()))).scalar_one(),
+            (await db.execute(select(func.count()).where(CustomerDetail.EmailID.like(f"%-{tag}@bench.example")))).scalar_one(),
+        )
+    return [r for r in results if isinstance(r, float)], errors, counts
+
+
+async def bench(label: str, fn, parallel: int, rounds: int):
+    samples, errors, rows = [], 0, []
+    for _ in range(rounds):
+        latencies, failed, counts = await run_round(fn, parallel)
+        samples += latencies
+        errors += failed
+        rows.append(counts)
+    ms = sorted(s * 1000 for s in samples) or [0.0]
+    print(f"{label:<7} {rounds} x {parallel} parallel: {len(samples)} created, {errors} IntegrityErrors, "
+          f"p50 {statistics.median(ms):.1f} ms, max {ms[-1]:.1f} ms")
+    print(f"        (countries, states, cities, customers) per round: {rows}")
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parallel", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes)
+    if args.legacy:
+        await bench("legacy", legacy_onboard, args.parallel, args.rounds)
+    rows = await bench("upsert", onboard, args.parallel, args.rounds)
+    assert all(counts == (1, 1, 1, args.parallel) for counts in rows), rows
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
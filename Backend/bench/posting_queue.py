@@ -0,0 +1,83 @@
+# bench/posting_queue.py
+"""Hot-account benchmark: per-request postings vs the micro-batching posting queue.
+
+Every client deposits into the SAME account, which is the payroll-account case. Runs
+against DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.posting_queue --clients 200 --postings 10 --max-latency-ms 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app.db import engine, AsyncSessionLocal
+from app.models import SavingAccountDetail
+from app.crud.savings import post_savings_txn, BatchPosting
+from app.services.posting_queue import PostingQueue
+from bench.savings_posting import setup_account
+
+AMOUNT = Decimal("1.00")
+
+
+async def direct_posting(cust_id: int, acct_num: int):
+    async with AsyncSessionLocal() as db:
+        await post_savings_txn(db, cust_id, acct_num, AMOUNT, date.today(), "bench")
+        await db.commit()
+
+
+def queued_posting(queue: PostingQueue):
+    async def post(cust_id: int, acct_num: int):
+        await queue.submit(BatchPosting(0, cust_id, acct_num, AMOUNT, date.today(), "bench"))
+    return post
+
+
+async def run(label: str, post, clients: int, postings: int):
+    cust_id, acct_num = await setup_account()
+    latencies: list[float] = []
+
+    async def client():
+        for _ in range(postings):
+            started = time.perf_counter()
+            await post(cust_id, acct_num)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    async with AsyncSessionLocal() as db:
+        balance = (await db.execute(select(SavingAccountDetail.Balance).where(SavingAccountDetail.AcctNum == acct_num))).scalar_one()
+
+    latencies.sort()
+    total = clients * postings
+    print(
+        f"[{label}] {total / elapsed:,.0f} postings/s  "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms  p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms  "
+        f"balance={balance} ({'OK' if balance == AMOUNT * total else 'MISMATCH'})"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--postings", type=int, default=10, help="postings per client")
+    parser.add_argument("--max-batch", type=int, default=200)
+    parser.add_argument("--max-latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    await run("per-request", direct_posting, args.clients, args.postings)
+
+    queue = PostingQueue(shards=8, max_batch=args.max_batch, max_latency_ms=args.max_latency_ms)
+    queue.start()
+    await run("queue", queued_posting(queue), args.clients, args.postings)
+    await queue.stop()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+# bench/savings_posting.py
+"""Concurrency benchmark for savings postings.
+
+Points 100 concurrent clients at ONE savings account and checks that no update is lost.
+Runs against the database in DATABASE_URL (use a scratch database, it creates its own customer):
+
+    cd Backend && python -m bench.savings_posting --clients 100 --postings 20
+
+`--naive` runs the old read-modify-write flow (SELECT balance, compute in Python, UPDATE)
+next to the engine so the lost updates are visible.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, func
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import CustomerDetail, CustomerAccounts, SavingAccountDetail, SavingAccountTxnHistory
+from app.crud.savings import post_savings_txn, PostingError
+from app.crud.customer360 import find_mismatches
+from app.services.customer_cache import mark_customer_changed
+
+AMOUNT = Decimal("1.00")
+
+
+async def setup_account() -> tuple[int, int]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        cust = CustomerDetail(FirstName="Bench", LastName="Posting", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+        db.add(cust)
+        await db.flush()
+        acct_num = 900_000_000 + cust.CustID
+        db.add(CustomerAccounts(AcctNum=acct_num, CustID=cust.CustID))
+        db.add(SavingAccountDetail(AcctNum=acct_num, Balance=Decimal("0.00")))
+        mark_customer_changed(db, cust.CustID)  # with its customer-360 document, like any customer
+        await db.commit()
+        return cust.CustID, acct_num
+
+
+async def engine_client(cust_id: int, acct_num: int, postings: int, stats: dict):
+    for i in range(postings):
+        # alternate deposits and withdrawals so the insufficient-funds guard is exercised too
+        delta = AMOUNT if i % 2 == 0 else -AMOUNT
+        async with AsyncSessionLocal() as db:
+            try:
+                await post_savings_txn(db, cust_id, acct_num, delta, date.today(), "bench")
+                await db.commit()
+                stats["net"] += delta
+                stats["ok"] += 1
+            except PostingError:
+                await db.rollback()
+                stats["rejected"] += 1
+
+
+async def naive_client(cust_id: int, acct_num: int, postings: int, stats: dict):
+    for _ in range(postings):
+        async with AsyncSessionLocal() as db:
+            sad = (await db.execute(select(SavingAccountDetail).where(SavingAccountDetail.AcctNum == acct_num))).scalar_one()
+            sad.Balance = (sad.Balance or 0) + AMOUNT
+            await db.commit()
+            stats["net"] += AMOUNT
+            stats["ok"] += 1
+
+
+async def run(label: str, client, clients: int, postings: int):
+    cust_id, acct_num = await setup_account()
+    stats = {"ok": 0, "rejected": 0, "net": Decimal("0.00")}
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(cust_id, acct_num, postings, stats) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    async with AsyncSessionLocal() as db:
+        balance = (await db.execute(select(SavingAccountDetail.Balance).where(SavingAccountDetail.AcctNum == acct_num))).scalar_one()
+        history = (await db.execute(
+            select(func.count(), func.coalesce(func.sum(SavingAccountTxnHistory.DepositAmount - SavingAccountTxnHistory.WithdrawAmount), 0))
+            .where(SavingAccountTxnHistory.AcctNum == acct_num)
+        )).one()
+        mismatches = await find_mismatches(db, cust_id, cust_id)
+
+    attempted = clients * postings
+    print(f"[{label}] {clients} clients x {postings} postings -> {attempted / elapsed:,.0f} postings/s ({elapsed:.2f}s)")
+    print(f"[{label}]   applied={stats['ok']} rejected={stats['rejected']} history_rows={history[0]}")
+    print(f"[{label}]   expected balance={stats['net']} actual balance={balance} history net={history[1]}")
+    print(f"[{label}]   {'OK' if balance == stats['net'] else 'LOST UPDATES'}, "
+          f"customer-360 {'in step' if not mismatches else mismatches[0][1]}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--postings", type=int, default=20, help="postings per client")
+    parser.add_argument("--naive", action="store_true", help="also run the old read-modify-write flow")
+    args = parser.parse_args()
+
+    await run("engine", engine_client, args.clients, args.postings)
+    if args.naive:
+        await run("naive", naive_client, args.clients, args.postings)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+# bench/savings_transfer.py
+"""Load test for crossing transfers: half the clients move money A->B while the other half
+move B->A, all at the same time. Reports deadlocks, throughput per second and checks that
+no money was created or lost. Runs against DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.savings_transfer --clients 100 --seconds 10
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import CustomerDetail, CustomerAccounts, SavingAccountDetail
+from app.crud.savings import transfer_between_savings, PostingError
+
+OPENING = Decimal("1000000.00")
+AMOUNT = Decimal("1.00")
+
+
+async def setup_accounts() -> list[tuple[int, int]]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    accounts = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(2):
+            cust = CustomerDetail(FirstName="Bench", LastName="Transfer", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+            db.add(cust)
+            await db.flush()
+            acct_num = 910_000_000 + cust.CustID
+            db.add(CustomerAccounts(AcctNum=acct_num, CustID=cust.CustID))
+            db.add(SavingAccountDetail(AcctNum=acct_num, Balance=OPENING))
+            accounts.append((cust.CustID, acct_num))
+        await db.commit()
+    return accounts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    (cust_a, acct_a), (cust_b, acct_b) = await setup_accounts()
+    per_second: Counter = Counter()
+    errors: Counter = Counter()
+    started = time.perf_counter()
+    stop_at = started + args.seconds
+
+    async def client(cust_id: int, from_acct: int, to_acct: int):
+        while time.perf_counter() < stop_at:
+            async with AsyncSessionLocal() as db:
+                try:
+                    await transfer_between_savings(db, cust_id, from_acct, to_acct, AMOUNT, date.today(), "bench")
+                    await db.commit()
+                    per_second[int(time.perf_counter() - started)] += 1
+                except PostingError as pe:
+                    errors[pe.detail] += 1
+                except DBAPIError as e:
+                    errors["deadlock" if "deadlock" in str(e).lower() else type(e.orig).__name__] += 1
+
+    await asyncio.gather(*(
+        client(cust_a, acct_a, acct_b) if i % 2 == 0 else client(cust_b, acct_b, acct_a)
+        for i in range(args.clients)
+    ))
+
+    async with AsyncSessionLocal() as db:
+        res = await db.execute(select(SavingAccountDetail.Balance).where(SavingAccountDetail.AcctNum.in_([acct_a, acct_b])))
+        total = sum(res.scalars().all())
+
+    seconds = sorted(s for s in per_second if s < int(args.seconds))
+    print(f"{sum(per_second.values())} transfers in {args.seconds:.0f}s, {args.clients} clients (A->B and B->A)")
+    print("per second: " + " ".join(str(per_second[s]) for s in seconds))
+    print(f"errors: {dict(errors) or 'none'} (deadlocks={errors['deadlock']})")
+    print(f"total balance {total} vs opening {OPENING * 2}: {'OK' if total == OPENING * 2 else 'MISMATCH'}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+# bench/statement_export.py
+"""Statement export benchmark: streams a branch statement of --rows transactions through
+export_statement (the code behind GET /accounts/statements/export) and reports throughput
+and peak RSS. Seeds its own branch in DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.statement_export --rows 5000000 --accounts 1000 --format csv
+"""
+import argparse
+import asyncio
+import resource
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.db import engine, Base, AsyncSessionLocal
+from app.models import CustomerDetail
+from app.crud.statements import export_statement
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(rows: int, accounts: int) -> str:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        cust = CustomerDetail(FirstName="Bench", LastName="Export", EmailID=f"bench-{uuid.uuid4().hex}@example.com")
+        db.add(cust)
+        await db.commit()
+        branch = f"BENCH{cust.CustID}"
+        acct_base = (await db.execute(text('SELECT coalesce(max("AcctNum"), 0) FROM "CustomerAccounts"'))).scalar_one()
+        txn_base = max(1_000_000_000, (await db.execute(text('SELECT coalesce(max("TxnID"), 0) FROM "SavingAccountTxnHistory"'))).scalar_one())
+        params = {"cust": cust.CustID, "branch": branch, "acct_base": acct_base, "txn_base": txn_base, "accounts": accounts, "rows": rows}
+        await db.execute(text(
+            'INSERT INTO "CustomerAccounts" ("AcctNum", "CustID") '
+            "SELECT :acct_base + g, :cust FROM generate_series(1, :accounts) g"
+        ), params)
+        await db.execute(text(
+            'INSERT INTO "SavingAccountDetail" ("AcctNum", "Balance", "BranchCode") '
+            "SELECT :acct_base + g, 0, :branch FROM generate_series(1, :accounts) g"
+        ), params)
+        await db.execute(text(
+            'INSERT INTO "SavingAccountTxnHistory" ("TxnID", "TxnDate", "AcctNum", "TxnDetail", "WithdrawAmount", "DepositAmount", "Balance") '
+            "SELECT :txn_base + g, DATE '2018-01-01' + (g % 2900), :acct_base + 1 + (g % :accounts), 'bench posting', 0, 10.00, g * 10.00 "
+            "FROM generate_series(1, :rows) g"
+        ), params)
+        await db.commit()
+    return branch
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    branch = await seed(args.rows, args.accounts)
+    print(f"seeded {args.rows:,} rows in {time.perf_counter() - started:.1f}s (branch {branch})")
+
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    size = lines = 0
+    async for chunk in export_statement(args.format, branch_code=branch):
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+    elapsed = time.perf_counter() - started
+
+    data_rows = lines - (1 if args.format == "csv" else 0)
+    print(f"exported {data_rows:,} rows / {size / 2**20:,.0f} MiB as {args.format} in {elapsed:.1f}s ({data_rows / elapsed:,.0f} rows/s)")
+    print(f"peak RSS: {rss_before:.0f} MiB before export, {peak_rss_mb():.0f} MiB after")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+# bench/withdraw_limit.py
+"""Withdrawal latency with and without the daily transfer-limit check.
+
+Each client withdraws from its own account, which already has --history withdrawals
+dated today (a busy account). Three runs:
+
+  none    no limit check
+  naive   SELECT TransferLimit + SUM(today's WithdrawAmount) before every withdrawal
+  cached  app.services.limits.daily_limits (one warm-up query per account, then memory)
+
+Runs against DATABASE_URL (use a scratch database):
+
+    cd Backend && python -m bench.withdraw_limit --clients 50 --postings 40 --history 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, update, and_, func, text
+
+from app.db import engine, AsyncSessionLocal
+from app.models import SavingAccountDetail, SavingAccountTxnHistory
+from app.crud.savings import post_savings_txn, PostingError
+from app.services.limits import DailyLimits
+from bench.savings_posting import setup_account
+
+AMOUNT = Decimal("0.01")
+
+
+async def setup_accounts(clients: int, history: int) -> list[tuple[int, int]]:
+    accounts = [await setup_account() for _ in range(clients)]
+    async with AsyncSessionLocal() as db:
+        txn_base = max(1_000_000_000, (await db.execute(select(func.coalesce(func.max(SavingAccountTxnHistory.TxnID), 0)))).scalar_one())
+        for n, (_, acct_num) in enumerate(accounts):
+            await db.execute(
+                update(SavingAccountDetail)
+                .where(SavingAccountDetail.AcctNum == acct_num)
+                .values(Balance=Decimal("1000000.00"), TransferLimit=Decimal("1000000.00"))
+            )
+            await db.execute(text(
+                'INSERT INTO "SavingAccountTxnHistory" ("TxnID", "TxnDate", "AcctNum", "TxnDetail", "WithdrawAmount", "DepositAmount", "Balance") '
+                "SELECT :base + g, CURRENT_DATE, :acct, 'bench history', 0.01, 0, 1000000.00 FROM generate_series(1, :rows) g"
+            ), {"base": txn_base + n * history, "acct": acct_num, "rows": history})
+        await db.commit()
+    return accounts
+
+
+async def naive_check(db, acct_num: int, amount: Decimal, txn_date: date):
+    limit = (await db.execute(
+        select(SavingAccountDetail.TransferLimit).where(SavingAccountDetail.AcctNum == acct_num)
+    )).scalar_one()
+    sent = (await db.execute(
+        select(func.coalesce(func.sum(SavingAccountTxnHistory.WithdrawAmount), 0))
+        .where(and_(SavingAccountTxnHistory.AcctNum == acct_num, SavingAccountTxnHistory.TxnDate == txn_date))
+    )).scalar_one()
+    if limit and sent + amount > limit:
+        raise PostingError(409, "Daily transfer limit exceeded")
+
+
+def cached_check(limits: DailyLimits):
+    async def check(db, acct_num: int, amount: Decimal, txn_date: date):
+        await limits.reserve(db, acct_num, amount, txn_date)
+    return check
+
+
+async def run(label: str, check, accounts: list[tuple[int, int]], postings: int):
+    latencies: list[float] = []
+
+    async def client(cust_id: int, acct_num: int):
+        for _ in range(postings):
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                if check is not None:
+                    await check(db, acct_num, AMOUNT, date.today())
+                await post_savings_txn(db, cust_id, acct_num, -AMOUNT, date.today(), "bench")
+                await db.commit()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(c, a) for c, a in accounts))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"[{label:6}] {len(latencies) / elapsed:,.0f} withdrawals/s  "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms  p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--postings", type=int, default=40, help="withdrawals per client")
+    parser.add_argument("--history", type=int, default=5000, help="withdrawals already posted today per account")
+    args = parser.parse_args()
+
+    accounts = await setup_accounts(args.clients, args.history)
+    await run("none", None, accounts, args.postings)
+    await run("naive", naive_check, accounts, args.postings)
+    await run("cached", cached_check(DailyLimits(maxsize=args.clients)), accounts, args.postings)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())